@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""benchmark of html_generator pipeline
+
+Synthesized raw html of 1x, 10x, 100x size of raw/rule_reference.html
+(sections are repeated with new ids, so the densities of links, symbols,
+traits and headers are the same as the real document) is given to
+  * generate: whole generation (script, link, symbol)
+  * build_id_map: link target map (LinkGenerator._build_id_map)
+  * generate_toc: table of contents
+  * html_reader: HTMLReader of faq_generator
+and the best time (throughput) and the peak memory (tracemalloc) are measured.
+Caches are disabled, so every run parses the document again.
+
+usage:
+    python benchmark.py --save           # write baseline
+    python benchmark.py --compare        # compare with baseline (exit 1 if regression)
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import html_generator
+from html_generator.batch import BuildItem, build_generators
+from html_generator.cache import clear_memory
+from html_generator.link_generator import LinkGeneratorInterface
+from html_generator.mics import generate_toc
+from html_generator.parser import set_backend
+from faq_generator.html_reader import HTMLReader
+
+SEED = os.path.join('raw', 'rule_reference.html')
+BASELINE = os.path.join('.cache', 'benchmark.json')
+
+_re_id = re.compile('id="([^"]*)"')
+_re_start = re.compile('<h[0-9]')
+
+def synthesize(seed: str, scale: int) -> str:
+    """raw html of (scale) times size of seed
+
+    Lines from the first header to the footer are repeated,
+    and ids of the copies get a suffix (-2, -3, ...).
+    Hidden ids (_XXX) and ids ignored by link (XXX_) keep their form.
+    """
+    lines = seed.splitlines(keepends=True)
+    first = next(i for i, x in enumerate(lines) if _re_start.search(x))
+    last = next((i for i, x in enumerate(lines) if '<footer' in x or '</body>' in x), len(lines))
+    last = max(first, last)
+    body = ''.join(lines[first:last])
+    copies = [body]
+    for idx in range(2, scale+1):
+        copies.append(_re_id.sub(
+            lambda m, k=idx: 'id="{}"'.format(
+                m.group(1)[:-1] + '-{}_'.format(k) if m.group(1).endswith('_')
+                else m.group(1) + '-{}'.format(k)
+            ), body
+        ))
+    return ''.join(lines[:first]) + ''.join(copies) + ''.join(lines[last:])
+
+def _generate(path: str, folder: str) -> None:
+    item = BuildItem(path, os.path.join(folder, 'output.html'))
+    with open(item.input, 'r', encoding='utf-8') as file_input:
+        generators = build_generators(item, file_input)
+        with open(item.output, 'w', encoding='utf-8') as file_output:
+            html_generator.generate(file_input, file_output, generators)
+
+TARGETS: Dict[str, Callable[[str, str], Any]] = {
+    'generate': _generate,
+    'build_id_map': lambda path, _: LinkGeneratorInterface._build_id_map(path),
+    'generate_toc': lambda path, _: generate_toc(path),
+    'html_reader': lambda path, _: HTMLReader(path),
+    'html_reader_soup': lambda path, _: HTMLReader(path, streaming=False),
+}
+
+def measure(func: Callable[[str, str], Any], path: str, folder: str,
+            repeat: int) -> Dict[str, float]:
+    """best time and peak memory of func(path, folder)"""
+    times: List[float] = []
+    for _ in range(repeat):
+        clear_memory()
+        start = time.perf_counter()
+        func(path, folder)
+        times.append(time.perf_counter() - start)
+    clear_memory()
+    tracemalloc.start()
+    try:
+        func(path, folder)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    size = os.path.getsize(path)
+    return {
+        'bytes': size,
+        'seconds': min(times),
+        'mb_per_s': size / min(times) / 1e6,
+        'peak_mb': peak / 1e6,
+    }
+
+def run(scales: List[int], targets: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    """run benchmark: (target)@(scale)x -> result"""
+    with open(SEED, encoding='utf-8') as fid:
+        seed = fid.read()
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for scale in scales:
+            path = os.path.join(folder, 'raw_{}x.html'.format(scale))
+            with open(path, 'w', encoding='utf-8') as fid:
+                fid.write(synthesize(seed, scale))
+            for target in targets:
+                key = '{}@{}x'.format(target, scale)
+                results[key] = measure(TARGETS[target], path, folder, repeat)
+                print('{:<24} {:>9.1f}ms {:>8.2f}MB/s peak {:>8.1f}MB'.format(
+                    key, results[key]['seconds']*1000,
+                    results[key]['mb_per_s'], results[key]['peak_mb']))
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """keys & metrics worse than baseline by more than tolerance (ratio)"""
+    regressions: List[str] = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ['seconds', 'peak_mb']:
+            old, new = baseline[key][metric], result[metric]
+            if new > old * (1 + tolerance):
+                regressions.append('{} {}: {:.4g} -> {:.4g} ({:+.0%})'.format(
+                    key, metric, old, new, new/old - 1))
+    return regressions
+
+def main():
+    """main"""
+    parser = argparse.ArgumentParser(description="benchmark of html_generator")
+    parser.add_argument("--scales", type=str, default="1,10,100",
+                        help="sizes relative to raw/rule_reference.html (comma separated)")
+    parser.add_argument("--targets", type=str, default=','.join(TARGETS),
+                        help="functions to measure (comma separated)")
+    parser.add_argument("--parser", type=str, default=None,
+                        help="parser backend of BeautifulSoup (html.parser, lxml)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement (the best is used)")
+    parser.add_argument("--baseline", type=str, default=BASELINE,
+                        help="path of baseline (json)")
+    parser.add_argument("--save", action='store_true',
+                        help="save the results as baseline")
+    parser.add_argument("--compare", action='store_true',
+                        help="compare the results with baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed ratio of slowdown/memory increase for --compare")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    # no disk cache: every run parses the document
+    os.environ['HTML_GENERATOR_CACHE'] = ''
+
+    set_backend(args.parser)
+
+    targets = args.targets.split(',')
+    unknown = [x for x in targets if x not in TARGETS]
+    if unknown:
+        parser.error('unknown targets: {}'.format(', '.join(unknown)))
+    results = run([int(x) for x in args.scales.split(',')], targets, args.repeat)
+    if args.compare:
+        with open(args.baseline, encoding='utf-8') as fid:
+            regressions = compare(results, json.load(fid)['results'], args.tolerance)
+        for line in regressions:
+            print('REGRESSION', line)
+        if regressions:
+            sys.exit(1)
+    if args.save:
+        folder = os.path.dirname(args.baseline)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as fid:
+            json.dump({
+                'python': sys.version.split()[0],
+                'results': results
+            }, fid, indent=1, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import json
 import re
 import shutil
-import requests
+import sys
 from pathlib import Path
 from collections import OrderedDict
 from typing import List, Dict
@@ -13,6 +13,11 @@ import cv2
 from tqdm.auto import tqdm
 import argparse
 
+sys.path.append(str(Path(__file__).parent.parent))
+from faq_generator.downloader import Downloader, arkhamdb_job # pylint: disable=C0413
+
+IMAGE_CACHE = Path(__file__).parent.parent / '.cache' / 'card_list'
+
 # sorting criteria
 # level -> code
 # special case: upgrade version will follow just after
@@ -100,19 +105,22 @@ def sort_data(data: list[dict[str, str]]) -> list[dict[str, str]]:
     """
     data = deepcopy(data)
     code = [x['code'] for x in data]
+    position: Dict[str, int] = {} # code -> index (first one, as code.index)
+    for idx, value in enumerate(code):
+        position.setdefault(value, idx)
     data.sort(key=lambda x: x['code'])
     to_remove = []
     invs = [x for x in data if "type_code" in x and x['type_code'] == "investigator"]
     sigs: List[List[Dict[str, str]]] = []
     for inv in invs:
         sig: List[Dict[str, str]] = []
-        idx = code.index(inv['code'])
+        idx = position[inv['code']]
         to_remove.append(idx)
         if 'deck_requirements' in inv:
             reqs = inv['deck_requirements']
             for match in re.finditer(r"card:([0-9]+)", reqs):
                 c = match.group(1)
-                idx = code.index(c)
+                idx = position[c]
                 sig.append(data[idx])
                 to_remove.append(idx)
         sigs.append(sig)
@@ -198,36 +206,41 @@ def save_html(data: list[dict[str, str]], template: Path, path: Path):
 def download_cards(data: list[dict[str, str]], save_path: Path):
     """download cards from ArkhamDB website
     NOTE: please use carefully to avoid harsh traffic of webpage
+    (concurrent but rate limited, see faq_generator.downloader)
 
     Args:
         data (list[dict[str, str]]): data structure
         save_path (Path): card download path
     """
-    temp_folder = tempfile.TemporaryDirectory()
-    for card in tqdm(data):
+    codes = []
+    for card in data:
         if "back_flavor" in card or "back_text" in card:
-            codes = [card["code"], card["code"]+"b"]
+            codes.extend([card["code"], card["code"]+"b"])
         else:
-            codes = [card["code"]]
-        
-        for code in codes:
-            path = save_path / (code + ".jpg")
-            if not path.is_file() or path.stat().st_size < 1000:
-                url = 'https://arkhamdb.com/bundles/cards/%s.png'%code
-                req = requests.get(url)
-                if not req.ok:
-                    url = 'https://arkhamdb.com/bundles/cards/%s.jpg'%code
-                    req = requests.get(url)
-                buffer = np.frombuffer(req.content, np.uint8)
-                if buffer.size == 0:
-                    image = np.zeros((1, 1), dtype=np.uint8)
-                else:
-                    image = cv2.imdecode(buffer, cv2.IMREAD_UNCHANGED)
-                    image = cv2.resize(image, (300, 418) if image.shape[0]>image.shape[1] else (418, 300))
-                temp_path = temp_folder.name + f"/{code}.jpg"
-                res = cv2.imwrite(temp_path, image)
-                assert res, f"write fail: {path}"
-                shutil.move(temp_path, path)
+            codes.append(card["code"])
+    codes = [
+        code for code in codes
+        if not (save_path / (code + ".jpg")).is_file() or (save_path / (code + ".jpg")).stat().st_size < 1000
+    ]
+
+    # original images (png, otherwise jpg) are kept in .cache/card_list: an interrupted run resumes
+    jobs = [arkhamdb_job(IMAGE_CACHE, code) for code in codes]
+    with tqdm(total=len(jobs)) as bar:
+        results = Downloader().download(jobs, lambda _: bar.update())
+    temp_folder = tempfile.TemporaryDirectory()
+    for code, result in zip(codes, results):
+        path = save_path / (code + ".jpg")
+        found = result.status in ('downloaded', 'not_modified', 'skipped')
+        buffer = np.fromfile(result.job.path, np.uint8) if found else np.zeros(0, np.uint8)
+        if buffer.size == 0:
+            image = np.zeros((1, 1), dtype=np.uint8)
+        else:
+            image = cv2.imdecode(buffer, cv2.IMREAD_UNCHANGED)
+            image = cv2.resize(image, (300, 418) if image.shape[0]>image.shape[1] else (418, 300))
+        temp_path = temp_folder.name + f"/{code}.jpg"
+        res = cv2.imwrite(temp_path, image)
+        assert res, f"write fail: {path}"
+        shutil.move(temp_path, path)
     temp_folder.cleanup()
 
 def arg_parse():
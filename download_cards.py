@@ -9,14 +9,24 @@ Currently, we read following cards:
 
 """
 
-from typing import Iterable, MutableSet, List, Dict
+from typing import Iterable, MutableSet, List, Dict, Optional, Any
 from os import PathLike
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+import hashlib
 import json
+import logging
+import os
 import re
-import requests
+import tempfile
+import unittest
 from tqdm.auto import tqdm
 import cv2 # pip install opencv-python
+from faq_generator.downloader import Downloader, arkhamdb_job
+
+MANIFEST = "refined.json" # in the image folder: source hash -> output hash & size
+SIZE_PORTRAIT = (300, 419) # (width, height)
 
 def get_randomweak(path: PathLike) -> MutableSet[str]:
     """get cards data from randomweak html"""
@@ -45,49 +55,127 @@ def get_json(path: PathLike) -> MutableSet[str]:
     cards = set(x['code'] for x in data)
     return cards
 
-def download_cards(path: PathLike, cards: Iterable[str]) -> None:
-    """download given cards from arkhamdb
+def download_cards(path: PathLike, cards: Iterable[str], refresh: bool = False) -> List[str]:
+    """download given cards from arkhamdb (concurrently, see faq_generator.downloader)
 
     Args:
         path (PathLike): download path as folder
         cards (Iterable[str]): card given as an ID
+        refresh (bool, optional): check existing images are changed (conditional request). Defaults to False.
+
+    Returns:
+        List[str]: cards without image (or failed)
     """
     path = Path(path)
     path.mkdir(exist_ok=True)
-    card_missings = set()
-    for card in cards:
-        file = path / f"{card}.png"
-        if not file.is_file():
-            card_missings.add(card)
-    for card in tqdm(card_missings):
-        file = path / f"{card}.png"
-        url = f'https://arkhamdb.com/bundles/cards/{card}.png'
-        req = requests.get(url, timeout=100)
-        with file.open("wb") as fid:
-            fid.write(req.content)
-
-def refine_images(path: PathLike) -> None:
-    """refine images"""
+    jobs = [arkhamdb_job(path, card) for card in sorted(cards)]
+    with tqdm(total=len(jobs)) as bar:
+        results = Downloader(refresh=refresh).download(jobs, lambda _: bar.update())
+    failures = [Path(x.job.path).stem for x in results if x.status in ('missing', 'failed')]
+    if failures:
+        logging.getLogger('download_cards').warning("no image: %s", ', '.join(failures))
+    return failures
+
+def _hash(path: Path) -> str:
+    with path.open("rb") as fid:
+        return hashlib.sha1(fid.read()).hexdigest()
+
+def refine_image(path: str) -> Optional[Dict[str, Any]]:
+    """resize an image to the card size (runs in a worker process)
+
+    Returns:
+        Optional[Dict[str, Any]]: source & output hash and size, None if the image cannot be decoded
+    """
+    file = Path(path)
+    source = _hash(file)
+    image = cv2.imread(path)
+    if image is None or image.size == 0:
+        return None
+    height, width = image.shape[:2]
+    size = SIZE_PORTRAIT if height > width else SIZE_PORTRAIT[::-1]
+    if (width, height) != size: # already refined: not encoded again
+        image = cv2.resize(image, size)
+        if not cv2.imwrite(path, image):
+            raise OSError(f"write fail: {path}")
+    return {'source': source, 'output': _hash(file), 'width': size[0], 'height': size[1]}
+
+def refine_images(path: PathLike, workers: Optional[int] = None) -> List[str]:
+    """refine images (only new or changed ones, see MANIFEST)
+
+    Args:
+        path (PathLike): image folder
+        workers (Optional[int], optional): number of processes. Defaults to None (cpu count). 1 or less: no process pool.
+
+    Returns:
+        List[str]: removed files which are not valid images (also written in blank_files.txt)
+    """
     path = Path(path)
     if not path.is_dir():
         raise FileNotFoundError(path)
-    log = path / "blank_files.txt"
-    fid = log.open("w", encoding="utf-8")
-    for file in tqdm(path.iterdir()):
-        if file.suffix.lower() != '.png':
-            continue
-        if file.stat().st_size == 0:
-            file.unlink()
-            fid.write(file.name + "\n")
+    path_manifest = path / MANIFEST
+    manifest: Dict[str, Dict[str, Any]] = {}
+    if path_manifest.is_file():
+        with path_manifest.open("r", encoding="utf-8") as fid:
+            manifest = json.load(fid)
+    refined = {x['output'] for x in manifest.values()}
+
+    files = sorted(x for x in path.iterdir() if x.suffix.lower() == '.png')
+    hashes = {file.name: _hash(file) for file in files}
+    todo = [str(file) for file in files if hashes[file.name] not in refined]
+    logging.getLogger('refine_images').info("refine: %d images, %d unchanged", len(todo), len(files) - len(todo))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as executor:
+            results = list(tqdm(executor.map(refine_image, todo, chunksize=8), total=len(todo)))
+    else:
+        results = [refine_image(x) for x in tqdm(todo)]
+
+    blanks = []
+    todo_names = {Path(x).name for x in todo}
+    outputs = {hashes[file.name] for file in files if file.name not in todo_names}
+    for file, result in zip(todo, results):
+        if result is None:
+            Path(file).unlink()
+            blanks.append(Path(file).name)
             continue
-        image = cv2.imread(str(file))
-        image = cv2.resize(image, (300, 419) if image.shape[0]>image.shape[1] else (419, 300))
-        cv2.imwrite(str(file), image)
-    fid.close()
+        manifest[result['source']] = result
+        outputs.add(result['output'])
+    with (path / "blank_files.txt").open("w", encoding="utf-8") as fid:
+        fid.writelines(name + "\n" for name in blanks)
+    # entries of removed or replaced images are dropped
+    manifest = {key: value for key, value in manifest.items() if value['output'] in outputs}
+    with path_manifest.open("w", encoding="utf-8") as fid:
+        json.dump(manifest, fid, indent=1, sort_keys=True)
+    return blanks
+
+class TestRefineImages(unittest.TestCase):
+    """refine test (needs opencv-python)"""
+    def test_refine(self):
+        """only new images are refined, broken ones are removed"""
+        import numpy # pylint: disable=C0415
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder)
+            for name, (width, height) in [('01001.png', (30, 40)), ('01002.png', (40, 30)),
+                                          ('01003.png', SIZE_PORTRAIT)]:
+                self.assertTrue(cv2.imwrite(str(path / name), numpy.zeros((height, width, 3), numpy.uint8)))
+            (path / '01004.png').write_bytes(b'not a png')
+            self.assertEqual(refine_images(path, workers=2), ['01004.png'])
+            sizes = {x.name: cv2.imread(str(x)).shape[:2] for x in path.glob('*.png')}
+            self.assertEqual(sizes, {'01001.png': (419, 300), '01002.png': (300, 419), '01003.png': (419, 300)})
+            def hashes() -> Dict[str, str]: # images & manifest (blank_files.txt is of the last run)
+                return {x.name: _hash(x) for x in [*path.glob('*.png'), path / MANIFEST]}
+            before = hashes()
+
+            # second run: nothing is decoded or written
+            with mock.patch(f"{__name__}.refine_image", side_effect=AssertionError):
+                self.assertEqual(refine_images(path, workers=2), [])
+            self.assertEqual(hashes(), before)
 
 def main():
     """main function: arguparase should be added"""
     # TODO: argparse
+    logging.basicConfig(level=logging.INFO)
     cards_weak = get_randomweak("randomweak.html")
     cards_player = get_json("json/player_cards.json")
     cards_encounter = get_json("json/encounter_cards.json")
@@ -0,0 +1,278 @@
+"""SQLite card database of arkhamdb-json-data
+
+The cards of CardStore (player & encounter, with korean translation) are written to
+a SQLite database (.cache/faq_generator/cards.sqlite3):
+    cards       one row per card, indexed by code, pack, faction, type and xp
+                (data: the whole card as json)
+    cards_fts   FTS5 (trigram) over korean & english names and texts,
+                created on the first search (needs SQLite 3.34+ with FTS5, otherwise
+                search scans the names and texts)
+The database is rebuilt only if the version of CardStore is changed.
+
+Lookups (eg. cards of faq entries) are indexed queries instead of scans over every card.
+
+usage: python -m faq_generator.card_db (path of arkhamdb-json-data) [query]
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+from os import PathLike
+from .load_arkhamdb import CardStore
+
+CARD_DB = os.path.join('.cache', 'faq_generator', 'cards.sqlite3')
+_CHUNK = 500 # parameters per query
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE cards (
+    code TEXT NOT NULL, encounter INTEGER NOT NULL, seq INTEGER NOT NULL,
+    pack_code TEXT, faction_code TEXT, type_code TEXT, xp INTEGER,
+    name TEXT, name_real TEXT, text TEXT, text_real TEXT, data TEXT NOT NULL,
+    PRIMARY KEY (code, encounter)
+);
+CREATE INDEX cards_pack ON cards (pack_code);
+CREATE INDEX cards_faction ON cards (faction_code);
+CREATE INDEX cards_type ON cards (type_code);
+CREATE INDEX cards_xp ON cards (xp);
+"""
+_SCHEMA_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS cards_fts USING fts5 (name, name_real, text, text_real, tokenize='trigram');
+INSERT INTO cards_fts (rowid, name, name_real, text, text_real)
+SELECT rowid, name, name_real, text, text_real FROM cards WHERE NOT EXISTS (SELECT 1 FROM cards_fts);
+"""
+_FILTERS = ('pack_code', 'faction_code', 'type_code', 'xp')
+
+class CardDB:
+    """card database
+
+    Args:
+        path (Optional[PathLike]): database file. Defaults to .cache/faq_generator/cards.sqlite3 (None: in memory).
+    """
+    def __init__(self, path: Optional[PathLike] = CARD_DB):
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(':memory:' if path is None else str(path))
+        self._has_fts: Optional[bool] = None # None: not checked yet
+
+    def __enter__(self) -> 'CardDB':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def version(self) -> Optional[str]:
+        """version of CardStore in the database, None if not built"""
+        try:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.OperationalError:
+            return None
+        return None if row is None else row[0]
+
+    def update(self, store: CardStore) -> bool:
+        """rebuild from store if changed
+
+        Returns:
+            bool: True if rebuilt
+        """
+        version = store.version
+        if self.version() == version:
+            return False
+        with self._conn:
+            for (name,) in self._conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'cards_fts_%'"
+                ).fetchall():
+                self._conn.execute(f"DROP TABLE IF EXISTS {name}")
+            self._conn.executescript(_SCHEMA)
+            seq = 0
+            for _, is_encounter, cards in store.files():
+                for code, card in cards.items():
+                    xp = card.get('xp')
+                    # the first one keeps its position if duplicated (as dict.update)
+                    self._conn.execute(
+                        "INSERT INTO cards VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (code, encounter) DO UPDATE SET "
+                        "pack_code = excluded.pack_code, faction_code = excluded.faction_code, "
+                        "type_code = excluded.type_code, xp = excluded.xp, name = excluded.name, "
+                        "name_real = excluded.name_real, text = excluded.text, "
+                        "text_real = excluded.text_real, data = excluded.data",
+                        (code, int(is_encounter), seq, card.get('pack_code'), card.get('faction_code'),
+                         card.get('type_code'), xp if isinstance(xp, int) else None,
+                         card.get('name'), card.get('name_real'), card.get('text'), card.get('text_real'),
+                         json.dumps(card, ensure_ascii=False))
+                    )
+                    seq += 1
+            self._conn.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+        self._has_fts = None
+        return True
+
+    def _fts(self) -> bool:
+        """create cards_fts if not exists, False if FTS5 (trigram) is not available"""
+        if self._has_fts is None:
+            try:
+                with self._conn:
+                    for sql in _SCHEMA_FTS.strip().split(';\n'):
+                        self._conn.execute(sql)
+                self._has_fts = True
+            except sqlite3.OperationalError:
+                self._has_fts = False
+        return self._has_fts
+
+    def cards(self, codes: Optional[Iterable[str]] = None, encounter: Optional[bool] = None,
+              **filters: Any) -> Dict[str, Dict[str, Any]]:
+        """cards in the order of CardStore (as CardStore.cards)
+
+        Args:
+            codes (Optional[Iterable[str]], optional): codes to get. Defaults to None (all).
+            encounter (Optional[bool], optional): encounter or player cards. Defaults to None (both).
+            filters: pack_code, faction_code, type_code or xp
+
+        Returns:
+            Dict[str, Dict[str, Any]]: code -> card
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        if encounter is not None:
+            where.append("encounter = ?")
+            params.append(int(encounter))
+        for key, value in filters.items():
+            if key not in _FILTERS:
+                raise ValueError(f"filter should be one of {_FILTERS}, but given is {key}")
+            where.append(f"{key} = ?")
+            params.append(value)
+        queries: List[List[Any]] = []
+        if codes is None:
+            queries.append([])
+        else:
+            codes = list(codes)
+            queries.extend(codes[idx:idx+_CHUNK] for idx in range(0, len(codes), _CHUNK))
+        rows = []
+        for chunk in queries:
+            clauses = list(where)
+            if codes is not None:
+                clauses.append("code IN ({})".format(', '.join('?' * len(chunk))))
+            sql = "SELECT seq, code, data FROM cards"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            rows.extend(self._conn.execute(sql, params + chunk).fetchall())
+        rows.sort()
+        return {code: json.loads(data) for _, code, data in rows}
+
+    def search(self, query: str, limit: int = 50) -> List[str]:
+        """codes of cards whose korean/english name or text has query
+
+        Args:
+            query (str): text to find (case insensitive)
+            limit (int, optional): maximum number of results. Defaults to 50.
+
+        Returns:
+            List[str]: codes (names first, then texts)
+        """
+        query = query.strip()
+        if not query:
+            return []
+        if len(query) >= 3 and self._fts():
+            # trigram index: a phrase is a substring match
+            phrase = '"{}"'.format(query.replace('"', '""'))
+            rows = self._conn.execute(
+                "SELECT cards.code FROM cards_fts JOIN cards ON cards.rowid = cards_fts.rowid "
+                "WHERE cards_fts MATCH ? ORDER BY "
+                "(cards_fts.name LIKE ? OR cards_fts.name_real LIKE ?) DESC, cards.seq LIMIT ?",
+                (phrase, f"%{query}%", f"%{query}%", limit)
+            ).fetchall()
+        elif len(query) >= 3:
+            # no FTS5: scan names & texts
+            rows = self._conn.execute(
+                "SELECT code FROM cards WHERE instr(lower(name), lower(?1)) OR instr(lower(name_real), lower(?1)) "
+                "OR instr(lower(text), lower(?1)) OR instr(lower(text_real), lower(?1)) ORDER BY "
+                "(instr(lower(name), lower(?1)) OR instr(lower(name_real), lower(?1))) DESC, seq LIMIT ?2",
+                (query, limit)
+            ).fetchall()
+        else:
+            # too short for trigrams (eg. two syllables): names only
+            rows = self._conn.execute(
+                "SELECT code FROM cards WHERE instr(lower(name), lower(?)) OR instr(lower(name_real), lower(?)) "
+                "ORDER BY seq LIMIT ?", (query, query, limit)
+            ).fetchall()
+        result: List[str] = []
+        for (code,) in rows:
+            if code not in result:
+                result.append(code)
+        return result
+
+class TestCardDB(unittest.TestCase):
+    """card database test"""
+    def test_db(self):
+        """indexed lookups & full text search"""
+        with tempfile.TemporaryDirectory() as folder:
+            path_db = Path(folder) / 'db'
+            files = {
+                'pack/core/core.json': [
+                    {'code': '01001', 'name': 'Roland Banks', 'text': 'After you defeat an enemy: discover 1 clue.',
+                     'pack_code': 'core', 'faction_code': 'guardian', 'type_code': 'investigator'},
+                    {'code': '01020', 'name': 'Machete', 'xp': 0, 'pack_code': 'core',
+                     'faction_code': 'guardian', 'type_code': 'asset'},
+                ],
+                'pack/core/core_encounter.json': [
+                    {'code': '01160', 'name': 'Ghoul Minion', 'pack_code': 'core', 'type_code': 'enemy'}
+                ],
+                'translations/ko/pack/core/core.json': [
+                    {'code': '01001', 'name': '로랜드 뱅크스', 'text': '적을 처치한 후: 단서를 1개 발견합니다.'},
+                    {'code': '01020', 'name': '마체테'},
+                ],
+            }
+            for name, data in files.items():
+                (path_db / name).parent.mkdir(parents=True, exist_ok=True)
+                (path_db / name).write_text(json.dumps(data), encoding='utf-8')
+            store = CardStore(path_db, 'ko', None)
+            with CardDB(os.path.join(folder, 'cards.sqlite3')) as db:
+                self.assertTrue(db.update(store))
+                self.assertFalse(db.update(store))
+                self.assertEqual(db.cards(encounter=False), store.cards('player'))
+                self.assertEqual(list(db.cards(['01160', '01001'])), ['01001', '01160'])
+                self.assertEqual(list(db.cards(type_code='asset', xp=0)), ['01020'])
+                self.assertEqual(db.cards(['01001'], encounter=True), {})
+                self.assertRaises(ValueError, db.cards, name='x')
+                self.assertEqual(db.search('뱅크스'), ['01001'])
+                self.assertEqual(db.search('단서를'), ['01001'])
+                self.assertEqual(db.search('roland'), ['01001'])
+                self.assertEqual(db.search('마체'), ['01020'])
+                self.assertEqual(db.search('ghoul'), ['01160'])
+                self.assertEqual(db.search('없는 카드'), [])
+
+            # full text index is not required for the lookups
+            with CardDB(os.path.join(folder, 'plain.sqlite3')) as db:
+                with mock.patch.object(db, '_fts', return_value=False):
+                    self.assertTrue(db.update(store))
+                    self.assertEqual(list(db.cards(['01160', '01001'])), ['01001', '01160'])
+                    self.assertEqual(db.search('단서를'), ['01001'])
+                    self.assertEqual(db.search('ROLAND'), ['01001'])
+                    self.assertEqual(db.search('enemy'), ['01001'])
+                    self.assertEqual(db.search('없는 카드'), [])
+                self.assertIsNone(db._conn.execute( # pylint: disable=W0212
+                    "SELECT name FROM sqlite_master WHERE name = 'cards_fts'").fetchone())
+
+def main(argv: List[str]) -> None:
+    """build the database, and search if query is given"""
+    if not argv:
+        print(__doc__.strip().splitlines()[-1])
+        return
+    with CardDB() as db:
+        if db.update(CardStore(argv[0], 'ko')):
+            print("card database is built:", CARD_DB)
+        if len(argv) > 1:
+            cards = db.cards(db.search(' '.join(argv[1:])))
+            for code, card in cards.items():
+                print(code, card.get('name'), card.get('name_real', ''))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
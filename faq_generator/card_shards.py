@@ -0,0 +1,122 @@
+"""per-pack shards of card & faq data for newFaqTemplate.html
+
+Instead of the whole json/player_cards.json, json/encounter_cards.json and json/faq.json,
+the page loads a compact card index and the shard of the pack of the selected card:
+
+json/cards/index.json        {"fields": ["code", "name", ...], "player": [[...], ...], "encounter": [...]}
+json/cards/(pack_code).json  {"cards": {code: card}, "faqs": {key: faq}}
+
+Shards are written without indentation, and the names depend only on the pack code,
+so unchanged shards are cached by browsers (files are not rewritten if the content is the same).
+"""
+
+from typing import Any, Dict, List, Iterable
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from os import PathLike
+
+INDEX_FIELDS = ['code', 'name', 'pack_code', 'type_code', 'faction_code', 'xp']
+INDEX_NAME = 'index.json'
+
+def _dump(path: Path, data: Any) -> bool:
+    """write compact json if the content is changed
+
+    Returns:
+        bool: True if written
+    """
+    text = json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    if path.is_file() and path.read_text(encoding='utf-8') == text:
+        return False
+    path.write_text(text, encoding='utf-8')
+    return True
+
+def write_card_shards(
+        faqs: Dict[str, Dict[str, Any]],
+        cards_player: Iterable[Dict[str, Any]],
+        cards_encounter: Iterable[Dict[str, Any]],
+        path_folder: PathLike
+    ) -> List[str]:
+    """write card index and per-pack shards
+
+    Args:
+        faqs (Dict[str, Dict[str, Any]]): faq entries (see FAQGenerator.generate_faq)
+        cards_player (Iterable[Dict[str, Any]]): player cards (see FAQGenerator.generate_card)
+        cards_encounter (Iterable[Dict[str, Any]]): encounter cards
+        path_folder (PathLike): output folder
+
+    Returns:
+        List[str]: names of written files (unchanged files are not written)
+    """
+    path_folder = Path(path_folder)
+    path_folder.mkdir(parents=True, exist_ok=True)
+    index: Dict[str, Any] = {'fields': INDEX_FIELDS}
+    packs: Dict[str, Dict[str, Any]] = {}
+    for name, cards in [('player', cards_player), ('encounter', cards_encounter)]:
+        index[name] = []
+        for card in cards:
+            index[name].append([card.get(x) for x in INDEX_FIELDS])
+            pack = packs.setdefault(card['pack_code'], {'cards': {}, 'faqs': {}})
+            pack['cards'][card['code']] = card
+            for key in card.get('faqs', []):
+                if key in faqs:
+                    pack['faqs'][key] = faqs[key]
+
+    written: List[str] = []
+    if _dump(path_folder / INDEX_NAME, index):
+        written.append(INDEX_NAME)
+    for pack_code, pack in packs.items():
+        if _dump(path_folder / f"{pack_code}.json", pack):
+            written.append(f"{pack_code}.json")
+    names = {INDEX_NAME} | {f"{x}.json" for x in packs}
+    for path in path_folder.glob('*.json'):
+        if path.name not in names:
+            path.unlink() # pack without faq anymore
+    return written
+
+def write_card_shards_from_json(
+        path_faq: PathLike, path_player: PathLike, path_encounter: PathLike,
+        path_folder: PathLike
+    ) -> List[str]:
+    """write_card_shards from the json files of FAQGenerator"""
+    data: List[Any] = []
+    for path in [path_faq, path_player, path_encounter]:
+        with Path(path).open(encoding='utf-8') as fp:
+            data.append(json.load(fp))
+    return write_card_shards(data[0], data[1], data[2], path_folder)
+
+class TestCardShards(unittest.TestCase):
+    """shard test"""
+    def test_shards(self):
+        """index and shards have every card & faq"""
+        faqs = {
+            '코_0000': {'level': 'C', 'card_list': ['01001'], 'text': 'a'},
+            '코_0001': {'level': 'A', 'card_list': ['01001', '02001'], 'text': 'b'},
+        }
+        player = [
+            {'code': '01001', 'name': '로랜드 뱅크스', 'pack_code': 'core', 'type_code': 'investigator',
+             'faction_code': 'guardian', 'faqs': ['코_0000', '코_0001']},
+            {'code': '02001', 'name': '지그', 'pack_code': 'dwl', 'type_code': 'investigator',
+             'faction_code': 'guardian', 'xp': 0, 'faqs': ['코_0001']},
+        ]
+        with tempfile.TemporaryDirectory() as folder:
+            Path(folder, 'old.json').write_text('{}', encoding='utf-8')
+            written = write_card_shards(faqs, player, [], folder)
+            self.assertEqual(sorted(written), ['core.json', 'dwl.json', INDEX_NAME])
+            self.assertEqual(sorted(os.listdir(folder)), ['core.json', 'dwl.json', INDEX_NAME])
+            with open(os.path.join(folder, 'core.json'), encoding='utf-8') as fp:
+                text = fp.read()
+            self.assertNotIn('\n', text)
+            self.assertEqual(json.loads(text)['faqs'], faqs)
+            with open(os.path.join(folder, INDEX_NAME), encoding='utf-8') as fp:
+                index = json.load(fp)
+            self.assertEqual(index['player'][1], ['02001', '지그', 'dwl', 'investigator', 'guardian', 0])
+            self.assertEqual(index['encounter'], [])
+            self.assertEqual(write_card_shards(faqs, player, [], folder), [])
+
+if __name__ == "__main__":
+    write_card_shards_from_json(
+        "json/faq.json", "json/player_cards.json", "json/encounter_cards.json", "json/cards"
+    )
@@ -0,0 +1,165 @@
+"""parallel, cached loading of the source documents of FAQGenerator
+
+Each document (faq_legacy, notes, errata, rule_reference) is read by HTMLReader
+and refined (refine_qna/refine_notes/refine_errata) independently,
+so documents are loaded in a process pool.
+
+Refined entries are cached (pickle) in .cache/faq_generator/documents,
+keyed by the hash of the file, the refine parameters and html_reader.py itself
+((name)-(key).pickle, the previous one of the name is removed):
+a document which is not changed is not parsed at all.
+"""
+
+from typing import Dict, Optional
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from os import PathLike
+from . import html_reader
+from .html_reader import HTMLReader
+
+DOCUMENT_CACHE = os.path.join('.cache', 'faq_generator', 'documents')
+REFINES = ('qna', 'notes', 'errata')
+
+@dataclass(frozen=True)
+class DocumentJob:
+    """document to load
+
+    path: html file
+    refine: 'qna', 'notes' or 'errata'
+    url: url for links in the refined text (notes, errata). Defaults to the file name.
+    """
+    path: str
+    refine: str
+    url: Optional[str] = None
+
+    def __post_init__(self):
+        if self.refine not in REFINES:
+            raise ValueError(f"refine should be one of {REFINES}, but given is {self.refine}")
+
+def load_document(job: DocumentJob) -> HTMLReader:
+    """read & refine (runs in a worker process)"""
+    reader = HTMLReader(job.path)
+    url = job.url if job.url is not None else Path(job.path).name
+    if job.refine == 'qna':
+        return reader.refine_qna()
+    if job.refine == 'notes':
+        return reader.refine_notes(url)
+    return reader.refine_errata(url)
+
+_code_hash: Optional[str] = None
+def _job_key(job: DocumentJob) -> str:
+    global _code_hash # pylint: disable=W0603
+    if _code_hash is None:
+        with open(html_reader.__file__, 'rb') as fp:
+            _code_hash = hashlib.sha1(fp.read()).hexdigest()
+    with open(job.path, 'rb') as fp:
+        file_hash = hashlib.sha1(fp.read()).hexdigest()
+    key = '\n'.join([_code_hash, file_hash, job.refine, str(job.url), Path(job.path).name])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+def load_documents(
+        jobs: Dict[str, DocumentJob],
+        path_cache: Optional[PathLike] = DOCUMENT_CACHE,
+        workers: Optional[int] = None
+    ) -> Dict[str, HTMLReader]:
+    """load documents concurrently, through cache
+
+    Args:
+        jobs (Dict[str, DocumentJob]): name -> document
+        path_cache (Optional[PathLike], optional): cache folder. Defaults to .cache/faq_generator/documents (None: no cache).
+        workers (Optional[int], optional): number of processes. Defaults to None (number of documents to parse).
+            1 or less: no process pool.
+
+    Returns:
+        Dict[str, HTMLReader]: name -> refined entries
+    """
+    logger = logging.getLogger('documents')
+    for job in jobs.values():
+        if not Path(job.path).is_file():
+            raise FileNotFoundError(job.path)
+    result: Dict[str, HTMLReader] = {}
+    keys: Dict[str, str] = {}
+    folder = None if path_cache is None else Path(path_cache)
+    for name, job in jobs.items():
+        if folder is None:
+            continue
+        keys[name] = _job_key(job)
+        path = folder / f"{name}-{keys[name]}.pickle"
+        if path.is_file():
+            try:
+                with path.open('rb') as fp:
+                    result[name] = pickle.load(fp)
+                continue
+            except (OSError, pickle.UnpicklingError, EOFError):
+                logger.warning("broken cache of %s is ignored", job.path)
+
+    misses = [x for x in jobs if x not in result]
+    logger.info("documents: %d cached, %d parsed", len(result), len(misses))
+    if workers is None:
+        workers = len(misses)
+    if workers > 1 and len(misses) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(misses))) as executor:
+            loaded = list(executor.map(load_document, [jobs[x] for x in misses]))
+    else:
+        loaded = [load_document(jobs[x]) for x in misses]
+
+    for name, reader in zip(misses, loaded):
+        result[name] = reader
+        if folder is None:
+            continue
+        folder.mkdir(parents=True, exist_ok=True)
+        for stale in folder.glob(f"{name}-*.pickle"):
+            stale.unlink() # previous version of the document
+        path = folder / f"{name}-{keys[name]}.pickle"
+        with tempfile.NamedTemporaryFile('wb', dir=folder, delete=False) as fp:
+            pickle.dump(reader, fp)
+        os.replace(fp.name, path)
+    return {name: result[name] for name in jobs}
+
+class TestDocuments(unittest.TestCase):
+    """document loading test"""
+    _page = ('<html><body><h2 id="Cost">비용</h2><p>자원을 지불합니다.</p>'
+             '<h2 id="FAQ1">질문</h2><p class="question">Q</p><p class="answer">A</p>'
+             '</body></html>')
+
+    def test_load(self):
+        """pool, cache and invalidation"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'notes.html')
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(self._page)
+            cache = os.path.join(folder, 'cache')
+            jobs = {'notes': DocumentJob(path, 'notes'), 'qna': DocumentJob(path, 'qna')}
+            self.assertRaises(ValueError, DocumentJob, path, 'unknown')
+
+            loaded = load_documents(jobs, cache, workers=2)
+            self.assertEqual(dict(loaded['notes']), dict(load_document(jobs['notes'])))
+            self.assertEqual(loaded['qna']['FAQ1'][2], [('Q', 'A')])
+            self.assertIn('notes.html#Cost', loaded['notes']['Cost'][2])
+            self.assertEqual(len(os.listdir(cache)), 2)
+
+            # cached: the file is not parsed
+            with open(os.path.join(cache, os.listdir(cache)[0]), 'rb') as fp:
+                self.assertIsInstance(pickle.load(fp), HTMLReader)
+            with mock.patch(f"{__name__}.load_document", side_effect=AssertionError):
+                self.assertEqual(load_documents(jobs, cache), loaded)
+
+            # changed file & refine parameter
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(self._page.replace('지불', '소비'))
+            jobs['notes'] = DocumentJob(path, 'notes', 'rr.html')
+            loaded = load_documents(jobs, cache, workers=1)
+            self.assertIn('소비', loaded['notes']['Cost'][2])
+            self.assertIn('rr.html#Cost', loaded['notes']['Cost'][2])
+            self.assertEqual(len(os.listdir(cache)), 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,428 @@
+"""concurrent, polite & resumable downloader (card images of arkhamdb)
+
+    downloader = Downloader()
+    results = downloader.download([DownloadJob('cards/01001.png', (url_png, url_jpg))])
+
+* keep-alive connections are reused (one per host in each worker thread)
+* at most `workers` downloads at once, `connections` requests per host at once,
+  and `rate` requests per second per host
+* a file is written as (name).part and renamed when complete:
+  an interrupted download is resumed with a Range request next time
+* validators (ETag, Last-Modified) are kept in .cache/downloads.json:
+  with refresh=True, existing files are revalidated (304: not downloaded again)
+* 404/410 tries the next url of the job (eg. .png then .jpg), other errors are not written,
+  429/5xx and connection errors are retried with backoff
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import http.client
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from os import PathLike
+
+DOWNLOAD_STATE = os.path.join('.cache', 'downloads.json')
+USER_AGENT = 'arkhamfiles-downloader'
+CHUNK = 1 << 16
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+MISSING_STATUS = frozenset([404, 410])
+
+@dataclass(frozen=True)
+class DownloadJob:
+    """file to download
+
+    path: destination
+    urls: tried in order while the file is missing (404/410)
+    """
+    path: str
+    urls: Tuple[str, ...]
+
+@dataclass
+class DownloadResult:
+    """result of a job
+
+    status: 'downloaded', 'not_modified' (304), 'skipped' (exists), 'missing' (404 for every url) or 'failed'
+    """
+    job: DownloadJob
+    status: str
+    url: Optional[str] = None
+    bytes: int = 0
+    error: Optional[str] = None
+
+class _HostLimit:
+    """concurrent requests & request rate of a host"""
+    def __init__(self, connections: int, rate: Optional[float],
+                 clock: Callable[[], float], sleep: Callable[[float], None]):
+        self._semaphore = threading.BoundedSemaphore(connections)
+        self._interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+        self._clock = clock
+        self._sleep = sleep
+
+    @contextmanager
+    def slot(self):
+        """wait for the turn of a request"""
+        with self._semaphore:
+            with self._lock:
+                now = self._clock()
+                start = max(now, self._next)
+                self._next = start + self._interval
+            if start > now:
+                self._sleep(start - now)
+            yield
+
+class _Retry(Exception):
+    """retryable failure"""
+    def __init__(self, message: str, wait: Optional[float] = None):
+        super().__init__(message)
+        self.wait = wait
+
+class Downloader:
+    """downloader (see module doc)
+
+    Args:
+        workers (int, optional): downloads at once. Defaults to 8.
+        connections (int, optional): requests at once per host. Defaults to 6.
+        rate (Optional[float], optional): requests per second per host. Defaults to 12 (None: no limit).
+        retries (int, optional): retries of 429/5xx/connection errors. Defaults to 3.
+        backoff (float, optional): wait before the n-th retry is backoff * 2^n seconds (or Retry-After). Defaults to 0.5.
+        timeout (float, optional): socket timeout. Defaults to 60.
+        path_state (Optional[PathLike], optional): validators of downloaded files. Defaults to .cache/downloads.json (None: memory only).
+        refresh (bool, optional): revalidate existing files (conditional request). Defaults to False (skipped).
+        content_type (Optional[str], optional): prefix of accepted Content-Type (eg. an html error page is not an image). Defaults to 'image/'.
+        sleep (Callable[[float], None], optional): for test. Defaults to time.sleep.
+    """
+    def __init__(self, workers: int = 8, connections: int = 6, rate: Optional[float] = 12.0,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 60.0,
+                 path_state: Optional[PathLike] = DOWNLOAD_STATE, refresh: bool = False,
+                 content_type: Optional[str] = 'image/', sleep: Callable[[float], None] = time.sleep):
+        self.workers = workers
+        self.connections = connections
+        self.rate = rate
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.path_state = None if path_state is None else Path(path_state)
+        self.refresh = refresh
+        self.content_type = content_type
+        self._sleep = sleep
+        self._logger = logging.getLogger('downloader')
+        self._lock = threading.Lock()
+        self._limits: Dict[str, _HostLimit] = {}
+        self._local = threading.local()
+        self._opened: List[http.client.HTTPConnection] = []
+        self._state: Dict[str, Dict[str, Any]] = {}
+        if self.path_state is not None and self.path_state.is_file():
+            try:
+                self._state = json.loads(self.path_state.read_text(encoding='utf-8'))
+            except ValueError:
+                self._logger.warning("broken download state is ignored: %s", self.path_state)
+
+    def _limit(self, host: str) -> _HostLimit:
+        with self._lock:
+            if host not in self._limits:
+                self._limits[host] = _HostLimit(self.connections, self.rate, time.monotonic, self._sleep)
+            return self._limits[host]
+
+    def _connection(self, scheme: str, host: str) -> http.client.HTTPConnection:
+        """keep-alive connection of this thread"""
+        pool = getattr(self._local, 'pool', None)
+        if pool is None:
+            pool = self._local.pool = {}
+        conn = pool.get((scheme, host))
+        if conn is None:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conn = pool[(scheme, host)] = cls(host, timeout=self.timeout)
+            with self._lock:
+                self._opened.append(conn)
+        return conn
+
+    def _drop(self, scheme: str, host: str) -> None:
+        conn = self._local.pool.pop((scheme, host), None)
+        if conn is not None:
+            conn.close()
+
+    def _save_state(self) -> None:
+        if self.path_state is None:
+            return
+        self.path_state.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            text = json.dumps(self._state, ensure_ascii=False)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.path_state.parent, delete=False) as fp:
+            fp.write(text)
+        os.replace(fp.name, self.path_state)
+
+    def download(self, jobs: Iterable[DownloadJob],
+                 progress: Optional[Callable[[DownloadResult], None]] = None) -> List[DownloadResult]:
+        """download jobs concurrently
+
+        Args:
+            jobs (Iterable[DownloadJob]): files to download
+            progress (Optional[Callable[[DownloadResult], None]], optional): called as each job is done. Defaults to None.
+
+        Returns:
+            List[DownloadResult]: results in the order of jobs
+        """
+        jobs = list(jobs)
+        def job(item: DownloadJob) -> DownloadResult:
+            result = self.fetch(item)
+            if progress is not None:
+                progress(result)
+            return result
+        try:
+            if self.workers <= 1 or len(jobs) <= 1:
+                results = [job(x) for x in jobs]
+            else:
+                with ThreadPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+                    results = list(executor.map(job, jobs))
+        finally:
+            # also if interrupted: validators of partial files are kept for resume
+            self._save_state()
+            with self._lock:
+                opened, self._opened = self._opened, []
+            for conn in opened:
+                conn.close()
+        counts: Dict[str, int] = {}
+        for result in results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        self._logger.info("download: %s (%d bytes)", counts, sum(x.bytes for x in results))
+        return results
+
+    def fetch(self, job: DownloadJob) -> DownloadResult:
+        """download one job (see download)"""
+        path = Path(job.path)
+        if path.is_file() and not self.refresh:
+            return DownloadResult(job, 'skipped')
+        key = str(path.resolve())
+        for url in job.urls:
+            for attempt in range(self.retries + 1):
+                try:
+                    result = self._fetch_url(job, url, path, key)
+                except _Retry as exc:
+                    if attempt >= self.retries:
+                        self._logger.warning("download failed: %s (%s)", url, exc)
+                        return DownloadResult(job, 'failed', url, error=str(exc))
+                    self._sleep(exc.wait if exc.wait is not None else self.backoff * (2 ** attempt))
+                    continue
+                if result is None:
+                    break # missing: next url
+                return result
+        return DownloadResult(job, 'missing')
+
+    def _fetch_url(self, job: DownloadJob, url: str, path: Path, key: str) -> Optional[DownloadResult]:
+        """None if missing, _Retry if retryable"""
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path + ('?' + parts.query if parts.query else '')
+        part = path.with_name(path.name + '.part')
+        with self._lock:
+            state = dict(self._state.get(key, {}))
+        headers = {'User-Agent': USER_AGENT, 'Accept-Encoding': 'identity'}
+        if path.is_file() and state.get('url') == url:
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+        # validators of the partial file (or of the last complete one: If-Range protects a changed file)
+        partial = state.get('partial') or state
+        offset = part.stat().st_size if part.is_file() and partial.get('url') == url else 0
+        validator = partial.get('etag') or partial.get('last_modified')
+        if offset and validator:
+            headers['Range'] = f"bytes={offset}-"
+            headers['If-Range'] = validator
+
+        with self._limit(parts.netloc).slot():
+            conn = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+            except (OSError, http.client.HTTPException) as exc:
+                self._drop(parts.scheme, parts.netloc)
+                raise _Retry(f"{type(exc).__name__}: {exc}") from exc
+            try:
+                return self._receive(job, url, path, part, key, response, offset if 'Range' in headers else 0)
+            except (OSError, http.client.HTTPException) as exc:
+                self._drop(parts.scheme, parts.netloc)
+                raise _Retry(f"{type(exc).__name__}: {exc}") from exc
+
+    def _receive(self, job: DownloadJob, url: str, path: Path, part: Path, key: str,
+                 response: http.client.HTTPResponse, offset: int) -> Optional[DownloadResult]:
+        status = response.status
+        if status != 200 and status != 206:
+            response.read() # keep the connection reusable
+            if status == 304:
+                return DownloadResult(job, 'not_modified', url)
+            if status in MISSING_STATUS:
+                return None
+            if status in RETRY_STATUS:
+                wait = response.getheader('Retry-After')
+                raise _Retry(f"HTTP {status}", float(wait) if wait and wait.isdigit() else None)
+            return DownloadResult(job, 'failed', url, error=f"HTTP {status}")
+        content_type = response.getheader('Content-Type', '')
+        if self.content_type is not None and content_type and not content_type.startswith(self.content_type):
+            response.read()
+            return DownloadResult(job, 'failed', url, error=f"unexpected content type {content_type}")
+
+        validators = {'etag': response.getheader('ETag'), 'last_modified': response.getheader('Last-Modified')}
+        with self._lock:
+            self._state.setdefault(key, {})['partial'] = {'url': url, **validators}
+        resume = status == 206 and offset > 0
+        length = response.getheader('Content-Length')
+        expected = int(length) if length is not None and length.isdigit() else None
+        received = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with part.open('ab' if resume else 'wb') as fp:
+            while True:
+                chunk = response.read(CHUNK)
+                if not chunk:
+                    break
+                fp.write(chunk)
+                received += len(chunk)
+        if expected is not None and received != expected:
+            raise http.client.IncompleteRead(b'', expected - received)
+        os.replace(part, path)
+        with self._lock:
+            self._state[key] = {'url': url, **validators, 'size': path.stat().st_size}
+        return DownloadResult(job, 'downloaded', url, received)
+
+def arkhamdb_job(folder: PathLike, code: str, suffix: str = '.png') -> DownloadJob:
+    """image of a card from arkhamdb (png, otherwise jpg)"""
+    return DownloadJob(
+        str(Path(folder) / f"{code}{suffix}"),
+        tuple(f'https://arkhamdb.com/bundles/cards/{code}.{x}' for x in ['png', 'jpg'])
+    )
+
+class _StandIn(BaseHTTPRequestHandler):
+    """local stand-in of image server (keep-alive, ETag, Range)"""
+    protocol_version = 'HTTP/1.1'
+    state: Dict[str, Any] = {}
+
+    def do_GET(self): # pylint: disable=C0103
+        state = self.state
+        with state['lock']:
+            state['requests'].append((self.path, dict(self.headers)))
+            state['clients'].add(self.client_address)
+            state['active'] += 1
+            state['max_active'] = max(state['max_active'], state['active'])
+            fail = state['fail'].get(self.path, 0)
+            if fail:
+                state['fail'][self.path] = fail - 1
+        try:
+            time.sleep(0.02)
+            if fail:
+                self._send(503, b'busy', 'text/plain')
+            elif self.path not in state['files']:
+                self._send(404, b'not found', 'text/html')
+            else:
+                data, content_type = state['files'][self.path]
+                etag = '"{}"'.format(hash(data) & 0xffffffff)
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(304, b'', content_type, etag)
+                elif self.headers.get('Range') and self.headers.get('If-Range') == etag:
+                    start = int(self.headers['Range'][len('bytes='):-1])
+                    self._send(206, data[start:], content_type, etag)
+                else:
+                    self._send(200, data, content_type, etag)
+        finally:
+            with state['lock']:
+                state['active'] -= 1
+
+    def _send(self, status: int, data: bytes, content_type: str, etag: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if status != 304:
+            self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(data)
+
+    def log_message(self, format, *args): # pylint: disable=W0622
+        pass
+
+class TestDownloader(unittest.TestCase):
+    """downloader test with local stand-in"""
+    def test_download(self):
+        """fallback, status check, retry, conditional request, resume and pooling"""
+        files = {f'/cards/{x:05d}.png': (bytes([x % 256]) * 5000, 'image/png') for x in range(1, 21)}
+        files['/cards/00021.jpg'] = (b'jpg' * 100, 'image/jpeg')
+        files['/cards/00022.png'] = (b'<html>error</html>', 'text/html')
+        state: Dict[str, Any] = {
+            'lock': threading.Lock(), 'requests': [], 'clients': set(), 'active': 0, 'max_active': 0,
+            'files': files, 'fail': {'/cards/00003.png': 2}
+        }
+        handler = type('StandIn', (_StandIn,), {'state': state})
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        endpoint = 'http://127.0.0.1:{}/cards/'.format(server.server_address[1])
+        def job(folder: str, code: str) -> DownloadJob:
+            return DownloadJob(os.path.join(folder, f'{code}.png'),
+                               (endpoint + f'{code}.png', endpoint + f'{code}.jpg'))
+        try:
+            with tempfile.TemporaryDirectory() as folder:
+                path_state = os.path.join(folder, 'state.json')
+                waits: List[float] = []
+                downloader = Downloader(workers=8, connections=3, rate=None, backoff=0.01,
+                                        path_state=path_state, sleep=waits.append)
+                codes = [f'{x:05d}' for x in range(1, 24)]
+                results = downloader.download([job(folder, x) for x in codes])
+                status = {os.path.basename(x.job.path): x.status for x in results}
+                self.assertEqual(status['00001.png'], 'downloaded')
+                self.assertEqual(status['00021.png'], 'downloaded') # jpg
+                self.assertEqual(status['00022.png'], 'failed') # html page is not an image
+                self.assertEqual(status['00023.png'], 'missing')
+                self.assertEqual(len(waits), 2) # 503 twice
+                with open(os.path.join(folder, '00002.png'), 'rb') as fp:
+                    self.assertEqual(fp.read(), files['/cards/00002.png'][0])
+                self.assertFalse(os.path.exists(os.path.join(folder, '00022.png')))
+                self.assertFalse([x for x in os.listdir(folder) if x.endswith('.part')])
+                self.assertLessEqual(state['max_active'], 3)
+                self.assertGreater(state['max_active'], 1)
+                self.assertLessEqual(len(state['clients']), 8) # keep-alive connections
+
+                # existing files: no request, or conditional request
+                state['requests'].clear()
+                results = Downloader(path_state=path_state).download([job(folder, x) for x in codes[:20]])
+                self.assertEqual({x.status for x in results}, {'skipped'})
+                self.assertEqual(state['requests'], [])
+                results = Downloader(path_state=path_state, refresh=True).download([job(folder, '00001')])
+                self.assertEqual(results[0].status, 'not_modified')
+                self.assertIn('If-None-Match', state['requests'][-1][1])
+
+                # resume of interrupted download
+                path = os.path.join(folder, '00004.png')
+                os.remove(path)
+                with open(path + '.part', 'wb') as fp:
+                    fp.write(files['/cards/00004.png'][0][:1000])
+                results = Downloader(path_state=path_state).download([job(folder, '00004')])
+                self.assertEqual((results[0].status, results[0].bytes), ('downloaded', 4000))
+                self.assertEqual(state['requests'][-1][1].get('Range'), 'bytes=1000-')
+                with open(path, 'rb') as fp:
+                    self.assertEqual(fp.read(), files['/cards/00004.png'][0])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_rate(self):
+        """requests per second per host"""
+        clock = [0.0]
+        waits: List[float] = []
+        limit = _HostLimit(2, 10.0, lambda: clock[0], waits.append)
+        for _ in range(3):
+            with limit.slot():
+                pass
+        self.assertEqual([round(x, 3) for x in waits], [0.1, 0.2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+"""incremental faq generation
+
+FAQGenerator.generate_faq resolves each row of the spreadsheet into a faq item
+(qna split, links to faq/notes/errata/rule_reference entries).
+RowCache keeps the resolved items by the hash of the row content (not its position),
+with the hash of the referenced html entry:
+an item is reused if neither the row nor the entry is changed,
+so inserting a row does not resolve the rows after it again.
+The key of an item given by its position ((sheet)_(row)) is set by the caller.
+
+diff_faq compares the previous json/faq.json with the new one.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from dataclasses import dataclass, field
+from pathlib import Path
+from os import PathLike
+
+FAQ_CACHE = os.path.join('.cache', 'faq_generator', 'rows.json')
+FORMAT = 3 # bump if the resolution of rows is changed
+
+Ref = Tuple[str, str] # (document, entry name), eg. ('notes', 'Cost')
+RefHash = Callable[[Ref], str]
+
+def content_hash(data: Any) -> str:
+    """hash of json-serializable data"""
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+@dataclass
+class Resolved:
+    """resolved row"""
+    key: Optional[str] = None # None: row is skipped (unless by_row)
+    item: Dict[str, Any] = field(default_factory=dict)
+    messages: List[Dict[str, str]] = field(default_factory=list) # warnings while resolving ({kind, message})
+    ref: Optional[Ref] = None
+    by_row: bool = False # key is given by the position of the row
+
+@dataclass
+class FAQDiff:
+    """difference of faq entries"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self) -> str:
+        return "added {}, changed {}, removed {}".format(
+            len(self.added), len(self.changed), len(self.removed))
+
+def diff_faq(old: Dict[str, Any], new: Dict[str, Any]) -> FAQDiff:
+    """added/changed/removed keys (sorted)"""
+    return FAQDiff(
+        sorted(x for x in new if x not in old),
+        sorted(x for x in new if x in old and old[x] != new[x]),
+        sorted(x for x in old if x not in new)
+    )
+
+class RowCache:
+    """resolved rows by row hash
+
+    Args:
+        path (Optional[PathLike]): cache file. None: no cache (memory only).
+    """
+    def __init__(self, path: Optional[PathLike] = FAQ_CACHE):
+        self.path = None if path is None else Path(path)
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._used: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        if self.path is not None and self.path.is_file():
+            try:
+                with self.path.open(encoding='utf-8') as fp:
+                    data = json.load(fp)
+            except ValueError:
+                data = {}
+            if data.get('format') == FORMAT:
+                self._rows = data.get('rows', {})
+
+    def get(self, row_hash: str, ref_hash: RefHash) -> Optional[Resolved]:
+        """cached resolution of the row
+
+        Args:
+            row_hash (str): hash of the row
+            ref_hash (RefHash): hash of the referenced entry
+
+        Returns:
+            Optional[Resolved]: None if not cached or the referenced entry is changed
+        """
+        entry = self._rows.get(row_hash)
+        if entry is not None:
+            ref = tuple(entry['ref']) if entry['ref'] is not None else None
+            if ref is None or ref_hash(ref) == entry['ref_hash']:
+                self.hits += 1
+                self._used[row_hash] = entry
+                # copy: items are modified while merging
+                return Resolved(entry['key'], json.loads(json.dumps(entry['item'])),
+                                list(entry['messages']), ref, entry['by_row']) # type: ignore
+        self.misses += 1
+        self._used.pop(row_hash, None)
+        return None
+
+    def put(self, row_hash: str, resolved: Resolved, ref_hash: RefHash) -> None:
+        """store resolution (see get)"""
+        self._used[row_hash] = {
+            'key': resolved.key,
+            'item': json.loads(json.dumps(resolved.item)),
+            'messages': resolved.messages,
+            'ref': resolved.ref,
+            'by_row': resolved.by_row,
+            'ref_hash': ref_hash(resolved.ref) if resolved.ref is not None else None
+        }
+
+    def save(self) -> None:
+        """write rows used in this run (rows not seen anymore are dropped)"""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open('w', encoding='utf-8') as fp:
+            json.dump({'format': FORMAT, 'rows': self._used}, fp, ensure_ascii=False)
+
+class TestRowCache(unittest.TestCase):
+    """row cache test"""
+    def test_cache(self):
+        """reuse unless row or entry is changed"""
+        entries = {('notes', 'Cost'): 'a'}
+        ref_hash = lambda ref: content_hash(entries.get(ref))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'rows.json')
+            cache = RowCache(path)
+            self.assertIsNone(cache.get('r1', ref_hash))
+            cache.put('r1', Resolved('코_0001', {'card_list': ['01001'], 'text': 'a'},
+                                     [], ('notes', 'Cost')), ref_hash)
+            cache.put('r2', Resolved(), ref_hash)
+            cache.put('r3', Resolved(None, {'text': 'c'}, by_row=True), ref_hash)
+            cache.save()
+
+            cache = RowCache(path)
+            resolved = cache.get('r1', ref_hash)
+            self.assertEqual(resolved.key, '코_0001')
+            resolved.item['card_list'].append('01002') # not shared
+            self.assertEqual(cache.get('r1', ref_hash).item['card_list'], ['01001'])
+            self.assertIsNone(cache.get('r2', ref_hash).key)
+            self.assertTrue(cache.get('r3', ref_hash).by_row) # key is given by the position
+            entries[('notes', 'Cost')] = 'b'
+            self.assertIsNone(cache.get('r1', ref_hash))
+            self.assertEqual((cache.hits, cache.misses), (4, 1))
+            cache.save()
+            self.assertEqual(sorted(RowCache(path)._rows), ['r2', 'r3']) # pylint: disable=W0212
+
+    def test_diff(self):
+        """added/changed/removed"""
+        diff = diff_faq({'a': 1, 'b': 2, 'c': 3}, {'b': 2, 'c': 4, 'd': 5})
+        self.assertEqual((diff.added, diff.changed, diff.removed), (['d'], ['c'], ['a']))
+        self.assertEqual(str(diff), 'added 1, changed 1, removed 1')
+        self.assertFalse(diff_faq({'a': 1}, {'a': 1}))
+
+if __name__ == "__main__":
+    unittest.main()
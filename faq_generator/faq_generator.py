@@ -11,18 +11,28 @@ Please check you have the service key
 from typing import Dict, List, Tuple, Any, Optional, Union, Callable
 import re
 import json
+import logging
+import dataclasses
 from pathlib import Path
 from os import PathLike
 from dataclasses import dataclass
 from collections import defaultdict
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build, Resource
-from googleapiclient.http import HttpRequest
-from .html_reader import HTMLReader
-from .load_arkhamdb import load_arkhamdb
+from .documents import DOCUMENT_CACHE, DocumentJob, load_documents
+from .load_arkhamdb import CARD_CACHE, CardStore
+from .card_db import CARD_DB, CardDB
+from .card_shards import write_card_shards
+from .faq_cache import FAQ_CACHE, FAQDiff, Ref, Resolved, RowCache, content_hash, diff_faq
+from .sheets_fetch import GoogleSheetsSource, column_index
+from .sheets_snapshot import SNAPSHOT_DIR, SnapshotSheets, SnapshotStore
+from .tracing import Span, Tracer
 
 EntryKey = str
 
+REGEX_FORMULA = re.compile(r"='?([^']+)?(?:'!)?[A-Z]{1,2}([0-9]+)")
+REGEX_FAQ = re.compile(r"(?:https://arkhamfiles.github.io/)?([a-zA-Z_]+).html#([a-zA-Z0-9_]+)#?([0-9]+)?")
+REGEX_QNA = re.compile(r"[Qq]:[ ]?(.+)\n[Aa]:[ ]?(.+)")
+
 KEY_CARDS = [
     'back_text', 'xp',
     'name', 'is_unique', 'faction_code',
@@ -69,10 +79,11 @@ class RowData:
     date: str = ''
     is_formula: bool = False
     is_valid: bool = True
+    COLUMNS = (2, 6) # first & last column to read (0-based, C:G)
     
     def __init__(self, row_data: List[Dict[str, Dict[str, Any]]]):
         super().__init__()
-        ### change below index if spreadsheet order is changed
+        ### change below index (and COLUMNS) if spreadsheet order is changed
         cell_faq = row_data[6] if len(row_data) > 6 else {}
         cell_cardid = row_data[2] if len(row_data) > 6 else {}
         cell_level = row_data[3] if len(row_data) > 6 else {}
@@ -132,9 +143,17 @@ class FAQGenerator:
         path_errata: PathLike, path_rr: PathLike,
         path_report: Optional[PathLike]=None,
         spreadsheets_id: Optional[str]=None,
-        readonly: bool=True
+        readonly: bool=True,
+        path_snapshot: PathLike=SNAPSHOT_DIR,
+        offline: bool=False,
+        endpoint: Optional[str]=None,
+        path_documents: Optional[PathLike]=DOCUMENT_CACHE,
+        tracer: Optional[Tracer]=None
     ):
         self._report_stream = None
+        self.diff = FAQDiff()
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.logger = logging.getLogger('faq_generator')
         """generate class
 
         Args:
@@ -146,8 +165,17 @@ class FAQGenerator:
             path_report (Optional[PathLike], optional): path of report file, no report provided if None. Defaults to None.
             spreadsheets_id (Optional[str], optional): spreadsheets id. do not need if existing in key. Defaults to None.
             readonly (bool, optional): authority scope. Defaults to True.
+            path_snapshot (PathLike, optional): folder of sheet snapshots. Defaults to .cache/sheets.
+            offline (bool, optional): use the last snapshot without network. Defaults to False.
+            endpoint (Optional[str], optional): sheets api endpoint (eg. local stand-in). Defaults to None.
+            path_documents (Optional[PathLike], optional): cache of refined html entries. Defaults to .cache/faq_generator/documents (None: no cache).
+            tracer (Optional[Tracer], optional): records stages & diagnostics (see tracing). Defaults to None (new one).
         """
-        self.credentials, self.spreadsheets_id = self._get_google_credentials(path_key, readonly)
+        if offline:
+            self.credentials = None
+            self.spreadsheets_id = self._get_spreadsheets_id(path_key)
+        else:
+            self.credentials, self.spreadsheets_id = self._get_google_credentials(path_key, readonly)
         if spreadsheets_id is not None:
             self.spreadsheets_id = spreadsheets_id
         elif not self.spreadsheets_id:
@@ -166,18 +194,23 @@ class FAQGenerator:
         if not path_rr.is_file():
             raise FileNotFoundError(path_rr)
 
-        self._service: Resource = build('sheets', 'v4', credentials=self.credentials)
-        self.service: Resource = self._service.spreadsheets() # pylint: disable=E1101
-        request: HttpRequest = self.service.get(spreadsheetId=self.spreadsheets_id, includeGridData=False)
-        info: Dict[str, Any] = request.execute()
-        self.sheets: List[str] = [x['properties']['title'] for x in info['sheets']]
-        if 'Note' in self.sheets:
-            self.sheets.remove('Note')
-           
-        self.entries_qna = HTMLReader(path_qna).refine_qna()
-        self.entries_notes = HTMLReader(path_notes).refine_notes(path_notes.name)
-        self.entries_errata = HTMLReader(path_errata).refine_errata(path_errata.name)
-        self.entries_rr = HTMLReader(path_rr).refine_notes(path_rr.name)
+        source = None if offline else \
+            GoogleSheetsSource(self.credentials, self.spreadsheets_id, endpoint)
+        self.snapshot = SnapshotSheets(source, SnapshotStore(path_snapshot), self.spreadsheets_id)
+
+        paths = [path_qna, path_notes, path_errata, path_rr]
+        with self.tracer.span('documents', bytes=sum(x.stat().st_size for x in paths)) as span:
+            documents = load_documents({
+                'qna': DocumentJob(str(path_qna), 'qna'),
+                'notes': DocumentJob(str(path_notes), 'notes', path_notes.name),
+                'errata': DocumentJob(str(path_errata), 'errata', path_errata.name),
+                'rr': DocumentJob(str(path_rr), 'notes', path_rr.name),
+            }, path_documents)
+            span.set(records=sum(len(x) for x in documents.values()))
+        self.entries_qna = documents['qna']
+        self.entries_notes = documents['notes']
+        self.entries_errata = documents['errata']
+        self.entries_rr = documents['rr']
         
         if isinstance(path_report, PathLike):
             self._report_stream = open(path_report, "w", encoding='utf-8')
@@ -204,6 +237,8 @@ class FAQGenerator:
         scopes = ['https://www.googleapis.com/auth/spreadsheets']
         if readonly:
             scopes[0] += '.readonly'
+        # revision (version) of the spreadsheet for snapshot
+        scopes.append('https://www.googleapis.com/auth/drive.metadata.readonly')
         with path_key.open(encoding='utf-8') as f:
             service_account_info = json.load(f)
         creds = Credentials.from_service_account_info(service_account_info, scopes=scopes)
@@ -212,6 +247,15 @@ class FAQGenerator:
         else:
             sheet_id = ''
         return creds, sheet_id
+
+    @staticmethod
+    def _get_spreadsheets_id(path_key: PathLike) -> str:
+        """spreadsheet id in the service key (without credentials), '' if not exists"""
+        path_key = Path(path_key)
+        if not path_key.is_file():
+            return ''
+        with path_key.open(encoding='utf-8') as f:
+            return json.load(f).get('spreadsheet_id', '')
     
     def _write_report(self, format_text: str, *args, **kwargs) -> int:
         """write report with report IO (only if opened)
@@ -231,119 +275,202 @@ class FAQGenerator:
                  ) -> Dict[str, List[RowData]]:
         """get data from given sheet
 
+        Only the columns are downloaded, page by page and several sheets at once (see sheets_fetch).
+
         Args:
-            sheet_name (str): name of sheet
-            col_start (Union[int, str, None], optional): start column. A-based str or 0-based integer. Defaults to None (free).
-            col_end (Union[int, str, None], optional): end column. A-based str or 0-based integer. Defaults to None (free).
+            col_start (Union[int, str, None], optional): start column. A-based str or 0-based integer. Defaults to None (RowData.COLUMNS).
+            col_end (Union[int, str, None], optional): end column. A-based str or 0-based integer. Defaults to None (RowData.COLUMNS).
         
         Return:
             Dict[str, List[RowData]]: row data as dictionary
                 key: sheet name
                 value: list of row data
         """
-        colrange = _range_tostr(col_start, "A")+":"+_range_tostr(col_end, "ZZ")
-        ranges = [f"'{name}'!{colrange}" for name in self.sheets]
-        fields = "sheets/data/rowData/values/userEnteredValue"
-        fields += ",sheets/data/rowData/values/effectiveValue"
-        fields += ",sheets/data/rowData/values/userEnteredFormat/backgroundColorStyle/rgbColor"
-        response = self.service.get(
-            spreadsheetId=self.spreadsheets_id, ranges=ranges, fields=fields
-        ).execute()
-        result = {}
-        for name, data in zip(self.sheets, response['sheets']):
-            assert len(data['data']) == 1
-            rows = []
-            for row in data['data'][0]['rowData']:
-                rows.append(RowData(row.get('values', [])))
-            result[name] = rows
+        start = RowData.COLUMNS[0] if col_start is None else column_index(_range_tostr(col_start))
+        end = RowData.COLUMNS[1] if col_end is None else column_index(_range_tostr(col_end))
+        if start > end:
+            raise ValueError(f"col_start should not be after col_end: {col_start}, {col_end}")
+        fields = "userEnteredValue,effectiveValue,userEnteredFormat/backgroundColorStyle/rgbColor"
+        with self.tracer.span('sheets') as span:
+            sheets = self.snapshot.get_rows((start, end), fields, exclude=['Note'])
+            result = {}
+            padding: List[Dict[str, Any]] = [{}] * start # RowData index is from column A
+            for name, rows in sheets.items():
+                result[name] = [RowData(padding + values if values else []) for values in rows]
+            span.set(bytes=self.snapshot.size, records=sum(len(x) for x in result.values()),
+                     sheets=len(result), downloaded=self.snapshot.downloaded)
         return result
     
-    def generate_faq(self, path_json: PathLike) -> Dict[str, Dict[str, str]]:
-        # TODO: logger
+    def _ref_hash(self, ref: Ref) -> str:
+        """hash of the html entry referenced by a row (see RowCache)"""
+        doc, name = ref
+        entries = {
+            'faq': self.entries_qna, 'faq_legacy': self.entries_qna,
+            'notes': self.entries_notes, 'errata': self.entries_errata,
+            'rule_reference': self.entries_rr
+        }.get(doc, {})
+        return content_hash(entries.get(name))
+
+    def _resolve_row(self, sheet_name: str, row: RowData) -> Resolved:
+        """faq item of a row (formula row: reference to the row with card_list only)
+
+        The resolution does not depend on the position of the row:
+        the key of a faq row is (sheet)_(row), given by the caller (by_row).
+        """
+        resolved = Resolved()
+        if not row.is_valid:
+            return resolved
+        if row.is_formula:
+            match = REGEX_FORMULA.fullmatch(row.text)
+            if match is None:
+                return resolved
+            x, y = match.groups(sheet_name)
+            resolved.key = "{}_{:04d}".format(x, int(y))
+            resolved.item = {'card_list': [row.card_id]}
+            return resolved
+        item: Dict[str, Any] = {
+            'level': row.faq_level,
+            'date': row.date,
+            'card_list': row.card_id.split(),
+            'text': row.text
+        }
+        if not item['level'] or not item['text']: # sanity
+            return resolved
+        resolved.by_row = True
+        resolved.item = item
+        def warn(kind: str, message: str) -> None:
+            resolved.messages.append({'kind': kind, 'message': message})
+        match = REGEX_QNA.search(item.get('text', ''))
+        if match is not None:
+            item['question_text'], item['answer_text'] = match.groups()
+            item.pop('text')
+        match = REGEX_FAQ.search(item.get('text', ''))
+        if match is not None:
+            doc, name, num = match.groups()
+            resolved.ref = (doc, name)
+            if doc in ['faq', 'faq_legacy']:
+                if name not in self.entries_qna:
+                    warn('unknown_key', f"FAQ is given but key is unknown: {item['text']} for {row.card_id}")
+                else:
+                    num = int(num)-1 if isinstance(num, str) else 0
+                    item['question_text'], item['answer_text'] = self.entries_qna[name][2][num]
+                    item.pop('text')
+            elif doc == 'notes':
+                if name not in self.entries_notes:
+                    warn('unknown_key', f"notes is given but key({name}) is unknown: {item['text']} for {row.card_id}")
+                else:
+                    if num is not None:
+                        warn('number_pick', 'notes does not support number pick.')
+                    item['text'] = self.entries_notes[name][2]
+            elif doc == 'errata':
+                if name not in self.entries_errata:
+                    warn('unknown_key', f"errata is given but key({name}) is unknown: {item['text']} for {row.card_id}")
+                else:
+                    num = int(num)-1 if isinstance(num, str) else 0
+                    item['text'] = self.entries_errata[name][2][num]
+            elif doc == 'rule_reference':
+                if name not in self.entries_rr:
+                    warn('unknown_key', f"rr is given but key({name}) is unknown: {item['text']} for {row.card_id}")
+                else:
+                    if num is not None:
+                        warn('number_pick', 'notes does not support number pick.')
+                    item['text'] = self.entries_rr[name][2]
+            else:
+                warn('unknown_link', f"unknown link is given: {item['text']}")
+        return resolved
+
+    def generate_faq(self, path_json: PathLike,
+                     path_cache: Optional[PathLike]=FAQ_CACHE) -> Dict[str, Dict[str, str]]:
+        """generate faq json from the spreadsheet
+
+        Rows are resolved incrementally: a row is resolved again
+        only if the row or the html entry linked from the row is changed (see faq_cache).
+
+        Args:
+            path_json (PathLike): output json (not written if nothing is changed)
+            path_cache (Optional[PathLike], optional): cache of resolved rows. Defaults to .cache/faq_generator/rows.json (None: no cache).
+
+        Returns:
+            Dict[str, Dict[str, str]]: faq entries. The difference from the previous json is self.diff.
+        """
         path_json = Path(path_json)
-        data = self.get_data()
-        result: Dict[str, Dict[str, str]] = {}
-        regex_formula = re.compile(r"='?([^']+)?(?:'!)?[A-Z]{1,2}([0-9]+)")
-        regex_faq = re.compile(r"(?:https://arkhamfiles.github.io/)?([a-zA-Z_]+).html#([a-zA-Z0-9_]+)#?([0-9]+)?")
-        regex_qna = re.compile(r"[Qq]:[ ]?(.+)\n[Aa]:[ ]?(.+)")
+        with self.tracer.span('generate_faq'):
+            data = self.get_data()
+            with self.tracer.span('resolve') as resolve:
+                result = self._resolve_rows(data, path_cache, resolve)
+
+            old: Dict[str, Any] = {}
+            if path_json.is_file():
+                with path_json.open("r", encoding="utf-8") as fp:
+                    old = json.load(fp)
+            self.diff = diff_faq(old, result)
+            self.logger.info("faq: %s (rows resolved %d, reused %d)", self.diff,
+                             resolve.args['resolved'], resolve.args['reused'])
+            for name in ['added', 'changed', 'removed']:
+                keys = getattr(self.diff, name)
+                if keys:
+                    self._write_report("{kwargs[name]}: {kwargs[keys]}\n", name=name, keys=', '.join(keys))
+            if self.diff or not path_json.is_file():
+                with self.tracer.span('write_json', path=str(path_json)) as span:
+                    text = json.dumps(result, ensure_ascii=False, indent=4)
+                    with path_json.open("w", encoding="utf-8") as fp:
+                        fp.write(text)
+                    span.set(bytes=len(text.encode('utf-8')), records=len(result))
+        return result
+
+    def _resolve_rows(self, data: Dict[str, List[RowData]], path_cache: Optional[PathLike],
+                      span: Span) -> Dict[str, Dict[str, Any]]:
+        """faq entries of rows (see generate_faq), with counts in span"""
+        cache = RowCache(path_cache)
+        result: Dict[str, Dict[str, Any]] = {}
         for sheet_name, rows in data.items():
             for i, row in enumerate(rows[1:]):
-                if not row.is_valid:
+                # content only: an inserted row does not change the hash of the rows after it
+                row_hash = content_hash([sheet_name, dataclasses.astuple(row)])
+                resolved = cache.get(row_hash, self._ref_hash)
+                if resolved is None:
+                    resolved = self._resolve_row(sheet_name, row)
+                    cache.put(row_hash, resolved, self._ref_hash)
+                if resolved.by_row:
+                    resolved.key = f"{sheet_name}_{i:04d}"
+                for message in resolved.messages:
+                    # i is 0-based after the header: row number of the sheet is i+2
+                    self.logger.warning("%s (%s, row %d)", message['message'], sheet_name, i + 2)
+                    self._write_report("{kwargs[kind]}: {kwargs[message]}\n", **message)
+                    self.tracer.diagnostic(message['kind'], message['message'], sheet=sheet_name,
+                                           row=i + 2, key=resolved.key, card=row.card_id,
+                                           ref=list(resolved.ref) if resolved.ref else None)
+                key, item = resolved.key, resolved.item
+                if key is None:
                     continue
-                if row.is_formula:
-                    match = regex_formula.fullmatch(row.text)
-                    if match is None:
-                        continue
-                    x, y = match.groups(sheet_name)
-                    key = "{}_{:04d}".format(x, int(y))
+                if 'level' not in item: # formula
                     if key in result:
-                        result[key]['card_list'].append(row.card_id)
+                        result[key]['card_list'].extend(item['card_list'])
                     else:
-                        result[key] = {'card_list': [row.card_id]}
-                    continue
-                key = f"{sheet_name}_{i:04d}"
-                item = {
-                    'level': row.faq_level,
-                    'date': row.date,
-                    'card_list': row.card_id.split(),
-                    'text': row.text
-                }
-                if not item['level'] or not item['text']: # sanity
+                        result[key] = item
                     continue
-                match = regex_qna.search(item.get('text', ''))
-                if match is not None:
-                    item['question_text'], item['answer_text'] = match.groups()
-                    item.pop('text')
-                match = regex_faq.search(item.get('text', ''))
-                if match is not None:
-                    doc, name, num = match.groups()
-                    if doc in ['faq', 'faq_legacy']:
-                        if name not in self.entries_qna:
-                            print(f"FAQ is given but key is unknown: {item['text']} for {row.card_id}")
-                        else:
-                            num = int(num)-1 if isinstance(num, str) else 0
-                            item['question_text'], item['answer_text'] = self.entries_qna[name][2][num]
-                            item.pop('text')
-                    elif doc == 'notes':
-                        if name not in self.entries_notes:
-                            print(f"notes is given but key({name}) is unknown: {item['text']} for {row.card_id}")
-                        else:
-                            if num is not None:
-                                print('notes does not support number pick.')
-                            item['text'] = self.entries_notes[name][2]
-                    elif doc == 'errata':
-                        if name not in self.entries_errata:
-                            print(f"errata is given but key({name}) is unknown: {item['text']} for {row.card_id}")
-                        else:
-                            num = int(num)-1 if isinstance(num, str) else 0
-                            item['text'] = self.entries_errata[name][2][num]
-                    elif doc == 'rule_reference':
-                        if name not in self.entries_rr:
-                            print(f"rr is given but key({name}) is unknown: {item['text']} for {row.card_id}")
-                        else:
-                            if num is not None:
-                                print('notes does not support number pick.')
-                            item['text'] = self.entries_rr[name][2]
-                    else:
-                        print(f"unknown link is given: {item['text']}")
                 if key in result:
                     item['card_list'].extend(result[key]['card_list'])
                 result[key] = item
+        cache.save()
         keys_del = set()
         for key, value in result.items():
             if 'level' not in value:
                 keys_del.add(key)
         for key in keys_del:
             result.pop(key)
-        with path_json.open("w", encoding="utf-8") as fp:
-            json.dump(result, fp, ensure_ascii=False, indent=4)
+        span.set(records=sum(len(x) - 1 for x in data.values() if x), entries=len(result),
+                 resolved=cache.misses, reused=cache.hits)
         return result
     
     def generate_card(
             self, data: Dict[str, Dict[str, str]],
             path_db: PathLike,
             path_player: PathLike, path_encounter: PathLike,
-            overwrite_encounter: bool=False
+            overwrite_encounter: bool=False,
+            path_shards: Optional[PathLike]=None,
+            path_cards: Optional[PathLike]=CARD_CACHE,
+            path_card_db: Optional[PathLike]=CARD_DB
         ) -> None:
         """generate card information for faq entries
 
@@ -353,49 +480,68 @@ class FAQGenerator:
             path_player (PathLike): player card json
             path_encounter (PathLike): encounter card json
             overwrite_encounter (bool, optional): if you want to reset encounter json. Defaults to False.
+            path_shards (Optional[PathLike], optional): folder of card index & per-pack shards (see card_shards). Defaults to None (not written).
+            path_cards (Optional[PathLike], optional): cache of the card store. Defaults to .cache/faq_generator/arkhamdb (None: no cache).
+            path_card_db (Optional[PathLike], optional): card database. Defaults to .cache/faq_generator/cards.sqlite3 (None: in memory).
         """
         path_player = Path(path_player)
         path_encounter = Path(path_encounter)
         
-        # load card data from arkhamdb-json-data repo
-        data_player = load_arkhamdb(path_db, 'player', 'ko')
-        data_encounter = load_arkhamdb(path_db, 'encounter', 'ko')
-        
-        # we only use several key...
-        for key, value in data_player.items():
-            data_player[key] = {k: v for k, v in value.items() if k in KEY_CARDS}
-        for key, value in data_encounter.items():
-            data_encounter[key] = {k: v for k, v in value.items() if k in KEY_CARDS}
+        with self.tracer.span('generate_card'):
+            # extract only faq-related cards
+            faq_lists: Dict[str, List[str]] = defaultdict(list)
+            for key, entry in data.items():
+                for card in entry['card_list']:
+                    faq_lists[card].append(key)
+
+            # load card data from arkhamdb-json-data repo (indexed card database, see card_db)
+            with CardDB(path_card_db) as card_db:
+                with self.tracer.span('load_arkhamdb') as span:
+                    store = CardStore(path_db, 'ko', path_cards)
+                    span.set(files=sum(1 for _ in store.files()), parsed=store.loaded,
+                             rebuilt=card_db.update(store))
+                with self.tracer.span('card_query') as span:
+                    data_player = card_db.cards(faq_lists, encounter=False)
+                    data_encounter = card_db.cards(faq_lists, encounter=True)
+                    span.set(records=len(data_player) + len(data_encounter))
+            for code in faq_lists:
+                if code not in data_player and code not in data_encounter:
+                    self.tracer.diagnostic('unknown_card', f"card {code} is not in arkhamdb-json-data",
+                                           card=code, keys=faq_lists[code])
         
-        # extract only faq-related cards
-        faq_lists: Dict[str, List[str]] = defaultdict(list)
-        for key, entry in data.items():
-            for card in entry['card_list']:
-                faq_lists[card].append(key)
-        data_player = {k: v for k, v in data_player.items() if k in faq_lists}
-        data_encounter = {k: v for k, v in data_encounter.items() if k in faq_lists}
+            # we only use several key...
+            for key, value in data_player.items():
+                data_player[key] = {k: v for k, v in value.items() if k in KEY_CARDS}
+            for key, value in data_encounter.items():
+                data_encounter[key] = {k: v for k, v in value.items() if k in KEY_CARDS}
         
-        # update encounter data from current information if necessary
-        if not overwrite_encounter and path_encounter.is_file():
-            with path_encounter.open("r", encoding="utf-8") as fp:
-                data_enc: List[Dict[str, Any]] = json.load(fp)
-            for item in data_enc:
-                if item['code'] in data_encounter:
-                    for k, v in item.items():
-                        data_encounter[item['code']][k] = v
+            # update encounter data from current information if necessary
+            if not overwrite_encounter and path_encounter.is_file():
+                with path_encounter.open("r", encoding="utf-8") as fp:
+                    data_enc: List[Dict[str, Any]] = json.load(fp)
+                for item in data_enc:
+                    if item['code'] in data_encounter:
+                        for k, v in item.items():
+                            data_encounter[item['code']][k] = v
         
-        # always update faq_list key
-        for key, faq in faq_lists.items():
-            if key in data_player:
-                data_player[key]["faqs"] = faq
-            if key in data_encounter:
-                data_encounter[key]["faqs"] = faq
+            # always update faq_list key
+            for key, faq in faq_lists.items():
+                if key in data_player:
+                    data_player[key]["faqs"] = faq
+                if key in data_encounter:
+                    data_encounter[key]["faqs"] = faq
         
-        # then, write
-        with path_player.open("w", encoding='utf-8') as fp:
-            json.dump(list(data_player.values()), fp, indent=4, ensure_ascii=False, sort_keys=True)
-        with path_encounter.open("w", encoding='utf-8') as fp:
-            json.dump(list(data_encounter.values()), fp, indent=4, ensure_ascii=False, sort_keys=True)
+            # then, write
+            with self.tracer.span('write_cards') as span:
+                for path, cards in [(path_player, data_player), (path_encounter, data_encounter)]:
+                    text = json.dumps(list(cards.values()), indent=4, ensure_ascii=False, sort_keys=True)
+                    with path.open("w", encoding='utf-8') as fp:
+                        fp.write(text)
+                    span.add('bytes', len(text.encode('utf-8')))
+                    span.add('records', len(cards))
+            if path_shards is not None:
+                with self.tracer.span('card_shards'):
+                    write_card_shards(data, data_player.values(), data_encounter.values(), path_shards)
 
 if __name__ == "__main__":
     gen = FAQGenerator(
@@ -4,16 +4,28 @@ target files:
 raw/faq_legacy.html
 raw/notes.html
 raw/errata.html
+raw/rule_reference.html
 
 All other files are not tested, but may work.
+
+By default, the file is read in one streaming pass (_StreamReader):
+only the contents of the current header/item are kept in memory.
+The result is the same as walking the BeautifulSoup tree (html.parser)
+with find_next, which is still available with streaming=False.
+The tree rules of bs4 are shared with html_generator.header_collector
+(see html_generator.soup_stream).
 """
 
 from typing import Dict, List, Tuple, Optional, Any, TypeVar
 from os import PathLike
 from pathlib import Path
+import os
 import re
-from bs4 import BeautifulSoup
+import tempfile
+import unittest
 from bs4.element import Tag
+from html_generator.parser import make_soup, set_backend
+from html_generator.soup_stream import AttrValue, SoupStream, end_tag, serialize_string, start_tag
 
 # ItemType = Tuple[str, List[str], str, str] # tag, class, content, style if any
 ItemType = Any
@@ -22,18 +34,110 @@ DataType = Dict[str, ContentType] # key=id
 
 Self = TypeVar("Self", bound="HTMLReader")
 
+_re_tagname = re.compile(r"h[0-9]")
+_ITEMS = frozenset(["p", "li", "td"])
+
+class _StreamReader(SoupStream):
+    """(id -> (level, title, items)) of a document in one pass
+
+    Serialized contents of open headers/items are collected in parts
+    (only while any of them is open), and each one takes its slice when it is closed.
+    Like str() of BeautifulSoup nodes, text & comments directly in the element are raw,
+    so they are kept as (depth, raw, serialized).
+    """
+    def __init__(self, reader: DataType):
+        super().__init__()
+        self._reader = reader
+        self._parts: List[Any] = [] # str or (depth, raw, serialized)
+        self._captures: List[Tuple[int, int, Any]] = [] # (depth, start of parts, target)
+        self._in_html = False
+        self._curr_id: Optional[str] = None
+
+    def _append(self, text: Any) -> None:
+        if self._captures:
+            self._parts.append(text)
+
+    # tree events (see html_generator.soup_stream)
+    def on_string(self, data: str, kind: Optional[str]) -> None:
+        parent = self.open_tags[-1] if self.open_tags else None
+        self._append((len(self.open_tags), data, serialize_string(data, kind, parent)))
+
+    def on_start(self, name: str, attrs: Dict[str, AttrValue]) -> None:
+        if name == 'html':
+            self._in_html = True
+        elif self._in_html and (_re_tagname.search(name) or name in _ITEMS):
+            self._capture(name, attrs)
+        self._append(start_tag(name, attrs))
+
+    def on_end(self, name: str) -> None:
+        # contents of the element are done: close before its end tag
+        self._close_captures(len(self.open_tags))
+        self._append(end_tag(name))
+
+    def _capture(self, tag: str, values: Dict[str, Any]) -> None:
+        if tag[0] == 'h':
+            if 'id' in values:
+                self._curr_id = values['id']
+                level = int(tag[1])
+                self._reader[self._curr_id] = level, '', []
+                target: Any = (self._curr_id, level, self._reader[self._curr_id][2])
+            else:
+                self._curr_id = None
+                return
+        elif self._curr_id is None: # pass if curr_id is None with contents
+            return
+        else:
+            items = self._reader[self._curr_id][2]
+            items.append(None) # filled when closed
+            target = (items, len(items) - 1, tag, values.get('class', []), values.get('style', ''))
+        self._captures.append((len(self.open_tags), len(self._parts) + 1, target))
+
+    def _close_captures(self, depth: int) -> None:
+        """close captures of elements as deep as depth or deeper"""
+        while self._captures and self._captures[-1][0] >= depth:
+            depth, start, target = self._captures.pop()
+            text = ''.join(
+                x if isinstance(x, str) else x[1] if x[0] == depth else x[2]
+                for x in self._parts[start:]
+            )
+            if len(target) == 3:
+                curr_id, level, items = target
+                self._reader[curr_id] = level, text, items
+            else:
+                items, idx, tag, classes, style = target
+                items[idx] = (tag, classes, text, style)
+        if not self._captures:
+            self._parts = []
+
 class HTMLReader(DataType):
-    def __init__(self, path: PathLike):
+    def __init__(self, path: PathLike, streaming: bool = True):
+        """read headers with id and items (p, li, td) after them
+
+        Args:
+            path (PathLike): html file
+            streaming (bool, optional): one streaming pass. Defaults to True.
+                If False, BeautifulSoup (selected parser backend) is used.
+        """
         path = Path(path)
         if not path.is_file():
             raise FileNotFoundError(path)
         super().__init__()
-        self._read(path)
+        if streaming:
+            self._read_stream(path)
+        else:
+            self._read(path)
+
+    def _read_stream(self, path: Path):
+        parser = _StreamReader(self)
+        with path.open(encoding="utf-8") as fp:
+            for line in fp:
+                parser.feed(line)
+        parser.close()
     
     def _read(self, path: Path):
         with path.open(encoding="utf-8") as fp:
-            soup = BeautifulSoup(fp, 'html.parser', from_encoding='utf-8')
-        tagname = re.compile(r"h[0-9]")
+            soup = make_soup(fp, from_encoding='utf-8')
+        tagname = _re_tagname
         tag: Optional[Tag] = soup.find('html')
         curr_id: Optional[str] = None
         while True:
@@ -133,6 +237,48 @@ class HTMLReader(DataType):
                 self[key] = (self[key][0], self[key][1], result)
         return self
 
+class TestHTMLReader(unittest.TestCase):
+    """streaming reader is compatible with the soup reader"""
+    _files = ['raw/faq_legacy.html', 'raw/notes.html', 'raw/errata.html', 'raw/rule_reference.html']
+    _page = ('<!DOCTYPE html><p id="x">before</p><html><body>\n'
+             '<h2 id="a" class=" t  u ">A &amp; <b>B</b><!-- c --></h2>\n'
+             '<ul><li class="question">q &lt;1&gt; &foo; &#65;<p title=\'a"b\'>in <i>it</i></p>\n'
+             '<br></br><img src=x.png><x/> </li><li>open <p>unclosed\n'
+             '<pre>  a  </pre>   \n</ul><h3>no id</h3><p>skip</p>'
+             '<h4 id="b"><td nowrap>cell</td></h4><p>end')
+
+    def setUp(self):
+        set_backend('html.parser')
+
+    def tearDown(self):
+        set_backend(None)
+
+    def test_files(self):
+        """the same entries for the source documents"""
+        files = [x for x in self._files if os.path.isfile(x)]
+        if not files:
+            self.skipTest('raw files are not found (run in the root folder)')
+        for path in files:
+            self.assertEqual(list(HTMLReader(path).items()),
+                             list(HTMLReader(path, streaming=False).items()), path)
+
+    def test_markup(self):
+        """entities, nested items, void and unclosed elements"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'page.html')
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(self._page)
+            reader = HTMLReader(path)
+            self.assertEqual(list(reader.items()),
+                             list(HTMLReader(path, streaming=False).items()))
+        self.assertEqual(list(reader), ['a', 'b'])
+        self.assertEqual(reader['a'][1], 'A & <b>B</b> c ') # direct text is raw (as str())
+        items = reader['a'][2]
+        self.assertEqual([x[0] for x in items], ['li', 'p', 'li', 'p']) # p after h3 without id is skipped
+        self.assertEqual(items[0][1], ['question'])
+        self.assertEqual(items[1][2], 'in <i>it</i>')
+        self.assertEqual(reader['b'][2], [('td', [], 'cell', ''), ('p', [], 'end', '')])
+
 if __name__ == "__main__":
     reader = HTMLReader("../raw/faq_legacy.html")
     reader.refine_qna()
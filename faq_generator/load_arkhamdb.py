@@ -6,12 +6,21 @@ https://github.com/Kamalisk/arkhamdb-json-data
 or forked repo (from local folder)
 """
 
-from typing import Dict, Optional, List, Any
+from typing import Dict, Optional, List, Any, Tuple, Iterator
+import hashlib
 import json
+import os
+import pickle
 import re
+import tempfile
+import time
+import unittest
 from os import PathLike
 from pathlib import Path
 
+CARD_CACHE = os.path.join('.cache', 'faq_generator', 'arkhamdb')
+CACHE_FORMAT = 1 # bump if the merge of translation is changed
+
 def _is_encounter_file(path: Path) -> bool:
     """check path is encounter file or not
     """
@@ -23,6 +32,22 @@ def _is_encounter_file(path: Path) -> bool:
             return True
     return False
 
+def _is_encounter_name(name: str, siblings: Any) -> bool:
+    """_is_encounter_file with the names of files in the folder (no stat)"""
+    if re.fullmatch(r"[a-z]+(?:_encounter)\.json", name) is not None:
+        return True
+    return re.fullmatch(r"[a-z]+c\.json", name) is not None and name[:-6] + "p.json" in siblings
+
+def _merge_translation(data: Dict[str, Dict[str, Any]], data_tr: List[Dict[str, Any]]) -> None:
+    """overlay translated values (original value is kept as (key)_real)"""
+    for card in data_tr:
+        for key, value in card.items():
+            if key == 'code':
+                continue
+            if key in data[card['code']] and data[card['code']][key] != value:
+                data[card['code']][key+"_real"] = data[card['code']][key]
+            data[card['code']][key] = value
+
 def _is_json(path: Path) -> bool:
     """check path is json file or not"""
     return path.suffix.lower() == ".json"
@@ -81,16 +106,183 @@ def load_arkhamdb(
         if file_translation.is_file():
             with file_translation.open(encoding='utf-8') as fid:
                 data_tr: List[Dict[str, Any]] = json.load(fid)
-            for card in data_tr:
-                for key, value in card.items():
-                    if key == 'code':
-                        continue
-                    if key in data[card['code']] and data[card['code']][key] != value:
-                        data[card['code']][key+"_real"] = data[card['code']][key]
-                    data[card['code']][key] = value
+            _merge_translation(data, data_tr)
         result.update(data)
     return result
 
+def _stat(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def _hash(path: Path) -> Optional[str]:
+    try:
+        with path.open('rb') as fid:
+            return hashlib.sha1(fid.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+class CardStore:
+    """consolidated cards of arkhamdb-json-data (player & encounter, with translation)
+
+    Cards of each pack file (merged with its translation) are kept in a cache file
+    (CARD_CACHE/(translation).pickle). A pack file is loaded again only if
+    the file or its translation is changed: mtime & size first, then content hash
+    (eg. a checkout touches mtime only).
+    The order of cards is the same as load_arkhamdb.
+
+    Args:
+        path_db (PathLike): local repository path
+        translation (Optional[str], optional): translation (ex: 'ko'). Defaults to None.
+        path_cache (Optional[PathLike], optional): cache folder. Defaults to CARD_CACHE (None: no cache).
+    """
+    def __init__(self, path_db: PathLike, translation: Optional[str] = None,
+                 path_cache: Optional[PathLike] = CARD_CACHE):
+        self.path_db = Path(path_db)
+        self.translation = translation
+        self.path_cache = None if path_cache is None else \
+            Path(path_cache) / f"{translation or 'original'}.pickle"
+        self.loaded = 0 # number of pack files parsed (not from cache)
+        self._files: List[Tuple[str, bool]] = [] # (relative path, is encounter)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._update()
+
+    def _update(self) -> None:
+        path_original = self.path_db / "pack"
+        if not path_original.is_dir():
+            raise FileNotFoundError(f"{path_original} not exists. It maybe not arkhamdb-json-data repository?")
+        path_translation = path_original if self.translation is None else \
+            self.path_db / "translations" / self.translation / "pack"
+        if not path_translation.is_dir():
+            raise FileNotFoundError(f"{path_translation} not exists. Check translation input: {self.translation}")
+
+        cached: Dict[str, Dict[str, Any]] = {}
+        if self.path_cache is not None and self.path_cache.is_file():
+            try:
+                with self.path_cache.open('rb') as fid:
+                    data = pickle.load(fid)
+                if data.get('format') == CACHE_FORMAT and data.get('path') == str(self.path_db.resolve()):
+                    cached = data['files']
+            except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                pass
+
+        changed = False
+        for folder_cycle in path_original.iterdir():
+            if not folder_cycle.is_dir():
+                continue
+            names = os.listdir(folder_cycle)
+            for name in names:
+                if not _is_json(Path(name)):
+                    continue
+                relative = f"{folder_cycle.name}/{name}"
+                self._files.append((relative, _is_encounter_name(name, names)))
+                file_original = folder_cycle / name
+                file_translation = path_translation / folder_cycle.name / name
+                stats = [_stat(file_original), _stat(file_translation)]
+                entry = cached.get(relative)
+                if entry is not None and entry['stats'] != stats:
+                    hashes = [_hash(file_original), _hash(file_translation)]
+                    if entry['hashes'] == hashes:
+                        entry['stats'] = stats # touched only
+                    else:
+                        entry = None
+                    changed = True
+                if entry is None:
+                    entry = self._load(file_original, file_translation, stats)
+                    changed = True
+                self._entries[relative] = entry
+        if len(cached) != len(self._entries):
+            changed = True # removed files
+        if changed and self.path_cache is not None:
+            self.path_cache.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile('wb', dir=self.path_cache.parent, delete=False) as fid:
+                pickle.dump({
+                    'format': CACHE_FORMAT, 'path': str(self.path_db.resolve()), 'files': self._entries
+                }, fid, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(fid.name, self.path_cache)
+
+    def _load(self, file_original: Path, file_translation: Path,
+              stats: List[Optional[Tuple[int, int]]]) -> Dict[str, Any]:
+        self.loaded += 1
+        with file_original.open(encoding='utf-8') as fid:
+            data = {x['code']: x for x in json.load(fid)}
+        if stats[1] is not None:
+            with file_translation.open(encoding='utf-8') as fid:
+                _merge_translation(data, json.load(fid))
+        return {
+            'stats': stats,
+            'hashes': [_hash(file_original), _hash(file_translation)],
+            'cards': data
+        }
+
+    @property
+    def version(self) -> str:
+        """hash of the loaded files (changed if any pack file or translation is changed)"""
+        data = [self.translation, CACHE_FORMAT] + \
+            [[relative, enc, self._entries[relative]['hashes']] for relative, enc in self._files]
+        return hashlib.sha1(json.dumps(data).encode('utf-8')).hexdigest()
+
+    def files(self) -> Iterator[Tuple[str, bool, Dict[str, Dict[str, Any]]]]:
+        """(relative path, is encounter, cards) of each pack file in order (cards are not copied)"""
+        for relative, is_encounter in self._files:
+            yield relative, is_encounter, self._entries[relative]['cards']
+
+    def cards(self, load_type: str = 'all') -> Dict[str, Dict[str, Any]]:
+        """cards as load_arkhamdb (copies: the result can be modified)
+
+        Args:
+            load_type (str, optional): 'player', 'encounter', 'all'. Defaults to 'all'.
+        """
+        load_type = load_type.lower()
+        if load_type not in ['player', 'encounter', 'all']:
+            raise ValueError(f"load_type should be player, encounter, or all. given: {load_type}")
+        result: Dict[str, Dict[str, Any]] = {}
+        for relative, is_encounter in self._files:
+            if load_type == 'player' and is_encounter or load_type == 'encounter' and not is_encounter:
+                continue
+            result.update((code, dict(card)) for code, card in self._entries[relative]['cards'].items())
+        return result
+
+class TestCardStore(unittest.TestCase):
+    """card store test"""
+    @staticmethod
+    def _write(path: Path, data: Any) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data), encoding='utf-8')
+
+    def test_store(self):
+        """same as load_arkhamdb, reloads changed files only"""
+        with tempfile.TemporaryDirectory() as folder:
+            path_db = Path(folder) / 'db'
+            pack = path_db / 'pack' / 'core'
+            self._write(pack / 'core.json', [{'code': '01001', 'name': 'Roland', 'text': 'a'}])
+            self._write(pack / 'core_encounter.json', [{'code': '01101', 'name': 'Ghoul'}])
+            self._write(path_db / 'pack' / 'dwl' / 'dwlp.json', [{'code': '02001', 'name': 'Zoey'}])
+            self._write(path_db / 'pack' / 'dwl' / 'dwlc.json', [{'code': '02101', 'name': 'Rat'}])
+            self._write(path_db / 'translations' / 'ko' / 'pack' / 'core' / 'core.json',
+                        [{'code': '01001', 'name': '로랜드'}])
+            cache = Path(folder) / 'cache'
+
+            store = CardStore(path_db, 'ko', cache)
+            self.assertEqual(store.loaded, 4)
+            for load_type in ['player', 'encounter', 'all']:
+                expected = load_arkhamdb(path_db, load_type, 'ko')
+                self.assertEqual(list(store.cards(load_type).items()), list(expected.items()))
+            self.assertEqual(store.cards('player')['01001']['name_real'], 'Roland')
+            store.cards()['01001']['name'] = 'x' # copy
+            self.assertEqual(store.cards()['01001']['name'], '로랜드')
+
+            self.assertEqual(CardStore(path_db, 'ko', cache).loaded, 0)
+            os.utime(pack / 'core.json', ns=(time.time_ns(), time.time_ns() + 10**9)) # touched
+            self.assertEqual(CardStore(path_db, 'ko', cache).loaded, 0)
+            self._write(path_db / 'translations' / 'ko' / 'pack' / 'core' / 'core.json',
+                        [{'code': '01001', 'name': '롤랜드'}])
+            store = CardStore(path_db, 'ko', cache)
+            self.assertEqual(store.loaded, 1)
+            self.assertEqual(store.cards()['01001']['name'], '롤랜드')
+
 if __name__ == '__main__':
     data = load_arkhamdb("../../arkhamdb-json-data", 'player', 'ko')
     print(data['02147'])
@@ -0,0 +1,376 @@
+"""fetch of google spreadsheet rows
+
+Sources (access to one spreadsheet):
+    GoogleSheetsSource  googleapiclient (one http connection per thread)
+    HttpSheetsSource    REST endpoints with urllib (eg. a local stand-in, see FakeSheetsServer)
+
+fetch_sheets reads only the given columns (eg. C:G for RowData),
+in pages of rows ('Sheet'!C1:G1000, 'Sheet'!C1001:G2000, ...),
+several sheets at once (bounded by workers),
+and retries with exponential backoff if the quota is exceeded (429) or the server fails (5xx).
+The response of each page is dropped as soon as its rows are taken.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+import json
+import random
+import re
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SHEETS_ENDPOINT = 'https://sheets.googleapis.com'
+DRIVE_ENDPOINT = 'https://www.googleapis.com'
+PAGE_ROWS = 1000
+WORKERS = 4
+RETRY_STATUS = frozenset([429, 500, 502, 503, 504])
+
+Row = List[Dict[str, Any]] # values (cells) of a row
+T = TypeVar('T')
+
+def column_name(index: int) -> str:
+    """0-based column index to A1 notation (0 -> A, 26 -> AA)"""
+    name = ''
+    index += 1
+    while index > 0:
+        index, rest = divmod(index - 1, 26)
+        name = chr(65 + rest) + name
+    return name
+
+def column_index(name: str) -> int:
+    """A1 notation to 0-based column index (A -> 0, AA -> 26)"""
+    index = 0
+    for char in name:
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+def quote_title(title: str) -> str:
+    """sheet title in A1 notation"""
+    return "'{}'".format(title.replace("'", "''"))
+
+class SheetsSource(ABC):
+    """access to one spreadsheet"""
+    spreadsheet_id: str = ''
+
+    @abstractmethod
+    def revision(self) -> Optional[str]:
+        """revision of the spreadsheet, None if unknown"""
+
+    @abstractmethod
+    def sheets(self) -> List[Tuple[str, int]]:
+        """(title, number of rows) of the sheets"""
+
+    @abstractmethod
+    def get(self, ranges: List[str], fields: str) -> Dict[str, Any]:
+        """response of spreadsheets.get with grid data of ranges"""
+
+_SHEETS_FIELDS = 'sheets/properties(title,gridProperties/rowCount)'
+
+def _sheets(info: Dict[str, Any]) -> List[Tuple[str, int]]:
+    return [
+        (x['properties']['title'], x['properties'].get('gridProperties', {}).get('rowCount', 0))
+        for x in info.get('sheets', [])
+    ]
+
+class GoogleSheetsSource(SheetsSource):
+    """googleapiclient source
+
+    Args:
+        credentials (Any): google credentials
+        spreadsheet_id (str): spreadsheet id
+        endpoint (Optional[str]): api endpoint of sheets. Defaults to None (google).
+    """
+    def __init__(self, credentials: Any, spreadsheet_id: str, endpoint: Optional[str] = None):
+        from googleapiclient.discovery import build # pylint: disable=C0415
+        options = {'api_endpoint': endpoint} if endpoint is not None else None
+        self.spreadsheet_id = spreadsheet_id
+        self._credentials = credentials
+        self._local = threading.local()
+        self._sheets = build('sheets', 'v4', credentials=credentials,
+                             client_options=options).spreadsheets() # pylint: disable=E1101
+        self._drive = build('drive', 'v3', credentials=credentials)
+
+    def _http(self) -> Any:
+        """http of the thread (httplib2 is not thread-safe)"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            import google_auth_httplib2 # pylint: disable=C0415
+            import httplib2 # pylint: disable=C0415
+            http = google_auth_httplib2.AuthorizedHttp(self._credentials, http=httplib2.Http())
+            self._local.http = http
+        return http
+
+    def revision(self) -> Optional[str]:
+        try:
+            info = self._drive.files().get( # pylint: disable=E1101
+                fileId=self.spreadsheet_id, fields='version').execute(http=self._http())
+        except Exception: # pylint: disable=W0703
+            return None # eg. no drive scope
+        return info.get('version')
+
+    def sheets(self) -> List[Tuple[str, int]]:
+        return _sheets(self._sheets.get(
+            spreadsheetId=self.spreadsheet_id, fields=_SHEETS_FIELDS
+        ).execute(http=self._http()))
+
+    def get(self, ranges: List[str], fields: str) -> Dict[str, Any]:
+        return self._sheets.get(
+            spreadsheetId=self.spreadsheet_id, ranges=ranges, fields=fields
+        ).execute(http=self._http())
+
+class HttpSheetsSource(SheetsSource):
+    """REST source (urllib)
+
+    Args:
+        spreadsheet_id (str): spreadsheet id
+        token (Optional[str]): OAuth2 access token. Defaults to None.
+        endpoint (str): endpoint of sheets api. Defaults to google.
+        drive_endpoint (Optional[str]): endpoint of drive api. Defaults to google (None: same as endpoint).
+    """
+    def __init__(self, spreadsheet_id: str, token: Optional[str] = None,
+                 endpoint: str = SHEETS_ENDPOINT, drive_endpoint: Optional[str] = DRIVE_ENDPOINT):
+        self.spreadsheet_id = spreadsheet_id
+        self._token = token
+        self._endpoint = endpoint.rstrip('/')
+        self._drive_endpoint = (drive_endpoint or endpoint).rstrip('/')
+
+    def _request(self, url: str, params: List[Any]) -> Dict[str, Any]:
+        request = urllib.request.Request(url + '?' + urllib.parse.urlencode(params))
+        if self._token is not None:
+            request.add_header('Authorization', 'Bearer ' + self._token)
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def revision(self) -> Optional[str]:
+        url = '{}/drive/v3/files/{}'.format(self._drive_endpoint, self.spreadsheet_id)
+        try:
+            return self._request(url, [('fields', 'version')]).get('version')
+        except OSError:
+            return None
+
+    def sheets(self) -> List[Tuple[str, int]]:
+        url = '{}/v4/spreadsheets/{}'.format(self._endpoint, self.spreadsheet_id)
+        return _sheets(self._request(url, [('fields', _SHEETS_FIELDS)]))
+
+    def get(self, ranges: List[str], fields: str) -> Dict[str, Any]:
+        url = '{}/v4/spreadsheets/{}'.format(self._endpoint, self.spreadsheet_id)
+        return self._request(url, [('ranges', x) for x in ranges] + [('fields', fields)])
+
+def _status(exc: Exception) -> Optional[int]:
+    """http status of urllib / googleapiclient error"""
+    status = getattr(exc, 'code', None) # urllib.error.HTTPError
+    if status is None:
+        status = getattr(getattr(exc, 'resp', None), 'status', None) # googleapiclient HttpError
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+@dataclass
+class Retry:
+    """retry policy: wait backoff * 2^n (+ jitter) seconds before the n-th retry"""
+    retries: int = 5
+    backoff: float = 1.0
+    sleep: Callable[[float], None] = field(default=time.sleep, repr=False)
+
+    def call(self, func: Callable[[], T]) -> T:
+        """func() with retries on quota & server errors"""
+        for attempt in range(self.retries + 1):
+            try:
+                return func()
+            except Exception as exc: # pylint: disable=W0703
+                if attempt >= self.retries or _status(exc) not in RETRY_STATUS:
+                    raise
+            self.sleep(self.backoff * (2 ** attempt) * (1 + random.random() / 2))
+        raise AssertionError("unreachable")
+
+def fetch_rows(source: SheetsSource, title: str, row_count: int, columns: Tuple[int, int],
+               fields: str, page_rows: int = PAGE_ROWS, retry: Optional[Retry] = None) -> Iterator[Row]:
+    """rows of a sheet page by page (row i is the i-th row of the sheet)
+
+    Args:
+        source (SheetsSource): spreadsheet
+        title (str): sheet title
+        row_count (int): number of rows of the sheet
+        columns (Tuple[int, int]): first & last column (0-based, inclusive)
+        fields (str): fields of values (eg. 'userEnteredValue,effectiveValue')
+        page_rows (int, optional): rows per request. Defaults to 1000.
+        retry (Optional[Retry], optional): retry policy. Defaults to Retry().
+
+    Yields:
+        Row: values of columns (trailing empty rows of the sheet are omitted)
+    """
+    retry = retry or Retry()
+    fields = 'sheets/data/rowData/values({})'.format(fields)
+    first, last = column_name(columns[0]), column_name(columns[1])
+    pending = 0 # empty rows which are yielded only if more rows follow
+    for start in range(0, row_count, page_rows):
+        end = min(start + page_rows, row_count)
+        ranges = ['{}!{}{}:{}{}'.format(quote_title(title), first, start + 1, last, end)]
+        response = retry.call(lambda: source.get(ranges, fields))
+        sheets = response.get('sheets') or [{}]
+        data = sheets[0].get('data') or [{}]
+        rows = data[0].get('rowData', [])
+        del response, sheets, data
+        for row in rows:
+            values = row.get('values', [])
+            if not values:
+                pending += 1
+                continue
+            for _ in range(pending):
+                yield []
+            pending = 0
+            yield values
+        pending += end - start - len(rows) # trailing empty rows of the page are omitted
+
+def fetch_sheets(source: SheetsSource, sheets: List[Tuple[str, int]], columns: Tuple[int, int],
+                 fields: str, page_rows: int = PAGE_ROWS, workers: int = WORKERS,
+                 retry: Optional[Retry] = None) -> Dict[str, List[Row]]:
+    """rows of sheets, concurrently (see fetch_rows)
+
+    Args:
+        sheets (List[Tuple[str, int]]): (title, number of rows)
+        workers (int, optional): maximum sheets at once. Defaults to 4.
+
+    Returns:
+        Dict[str, List[Row]]: title -> rows (in the order of sheets)
+    """
+    def job(sheet: Tuple[str, int]) -> List[Row]:
+        return list(fetch_rows(source, sheet[0], sheet[1], columns, fields, page_rows, retry))
+    if workers <= 1 or len(sheets) <= 1:
+        return {x[0]: job(x) for x in sheets}
+    with ThreadPoolExecutor(max_workers=min(workers, len(sheets))) as executor:
+        return dict(zip([x[0] for x in sheets], executor.map(job, sheets)))
+
+_re_range = re.compile(r"'((?:[^']|'')*)'!([A-Z]+)([0-9]+):([A-Z]+)([0-9]+)")
+
+class FakeSheetsServer:
+    """local stand-in of sheets & drive endpoints (for test)
+
+    Args:
+        rows (Dict[str, List[Row]]): title -> rows (from column A)
+        version (str): revision
+        failures (int): number of requests answered with 429 first
+    """
+    def __init__(self, rows: Dict[str, List[Row]], version: str = '1', failures: int = 0):
+        self.rows = rows
+        self.version = version
+        self.failures = failures
+        self.requests: List[str] = [] # path & query
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self): # pylint: disable=C0103
+                server._handle(self)
+
+            def log_message(self, format, *args): # pylint: disable=W0622
+                pass
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint = 'http://127.0.0.1:{}'.format(self._httpd.server_address[1])
+
+    def __enter__(self) -> 'FakeSheetsServer':
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        url = urllib.parse.urlparse(handler.path)
+        query = urllib.parse.parse_qs(url.query)
+        with self._lock:
+            self.requests.append(urllib.parse.unquote(handler.path))
+            failed = self.failures > 0
+            self.failures -= 1 if failed else 0
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if failed:
+                self._send(handler, 429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED'}})
+            elif url.path.startswith('/drive/v3/files/'):
+                self._send(handler, 200, {'version': self.version})
+            elif 'ranges' in query:
+                time.sleep(0.01) # let other sheets run at the same time
+                self._send(handler, 200, {'sheets': [self._range(x) for x in query['ranges']]})
+            else:
+                self._send(handler, 200, {'sheets': [
+                    {'properties': {'title': title, 'gridProperties': {'rowCount': len(rows) + 10}}}
+                    for title, rows in self.rows.items()
+                ]})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _range(self, text: str) -> Dict[str, Any]:
+        match = _re_range.fullmatch(text)
+        assert match is not None, text
+        title = match.group(1).replace("''", "'")
+        col0, col1 = column_index(match.group(2)), column_index(match.group(4))
+        rows = [
+            {'values': row[col0:col1+1]} if row[col0:col1+1] else {}
+            for row in self.rows[title][int(match.group(3))-1:int(match.group(5))]
+        ]
+        while rows and not rows[-1]:
+            rows.pop() # as google: trailing empty rows are omitted
+        return {'data': [{'rowData': rows}] if rows else [{}]}
+
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, body: Any) -> None:
+        data = json.dumps(body).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+def _cell(text: str) -> Dict[str, Any]:
+    return {'userEnteredValue': {'stringValue': text}}
+
+class TestSheetsFetch(unittest.TestCase):
+    """fetch test with local fake server"""
+    def test_fetch(self):
+        """columns, pages, retries and concurrency"""
+        self.assertEqual([column_name(x) for x in [0, 6, 25, 26, 701]], ['A', 'G', 'Z', 'AA', 'ZZ'])
+        self.assertEqual([column_index(x) for x in ['A', 'G', 'AA', 'ZZ']], [0, 6, 26, 701])
+        self.assertRaises(TypeError, SheetsSource) # abstract
+        rows = {
+            "코어": [[_cell(f"{x}{y}") for x in 'ABCDEFGH'] for y in range(5)] + [[], [_cell('a')]],
+            "it's": [[], [], [_cell('x'), _cell('y'), _cell('c')]],
+            "빈": [],
+        }
+        with FakeSheetsServer(rows, failures=2) as server:
+            source = HttpSheetsSource('id', endpoint=server.endpoint, drive_endpoint=server.endpoint)
+            waits: List[float] = []
+            retry = Retry(sleep=waits.append)
+            sheets = retry.call(source.sheets)
+            self.assertEqual(sheets[1], ("it's", 13))
+            result = fetch_sheets(source, sheets, (2, 6), 'userEnteredValue', page_rows=2, retry=retry)
+            self.assertEqual(len(waits), 2) # 429 twice
+            self.assertEqual(list(result), ["코어", "it's", "빈"])
+            self.assertEqual(result["코어"][:5], [[_cell(f"{x}{y}") for x in 'CDEFG'] for y in range(5)])
+            self.assertEqual(result["코어"][5:], []) # column A only
+            self.assertEqual(result["it's"], [[], [], [_cell('c')]])
+            self.assertEqual(result["빈"], [])
+            self.assertGreater(server.max_active, 1)
+            ranges = [x for x in server.requests if "코어" in x]
+            self.assertIn("'코어'!C1:G2", ranges[0])
+            self.assertTrue(all('A' not in x.split('!')[1].split('&')[0] for x in ranges))
+            self.assertIn('values(userEnteredValue)', ranges[0])
+
+            server.failures = 10
+            self.assertRaises(urllib.error.HTTPError, fetch_sheets, source, sheets[:1], (2, 6),
+                              'userEnteredValue', retry=Retry(retries=1, sleep=waits.append))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""local snapshot of google spreadsheet data
+
+FAQGenerator reads the sheets through SnapshotSheets:
+    * the response of spreadsheets.get is stored per spreadsheet id & revision
+      (.cache/sheets/(spreadsheet id)/(revision).json)
+    * if the revision is not changed, the snapshot is used without downloading the sheets
+    * offline=True uses the last snapshot without any request
+      (eg. regenerate json/faq.json after html is changed)
+    * older revisions are deleted when a new one is saved (SnapshotStore.keep)
+
+The revision is the version of the file in google drive.
+Sheets API has no revision per sheet, so every sheet is downloaded
+if the revision is changed (only the given columns, see sheets_fetch).
+If the revision is not available (no drive scope), the sheets are always downloaded.
+
+The source is injectable (see sheets_fetch):
+GoogleSheetsSource uses googleapiclient,
+and HttpSheetsSource uses the REST endpoints directly (eg. a local stand-in for test).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from os import PathLike
+from .sheets_fetch import (
+    PAGE_ROWS, WORKERS, FakeSheetsServer, HttpSheetsSource, Retry, Row, SheetsSource, fetch_sheets
+)
+
+SNAPSHOT_DIR = os.path.join('.cache', 'sheets')
+FORMAT = 2 # 1: response of spreadsheets.get, 2: rows of columns
+
+class SnapshotStore:
+    """snapshots of spreadsheets: (folder)/(spreadsheet id)/(revision).json
+
+    Args:
+        folder (PathLike): root folder. Defaults to .cache/sheets.
+        keep (int, optional): number of revisions kept per spreadsheet. Defaults to 1.
+    """
+    def __init__(self, folder: PathLike = SNAPSHOT_DIR, keep: int = 1):
+        self.folder = Path(folder)
+        self.keep = max(keep, 1)
+        self.size = 0 # bytes of the last loaded or saved snapshot
+
+    def _path(self, spreadsheet_id: str, name: str) -> Path:
+        safe = ''.join(x if x.isalnum() or x in '-_' else '_' for x in name)
+        return self.folder / spreadsheet_id / f"{safe}.json"
+
+    def load(self, spreadsheet_id: str, revision: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """snapshot of the revision (None: the last one), None if not exists"""
+        if revision is None:
+            latest = self._path(spreadsheet_id, 'latest')
+            if not latest.is_file():
+                return None
+            revision = json.loads(latest.read_text(encoding='utf-8'))['revision']
+        path = self._path(spreadsheet_id, str(revision))
+        if not path.is_file():
+            return None
+        data = path.read_bytes()
+        self.size = len(data)
+        return json.loads(data.decode('utf-8'))
+
+    def save(self, spreadsheet_id: str, revision: str, snapshot: Dict[str, Any]) -> None:
+        """store snapshot and mark it as the last one"""
+        path = self._path(spreadsheet_id, revision)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(snapshot, ensure_ascii=False).encode('utf-8')
+        path.write_bytes(data)
+        self.size = len(data)
+        latest = self._path(spreadsheet_id, 'latest')
+        latest.write_text(json.dumps({'revision': revision}), encoding='utf-8')
+        self._prune(path, latest)
+
+    def _prune(self, path: Path, latest: Path) -> None:
+        """delete revisions except the last `keep` ones (by modified time)"""
+        olds = sorted((x for x in path.parent.glob('*.json') if x not in (path, latest)),
+                      key=lambda x: x.stat().st_mtime, reverse=True)
+        for old in olds[self.keep - 1:]:
+            old.unlink()
+
+class SnapshotSheets:
+    """sheets data through snapshot
+
+    Args:
+        source (Optional[SheetsSource]): source of data. None for offline.
+        store (SnapshotStore): snapshot store
+        spreadsheet_id (Optional[str]): id (required if source is None)
+        offline (bool, optional): use the last snapshot only. Defaults to False.
+    """
+    def __init__(self, source: Optional[SheetsSource], store: SnapshotStore,
+                 spreadsheet_id: Optional[str] = None, offline: bool = False):
+        self._source = source
+        self._store = store
+        self._offline = offline or source is None
+        if spreadsheet_id is None:
+            if source is None:
+                raise ValueError("spreadsheet id should be given for offline snapshot")
+            spreadsheet_id = source.spreadsheet_id
+        self.spreadsheet_id = spreadsheet_id
+        self.downloaded = False # True if the last get_rows downloaded the sheets
+
+    @property
+    def size(self) -> int:
+        """bytes of the snapshot of the last get_rows"""
+        return self._store.size
+
+    def get_rows(self, columns: Tuple[int, int], fields: str,
+                 exclude: Optional[List[str]] = None, page_rows: int = PAGE_ROWS,
+                 workers: int = WORKERS, retry: Optional[Retry] = None) -> Dict[str, List[Row]]:
+        """rows of every sheet (see sheets_fetch.fetch_sheets)
+
+        Args:
+            columns (Tuple[int, int]): first & last column (0-based, inclusive)
+            fields (str): fields of values (eg. 'userEnteredValue,effectiveValue')
+            exclude (Optional[List[str]]): titles of sheets to skip. Defaults to None.
+            page_rows (int, optional): rows per request. Defaults to 1000.
+            workers (int, optional): sheets downloaded at once. Defaults to 4.
+            retry (Optional[Retry], optional): retry policy. Defaults to Retry().
+
+        Returns:
+            Dict[str, List[Row]]: title -> rows (values of columns, row i is the i-th row of the sheet)
+        """
+        self.downloaded = False
+        key = {'format': FORMAT, 'columns': list(columns), 'fields': fields, 'exclude': sorted(exclude or [])}
+        if self._offline:
+            snapshot = self._store.load(self.spreadsheet_id)
+            if snapshot is None:
+                raise FileNotFoundError(
+                    f"no snapshot of {self.spreadsheet_id} in {self._store.folder} for offline")
+            if snapshot.get('key') != key:
+                raise ValueError(
+                    f"snapshot of {self.spreadsheet_id} is not for {key} (old format?): run once online")
+            return snapshot['sheets']
+        assert self._source is not None
+        revision = self._source.revision()
+        if revision is not None:
+            snapshot = self._store.load(self.spreadsheet_id, revision)
+            if snapshot is not None and snapshot.get('key') == key:
+                return snapshot['sheets']
+        retry = retry or Retry()
+        sheets = [x for x in retry.call(self._source.sheets) if x[0] not in (exclude or [])]
+        rows = fetch_sheets(self._source, sheets, columns, fields, page_rows, workers, retry)
+        self.downloaded = True
+        # revision unknown: still usable for offline
+        self._store.save(self.spreadsheet_id, revision or 'unknown', {'key': key, 'sheets': rows})
+        return rows
+
+def _cell(text: str) -> Dict[str, Any]:
+    return {'userEnteredValue': {'stringValue': text}}
+
+class TestSnapshotSheets(unittest.TestCase):
+    """snapshot test with local endpoint"""
+    def test_snapshot(self):
+        """download only if revision is changed, offline from snapshot"""
+        rows = {'코': [[_cell('x'), _cell('y'), _cell('a')]], 'Note': [[_cell('n')]]}
+        with FakeSheetsServer(rows, version='10') as server, tempfile.TemporaryDirectory() as folder:
+            store = SnapshotStore(folder)
+            source = HttpSheetsSource('sheet-id', endpoint=server.endpoint, drive_endpoint=server.endpoint)
+            sheets = SnapshotSheets(source, store)
+            data = sheets.get_rows((2, 6), 'userEnteredValue', exclude=['Note'])
+            self.assertTrue(sheets.downloaded)
+            self.assertEqual(data, {'코': [[_cell('a')]]})
+            self.assertGreater(sheets.size, 0)
+
+            # same revision: only revision is requested
+            server.requests.clear()
+            self.assertEqual(sheets.get_rows((2, 6), 'userEnteredValue', exclude=['Note']), data)
+            self.assertFalse(sheets.downloaded)
+            self.assertEqual([x.split('?')[0] for x in server.requests], ['/drive/v3/files/sheet-id'])
+
+            # other columns: downloaded again
+            self.assertEqual(sheets.get_rows((0, 0), 'userEnteredValue', exclude=['Note']),
+                             {'코': [[_cell('x')]]})
+            self.assertTrue(sheets.downloaded)
+
+            # new revision
+            server.version = '11'
+            rows['코'] = []
+            data_new = sheets.get_rows((2, 6), 'userEnteredValue', exclude=['Note'])
+            self.assertTrue(sheets.downloaded)
+            self.assertEqual(data_new, {'코': []})
+            self.assertIsNone(store.load('sheet-id', '10')) # older revision is deleted
+            self.assertEqual(sorted(x.name for x in (Path(folder) / 'sheet-id').iterdir()),
+                             ['11.json', 'latest.json'])
+            # keep=2: the previous one is kept
+            server.version = '12'
+            SnapshotSheets(source, SnapshotStore(folder, keep=2)).get_rows(
+                (2, 6), 'userEnteredValue', exclude=['Note'])
+            self.assertIsNotNone(store.load('sheet-id', '11'))
+            data_new = store.load('sheet-id')['sheets']
+
+            # offline: no request
+            server.requests.clear()
+            offline = SnapshotSheets(None, store, 'sheet-id')
+            self.assertEqual(offline.get_rows((2, 6), 'userEnteredValue', exclude=['Note']), data_new)
+            self.assertEqual(server.requests, [])
+            self.assertRaises(ValueError, offline.get_rows, (2, 5), 'userEnteredValue', exclude=['Note'])
+            # other sheets: not the same snapshot
+            self.assertRaises(ValueError, offline.get_rows, (2, 6), 'userEnteredValue')
+            self.assertRaises(FileNotFoundError,
+                              SnapshotSheets(None, store, 'other').get_rows, (2, 6), 'userEnteredValue')
+
+            # same revision, other sheets: downloaded again
+            data_all = sheets.get_rows((2, 6), 'userEnteredValue')
+            self.assertTrue(sheets.downloaded)
+            self.assertEqual(sorted(data_all), ['Note', '코'])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+"""stage-level tracing of the faq pipeline
+
+Tracer records nested spans (wall time of a stage with bytes/records counts)
+and diagnostics (eg. unresolved references of rows):
+
+    tracer = Tracer()
+    with tracer.span('sheets') as span:
+        rows = ...
+        span.set(records=len(rows))
+    tracer.diagnostic('unknown_key', "...", sheet='코어', row=12)
+    tracer.write('.cache/faq_generator/trace.json')
+
+The file is in Chrome trace format (chrome://tracing, https://ui.perfetto.dev):
+{
+    "traceEvents": [{"name": "sheets", "ph": "X", "ts": 0, "dur": 1520.3, "pid": 1, "tid": 1,
+                     "args": {"records": 3120}}, ...],
+    "displayTimeUnit": "ms",
+    "diagnostics": [{"kind": "unknown_key", "message": "...", "sheet": "코어", "row": 12}]
+}
+Diagnostics are also instant events ("ph": "i") in the timeline.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+@dataclass
+class Span:
+    """one stage"""
+    name: str
+    start: float
+    depth: int
+    tid: int
+    end: Optional[float] = None
+    args: Dict[str, Any] = field(default_factory=dict) # eg. bytes, records
+
+    @property
+    def seconds(self) -> float:
+        """duration (0 if not finished)"""
+        return 0.0 if self.end is None else self.end - self.start
+
+    def set(self, **args: Any) -> None:
+        """set counts"""
+        self.args.update(args)
+
+    def add(self, key: str, value: int = 1) -> None:
+        """add to a count"""
+        self.args[key] = self.args.get(key, 0) + value
+
+class Tracer:
+    """spans & diagnostics of one run
+
+    Args:
+        clock (Callable[[], float], optional): seconds. Defaults to time.perf_counter.
+    """
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self._origin = clock()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._tids: Dict[int, int] = {}
+        self.spans: List[Span] = [] # in the order of start
+        self.diagnostics: List[Dict[str, Any]] = []
+        self._instants: List[Dict[str, Any]] = []
+
+    def _tid(self) -> int:
+        ident = threading.get_ident()
+        with self._lock:
+            return self._tids.setdefault(ident, len(self._tids) + 1)
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[Span]:
+        """record the stage in the with block (nested in the current span of the thread)"""
+        stack = self._stack()
+        span = Span(name, self._clock(), len(stack), self._tid(), args=dict(args))
+        with self._lock:
+            self.spans.append(span)
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            span.end = self._clock()
+
+    def diagnostic(self, kind: str, message: str, **fields: Any) -> None:
+        """record a problem (eg. kind='unknown_key' with sheet, row and card)"""
+        item = {'kind': kind, 'message': message, **fields}
+        instant = {'ts': self._clock(), 'tid': self._tid(), 'item': item}
+        with self._lock:
+            self.diagnostics.append(item)
+            self._instants.append(instant)
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """json serializable trace (Chrome trace format)"""
+        def micro(seconds: float) -> float:
+            return round((seconds - self._origin) * 1e6, 1)
+        events: List[Dict[str, Any]] = []
+        for span in self.spans:
+            end = span.end if span.end is not None else self._clock()
+            events.append({
+                'name': span.name, 'ph': 'X', 'pid': 1, 'tid': span.tid,
+                'ts': micro(span.start), 'dur': round((end - span.start) * 1e6, 1),
+                'args': span.args
+            })
+        for instant in self._instants:
+            events.append({
+                'name': instant['item']['kind'], 'ph': 'i', 's': 't', 'pid': 1, 'tid': instant['tid'],
+                'ts': micro(instant['ts']), 'args': instant['item']
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'diagnostics': self.diagnostics}
+
+    def write(self, path: str) -> None:
+        """write trace as json"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fid:
+            json.dump(self.to_chrome(), fid, ensure_ascii=False, default=str)
+
+    def summary(self) -> str:
+        """indented table of spans & number of diagnostics"""
+        lines = []
+        for span in self.spans:
+            counts = ', '.join(f"{key} {value}" for key, value in span.args.items())
+            lines.append("{:<32} {:>10.1f} ms  {}".format(
+                '  ' * span.depth + span.name, span.seconds * 1000, counts).rstrip())
+        lines.append(f"diagnostics: {len(self.diagnostics)}")
+        return '\n'.join(lines)
+
+class TestTracer(unittest.TestCase):
+    """tracer test"""
+    def test_trace(self):
+        """nested spans, diagnostics and chrome trace"""
+        ticks = iter(range(100))
+        tracer = Tracer(clock=lambda: float(next(ticks)))
+        with tracer.span('build') as root:
+            with tracer.span('sheets', sheets=2) as span:
+                span.set(records=10)
+            with tracer.span('resolve') as span:
+                span.add('records', 3)
+                span.add('records')
+                tracer.diagnostic('unknown_key', 'notes key is unknown', sheet='코', row=3)
+            root.set(bytes=100)
+        self.assertEqual([(x.name, x.depth) for x in tracer.spans],
+                         [('build', 0), ('sheets', 1), ('resolve', 1)])
+        self.assertEqual(tracer.spans[1].args, {'sheets': 2, 'records': 10})
+        self.assertEqual(tracer.spans[2].args, {'records': 4})
+        self.assertEqual(tracer.spans[0].seconds, 6.0)
+        self.assertIn('\n  sheets ', tracer.summary())
+        self.assertTrue(tracer.summary().endswith('diagnostics: 1'))
+
+        # other thread: own stack
+        thread = threading.Thread(target=lambda: tracer.span('worker').__enter__())
+        thread.start()
+        thread.join()
+        self.assertEqual((tracer.spans[-1].depth, tracer.spans[-1].tid), (0, 2))
+
+        trace = tracer.to_chrome()
+        events = trace['traceEvents']
+        self.assertEqual(events[0], {'name': 'build', 'ph': 'X', 'pid': 1, 'tid': 1,
+                                     'ts': 1e6, 'dur': 6e6, 'args': {'bytes': 100}})
+        self.assertEqual(events[-1]['ph'], 'i')
+        self.assertEqual(trace['diagnostics'], [
+            {'kind': 'unknown_key', 'message': 'notes key is unknown', 'sheet': '코', 'row': 3}])
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'trace', 'trace.json')
+            tracer.write(path)
+            with open(path, encoding='utf-8') as fid:
+                self.assertEqual(json.load(fid)['diagnostics'], trace['diagnostics'])
+
+if __name__ == "__main__":
+    unittest.main()
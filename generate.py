@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import argparse
+import dataclasses
 import logging
 import time
 import html_generator
@@ -24,37 +25,58 @@ def main():
     parser.add_argument("--reference", action='store_true',
                         help="only if reference generation")
     parser.add_argument("--force", action='store_true',
-                        help="when you want to run code even if raw file is not updated.")
+                        help="when you want to run code even if nothing is updated.")
+    parser.add_argument("--batch", type=str, default=None,
+                        help="path of manifest (json) to generate several files at once")
+    parser.add_argument("--report", type=str, default=None,
+                        help="folder to write timing & match count report (json) per output")
+    parser.add_argument("--minify", action='store_true',
+                        help="remove insignificant whitespace & comments of outputs")
+    parser.add_argument("--gzip", action='store_true',
+                        help="also write precompressed outputs (.gz)")
+    parser.add_argument("--split", action='store_true',
+                        help="write shell pages with lazy loaded sections (see html_generator/split.py)")
+    parser.add_argument("--search", type=str, default=None,
+                        help="with --batch, folder to write search index of outputs (eg. json/search)")
+    parser.add_argument("--watch", action='store_true',
+                        help="with --batch, rebuild on change and serve preview with live reload")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port of preview server for --watch")
     args = parser.parse_args()
-    is_update = args.force or html_generator.check_update_necessary(args.input, args.output)
-    if not is_update:
-        print('%s is not updated (no update exists).'%args.output)
+    # --minify/--gzip/--split override the manifest
+    options = {key: True for key in ['minify', 'gzip', 'split'] if getattr(args, key)}
+    items = [dataclasses.replace(x, **options) for x in html_generator.load_manifest(args.batch)] \
+        if args.batch else []
+    if args.batch and args.watch:
+        watcher = html_generator.Watcher(items, report_dir=args.report)
+        server = html_generator.serve(watcher, args.port)
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+    if args.batch:
+        start_time = time.time()
+        generated = html_generator.generate_batch(items, args.force, report_dir=args.report)
+        if args.search:
+            html_generator.write_search_index(
+                args.search, [x.output for x in items if x.search], force=args.force)
+        print('generate done (%d/%d files): %.2fms'%(
+            len(generated), len(items), (time.time()-start_time)*1000))
         return
-    start_time = time.time()
-    args.input = open(args.input, 'r', encoding='utf-8')
-    args.output = open(args.output, 'w', encoding='utf-8')
     if args.reference:
         logger.debug('reference generation')
-        html_generator.generate_reference(
-            args.input, args.output, args.rr, args.faq
-        )
+        with open(args.input, 'r', encoding='utf-8') as file_input, \
+                open(args.output, 'w', encoding='utf-8') as file_output:
+            html_generator.generate_reference(file_input, file_output, args.rr, args.faq)
         return
-    generators = []
-    if args.nolink:
-        logger.debug('nolink flaged')
-    elif args.raw:
-        logger.debug('raw flaged. input: %s', args.input)
-        generators.append(html_generator.LinkGeneratorRaw(args.input))
-    else:
-        logger.debug('default. input: %s, rr: %s, faq: %s',
-                     args.input, args.rr, args.faq)
-        generators.append(html_generator.LinkGenerator(args.input, args.rr, args.faq))
-    if args.output.name == 'taboo.html':
-        generators.append(html_generator.TabooGenerator())
-    generators.append(html_generator.SymbolGenerator())
-    html_generator.generate(args.input, args.output, generators)
-    args.input.close()
-    args.output.close()
+    start_time = time.time()
+    item = html_generator.BuildItem(
+        args.input, args.output, args.rr, args.faq, args.raw, args.nolink,
+        minify=args.minify, gzip=args.gzip, split=args.split
+    )
+    if not html_generator.generate_batch([item], args.force, report_dir=args.report):
+        return # logged by generate_batch
     print('generate done: %.2fms'%((time.time()-start_time)*1000))
 
 main()
@@ -1,28 +1,50 @@
-"""script for faq generation
-TODO: arguparser
-"""
+"""script for faq generation"""
 
+import argparse
+import logging
 from pathlib import Path
 from faq_generator.faq_generator import FAQGenerator
+from faq_generator.tracing import Tracer
+
+TRACE = ".cache/faq_generator/trace.json"
 
 def main():
-    if not Path("../arkhamdb-json-data").is_dir():
+    """main"""
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="FAQ & card json generator from the spreadsheet")
+    parser.add_argument("--offline", action='store_true',
+                        help="use the last snapshot of the sheets (.cache/sheets), no network")
+    parser.add_argument("--trace", nargs='?', type=str, default=None, const=TRACE,
+                        help=f"write stage timing & diagnostics as Chrome trace json (default: {TRACE})")
+    parser.add_argument("--db", type=str, default="../arkhamdb-json-data",
+                        help="path of arkhamdb-json-data")
+    args = parser.parse_args()
+    if not Path(args.db).is_dir():
         print("please clone arkhamdb-json-data before launch this. (will be updated via script).")
-    
-    generator = FAQGenerator(
-        "api_key.json",
-        "raw/faq_legacy.html",
-        "raw/notes.html",
-        "raw/errata.html",
-        "raw/rule_reference.html"
-    )
-    data = generator.generate_faq("json/faq.json")
-    generator.generate_card(
-        data,
-        "../arkhamdb-json-data",
-        "json/player_cards.json",
-        "json/encounter_cards.json"
-    )
+
+    tracer = Tracer()
+    with tracer.span('generate_faq.py'):
+        generator = FAQGenerator(
+            "api_key.json",
+            "raw/faq_legacy.html",
+            "raw/notes.html",
+            "raw/errata.html",
+            "raw/rule_reference.html",
+            offline=args.offline,
+            tracer=tracer
+        )
+        data = generator.generate_faq("json/faq.json")
+        generator.generate_card(
+            data,
+            args.db,
+            "json/player_cards.json",
+            "json/encounter_cards.json",
+            path_shards="json/cards"
+        )
+    if args.trace is not None:
+        tracer.write(args.trace)
+        print(tracer.summary())
+        print("trace is written:", args.trace)
 
 if __name__ == "__main__":
     main()
@@ -1,6 +1,13 @@
 from .generate import generate
 from .link_generator import LinkGeneratorRaw, LinkGenerator
+from .fused_generator import FusedGenerator, fuse
 from .taboo_generator import TabooGenerator
 from .symbol_generator import SymbolGenerator
 from .reference_generator import generate_reference
-from .mics import check_update_necessary
+from .dependency import DependencyManifest
+from .batch import BuildItem, load_manifest, build_generators, generate_item, generate_batch
+from .report import BuildReport
+from .watch import Watcher, serve
+from .minify import minify, write_output
+from .split import split_sections, write_split
+from .search_index import write_search_index
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+""" batch generation of several documents in one process
+
+Manifest is a json list of documents. Each item has the same options as generate.py:
+[
+    {"input": "raw/rule_reference.html", "output": "rule_reference.html"},
+    {"input": "raw/notes.html", "output": "notes.html", "rr": "rule_reference.html"},
+    {"input": "raw/errata.html", "output": "errata.html", "nolink": true}
+]
+
+"minify": true removes insignificant whitespace & comments of the output,
+"gzip": true also writes (output).gz (see minify),
+"split": true writes a shell page with lazy loaded sections (see split),
+and "search": false excludes the output from the search index (see search_index).
+
+Header id maps of link targets are cached by content hash (see link_generator),
+and SymbolGenerator is shared, so shared targets are parsed once per batch.
+"""
+import json
+import logging
+import os
+import tempfile
+import unittest
+from io import StringIO
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+from .generate import generate
+from .minify import write_output
+from .split import link_source, remove_sections, write_split
+from .generator import GeneratorInterface
+from .link_generator import LinkGenerator, LinkGeneratorRaw
+from .dependency import DependencyManifest
+from .report import BuildReport, report_path
+from .script_factory import ScriptRunner
+from .symbol_generator import SymbolGenerator
+from .taboo_generator import TabooGenerator
+
+@dataclass
+class BuildItem:
+    """one document of the batch"""
+    input: str
+    output: str
+    rr: Optional[str] = None
+    faq: Optional[str] = None
+    raw: bool = False
+    nolink: bool = False
+    taboo: Optional[bool] = None # None: True only if output is taboo.html
+    minify: bool = False
+    gzip: bool = False
+    split: bool = False
+    search: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'BuildItem':
+        """load from manifest item (unknown keys raise ValueError)"""
+        names = {x.name for x in fields(cls)}
+        unknown = set(data.keys()) - names
+        if unknown:
+            raise ValueError("unknown keys in manifest: {}".format(', '.join(sorted(unknown))))
+        return cls(**data)
+
+def load_manifest(path: str) -> List[BuildItem]:
+    """load manifest (json list of documents)
+
+    Args:
+        path (str): path of manifest
+
+    Returns:
+        List[BuildItem]: documents in the given order
+    """
+    with open(path, encoding='utf-8') as fid:
+        data = json.load(fid)
+    if not isinstance(data, list):
+        raise ValueError("manifest should be a list: {}".format(path))
+    return [BuildItem.from_dict(x) for x in data]
+
+def build_generators(item: BuildItem, file_input: TextIO,
+                     symbol: Optional[SymbolGenerator] = None) -> List[GeneratorInterface]:
+    """generator chain for one document
+
+    Args:
+        item (BuildItem): document
+        file_input (TextIO): opened input of the document
+        symbol (Optional[SymbolGenerator]): shared symbol generator. Defaults to new one.
+
+    Returns:
+        List[GeneratorInterface]: generators to apply
+    """
+    logger = logging.getLogger('main')
+    generators: List[GeneratorInterface] = []
+    if item.nolink:
+        logger.debug('nolink flaged')
+    elif item.raw:
+        logger.debug('raw flaged. input: %s', item.input)
+        generators.append(LinkGeneratorRaw(file_input))
+    else:
+        logger.debug('default. input: %s, rr: %s, faq: %s', item.input, item.rr, item.faq)
+        generators.append(LinkGenerator(file_input, item.rr, item.faq))
+    taboo = item.taboo if item.taboo is not None else \
+        os.path.basename(item.output) == 'taboo.html'
+    if taboo:
+        generators.append(TabooGenerator())
+    generators.append(SymbolGenerator() if symbol is None else symbol)
+    return generators
+
+def collect_dependencies(item: BuildItem) -> List[str]:
+    """files used to generate the document
+
+    input, files inserted by script, and link targets
+
+    Args:
+        item (BuildItem): document
+
+    Returns:
+        List[str]: paths of dependencies
+    """
+    with open(item.input, 'r', encoding='utf-8') as file_input:
+        paths = [item.input] + ScriptRunner().dependencies(file_input)
+    if not item.nolink and not item.raw:
+        paths.extend(link_source(x) for x in (item.rr, item.faq)
+                     if x is not None and link_source(x) not in paths)
+    return paths
+
+def generate_item(item: BuildItem, symbol: Optional[SymbolGenerator] = None,
+                  force: bool = False,
+                  manifest: Optional[DependencyManifest] = None,
+                  report_dir: Optional[str] = None) -> bool:
+    """generate one document
+
+    Args:
+        item (BuildItem): document
+        symbol (Optional[SymbolGenerator]): shared symbol generator. Defaults to new one.
+        force (bool, optional): generate even if nothing is changed. Defaults to False.
+        manifest (Optional[DependencyManifest]): manifest to check & record. Defaults to None (always generate).
+        report_dir (Optional[str]): folder to write json report (see report). Defaults to None (no report).
+
+    Returns:
+        bool: True if generated, False if skipped
+    """
+    dependencies = collect_dependencies(item)
+    options = asdict(item)
+    if not force and manifest is not None and \
+            manifest.is_up_to_date(item.output, dependencies, options):
+        return False
+    report = BuildReport(item.output) if report_dir is not None else None
+    with open(item.input, 'r', encoding='utf-8') as file_input:
+        generators = build_generators(item, file_input, symbol)
+        if not item.split:
+            remove_sections(item.output) # stale fragments of split output
+        if item.split or item.minify or item.gzip:
+            buffer = StringIO()
+            generate(file_input, buffer, generators, report)
+            write = write_split if item.split else write_output
+            write(item.output, buffer.getvalue(), item.minify, item.gzip)
+        else:
+            with open(item.output, 'w', encoding='utf-8') as file_output:
+                generate(file_input, file_output, generators, report)
+    if report is not None:
+        report.write(report_path(report_dir, item.output))
+    if manifest is not None:
+        manifest.record(item.output, dependencies, options)
+    return True
+
+def generate_batch(items: Iterable[BuildItem], force: bool = False,
+                   manifest: Optional[DependencyManifest] = None,
+                   report_dir: Optional[str] = None) -> List[str]:
+    """generate all documents in one process
+
+    Documents are generated in the given order,
+    so link target (eg. rule_reference.html) should be placed before its users.
+
+    Args:
+        items (Iterable[BuildItem]): documents
+        force (bool, optional): generate even if nothing is changed. Defaults to False.
+        manifest (Optional[DependencyManifest]): manifest to check & record. Defaults to the one in cache folder.
+        report_dir (Optional[str]): folder to write json report per output. Defaults to None (no report).
+
+    Returns:
+        List[str]: outputs actually generated
+    """
+    logger = logging.getLogger('batch')
+    manifest = DependencyManifest() if manifest is None else manifest
+    symbol = SymbolGenerator()
+    generated: List[str] = []
+    for item in items:
+        if generate_item(item, symbol, force, manifest, report_dir):
+            logger.info("generate %s", item.output)
+            generated.append(item.output)
+        else:
+            logger.info("%s is not updated (no update exists).", item.output)
+    manifest.save()
+    return generated
+
+class TestBatch(unittest.TestCase):
+    """batch test"""
+    def test_batch(self):
+        """batch output is same as one by one"""
+        with tempfile.TemporaryDirectory() as folder:
+            path_rr = os.path.join(folder, 'rr.html')
+            path_doc = os.path.join(folder, 'doc.html')
+            with open(path_rr, 'w', encoding='utf-8') as fid:
+                fid.write('<html><body>\n<h2 id="Cost">비용</h2>\n</body></html>\n')
+            with open(path_doc, 'w', encoding='utf-8') as fid:
+                fid.write('<html><body>\n<h2 id="Pie">파이</h2>\n'
+                          '<p>링크 "파이", 참조 "비용", [action]</p>\n</body></html>\n')
+            path_manifest = os.path.join(folder, 'build.json')
+            with open(path_manifest, 'w', encoding='utf-8') as fid:
+                json.dump([
+                    {'input': path_rr, 'output': path_rr + '.out', 'nolink': True},
+                    {'input': path_doc, 'output': path_doc + '.out', 'rr': path_rr}
+                ], fid)
+            items = load_manifest(path_manifest)
+            manifest = DependencyManifest(os.path.join(folder, 'dependencies.json'))
+            self.assertEqual(len(generate_batch(items, manifest=manifest)), 2)
+            with open(path_doc + '.out', encoding='utf-8') as fid:
+                result = fid.read()
+            self.assertIn('"<a href="#Pie">파이</a>"', result)
+            self.assertIn('<a href="{}#Cost">비용</a>'.format(os.path.relpath(path_rr)), result)
+            self.assertIn('class="icon-action"', result)
+            self.assertEqual(generate_batch(items, manifest=manifest), [])
+            self.assertEqual(len(generate_batch(items, force=True, manifest=manifest)), 2)
+            # link target is changed: both are generated again
+            with open(path_rr, 'a', encoding='utf-8') as fid:
+                fid.write('\n')
+            self.assertEqual(len(generate_batch(items, manifest=manifest)), 2)
+
+    def test_manifest(self):
+        """unknown keys are rejected"""
+        self.assertRaises(ValueError, BuildItem.from_dict, {'input': 'a', 'output': 'b', 'link': 1})
+        item = BuildItem.from_dict({'input': 'a', 'output': 'b', 'nolink': True})
+        self.assertTrue(item.nolink)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+""" on-disk cache keyed by content hash
+
+Values are stored as compact json files:
+(cache folder)/(namespace)/(key).json
+
+The cache folder is '.cache/html_generator' in the current folder.
+It can be changed by HTML_GENERATOR_CACHE environment variable,
+and the disk cache is disabled if the variable is empty.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import unittest
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Union
+from weakref import WeakSet
+
+CACHE_DIR = os.path.join('.cache', 'html_generator')
+
+def content_hash(data: Union[str, bytes]) -> str:
+    """hash of the content
+
+    Args:
+        data (Union[str, bytes]): content. str is encoded as utf-8
+
+    Returns:
+        str: hex digest
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha1(data).hexdigest()
+
+def stream_hash(chunks: Iterable[Union[str, bytes]]) -> str:
+    """content_hash of the joined chunks, without joining them
+
+    Args:
+        chunks (Iterable[Union[str, bytes]]): content (eg. lines of opened file)
+
+    Returns:
+        str: hex digest
+    """
+    hasher = hashlib.sha1()
+    for chunk in chunks:
+        hasher.update(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    return hasher.hexdigest()
+
+def cache_dir() -> Optional[str]:
+    """cache folder, None if disk cache is disabled"""
+    folder = os.environ.get('HTML_GENERATOR_CACHE', CACHE_DIR)
+    return folder if folder else None
+
+_caches: "WeakSet[Any]" = WeakSet()
+def clear_memory() -> None:
+    """drop values kept in memory by all caches (eg. for benchmark of cold run)"""
+    for cache in list(_caches):
+        cache.clear()
+
+class Cache():
+    """json cache for one namespace
+
+    Loaded values are also kept in memory.
+
+    Args:
+        namespace (str): name of the sub-folder
+        folder (Optional[str]): cache folder. Defaults to cache_dir()
+    """
+    def __init__(self, namespace: str, folder: Optional[str] = None):
+        self._logger = logging.getLogger(type(self).__name__)
+        self._namespace = namespace
+        self._folder = folder
+        self._memory: Dict[str, Any] = {}
+        _caches.add(self)
+
+    def clear(self) -> None:
+        """drop values kept in memory (files are kept)"""
+        self._memory.clear()
+
+    @property
+    def path(self) -> Optional[str]:
+        """folder of the namespace, None if disk cache is disabled"""
+        folder = cache_dir() if self._folder is None else self._folder
+        return os.path.join(folder, self._namespace) if folder else None
+
+    def get(self, key: str) -> Optional[Any]:
+        """load value, None if not cached"""
+        if key in self._memory:
+            return self._memory[key]
+        path = self.path
+        if path is None:
+            return None
+        try:
+            with open(os.path.join(path, key + '.json'), encoding='utf-8') as fid:
+                value = json.load(fid)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            self._logger.warning("broken cache: %s/%s (ignored)", self._namespace, key)
+            return None
+        self._memory[key] = value
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """store value (json serializable)"""
+        self._memory[key] = value
+        path = self.path
+        if path is None:
+            return
+        os.makedirs(path, exist_ok=True)
+        # write and rename: other processes never read half-written file
+        fd, tmp = tempfile.mkstemp(dir=path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as fid:
+                json.dump(value, fid, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, os.path.join(path, key + '.json'))
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+class LRUCache():
+    """bounded memory cache: the least recently used value is dropped first
+
+    Args:
+        maxsize (int): maximum number of values
+    """
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        _caches.add(self)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """load value, None if not cached"""
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """store value (not None)"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """drop all values"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class TestCache(unittest.TestCase):
+    """cache test"""
+    def test_cache(self):
+        """store & load from another instance"""
+        with tempfile.TemporaryDirectory() as folder:
+            cache = Cache('test', folder)
+            key = content_hash('<h2 id="a">b</h2>')
+            self.assertIsNone(cache.get(key))
+            cache.put(key, {'치킨': 'Chicken'})
+            self.assertEqual(Cache('test', folder).get(key), {'치킨': 'Chicken'})
+            self.assertIsNone(Cache('other', folder).get(key))
+            self.assertEqual(stream_hash(['<h2 id="a">', 'b</h2>']), key)
+
+    def test_disabled(self):
+        """empty folder disables disk cache"""
+        cache = Cache('test', '')
+        cache.put('key', [1, 2])
+        self.assertEqual(cache.get('key'), [1, 2])
+        self.assertIsNone(Cache('test', '').get('key'))
+        clear_memory()
+        self.assertIsNone(cache.get('key'))
+
+    def test_lru(self):
+        """least recently used value is dropped"""
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.get('a'), cache.get('c'), len(cache)), (1, 3, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+""" dependency manifest: decide whether an output should be generated again
+
+For each output, the manifest records the content hash of every dependency
+(raw file, inserted files, link targets), the options, the version of
+html_generator, and the output itself.
+The output is generated again only if any of them is changed,
+so touching a file or checking out a branch does not trigger generation.
+
+The manifest is stored as '(cache folder)/dependencies.json' (see cache).
+"""
+import json
+import logging
+import os
+import tempfile
+import unittest
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .cache import cache_dir, content_hash
+
+HashMap = Dict[str, Optional[str]] # path -> content hash (None if not exists)
+Stamp = Optional[Tuple[int, int]] # (mtime in ns, size), None if not exists
+
+def file_stamp(path: str) -> Stamp:
+    """cheap change detection of file (mtime & size), None if not exists"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def file_hash(path: str) -> Optional[str]:
+    """content hash of file, None if not exists"""
+    try:
+        with open(path, 'rb') as fid:
+            return content_hash(fid.read())
+    except FileNotFoundError:
+        return None
+
+_version: Optional[str] = None
+def generator_version() -> str:
+    """hash of all python files of html_generator (including defines.py)"""
+    global _version # pylint: disable=W0603
+    if _version is None:
+        module_path = os.path.split(__file__)[0]
+        names = sorted(x for x in os.listdir(module_path)
+                       if os.path.splitext(x)[-1].lower() == '.py')
+        _version = content_hash(''.join(
+            name + ':' + str(file_hash(os.path.join(module_path, name))) for name in names
+        ))
+    return _version
+
+class DependencyManifest():
+    """content hash based manifest of generated files
+
+    Args:
+        path (Optional[str]): path of manifest. Defaults to (cache folder)/dependencies.json.
+            Nothing is stored if the cache folder is disabled.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self._logger = logging.getLogger(type(self).__name__)
+        if path is None:
+            folder = cache_dir()
+            path = os.path.join(folder, 'dependencies.json') if folder else None
+        self.path = path
+        self._data: Dict[str, Dict[str, Any]] = {}
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path, encoding='utf-8') as fid:
+                    self._data = json.load(fid)
+            except ValueError:
+                self._logger.warning("broken manifest: %s (ignored)", path)
+
+    @staticmethod
+    def _entry(dependencies: Iterable[str], options: Any) -> Dict[str, Any]:
+        return {
+            'version': generator_version(),
+            'options': options,
+            'dependencies': {
+                path: file_hash(path) for path in dependencies
+            }
+        }
+
+    def is_up_to_date(self, output: str, dependencies: Iterable[str],
+                      options: Any = None) -> bool:
+        """check whether output is generated from the same dependencies
+
+        Args:
+            output (str): path of output
+            dependencies (Iterable[str]): paths of all files used for output
+            options (Any): json serializable options for output
+
+        Returns:
+            bool: True if generation is not necessary
+        """
+        record = self._data.get(output)
+        if record is None:
+            self._logger.debug("no record: %s", output)
+            return False
+        if record['output'] is None or record['output'] != file_hash(output):
+            self._logger.debug("output is changed or removed: %s", output)
+            return False
+        entry = self._entry(dependencies, options)
+        for key, value in entry.items():
+            if record.get(key) != value:
+                self._logger.debug("%s is changed: %s", key, output)
+                return False
+        return True
+
+    def record(self, output: str, dependencies: Iterable[str], options: Any = None) -> None:
+        """record dependencies of generated output (call after generation)
+
+        Args:
+            output (str): path of output
+            dependencies (Iterable[str]): paths of all files used for output
+            options (Any): json serializable options for output
+        """
+        entry = self._entry(dependencies, options)
+        entry['output'] = file_hash(output)
+        self._data[output] = entry
+
+    def save(self) -> None:
+        """write manifest"""
+        if self.path is None:
+            return
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as fid:
+            json.dump(self._data, fid, ensure_ascii=False, indent=1, sort_keys=True)
+
+class TestDependencyManifest(unittest.TestCase):
+    """manifest test"""
+    def test_manifest(self):
+        """content change is detected, touch is not"""
+        with tempfile.TemporaryDirectory() as folder:
+            path_in = os.path.join(folder, 'in.html')
+            path_out = os.path.join(folder, 'out.html')
+            path_manifest = os.path.join(folder, 'manifest.json')
+            for path in [path_in, path_out]:
+                with open(path, 'w', encoding='utf-8') as fid:
+                    fid.write('<h2 id="a">b</h2>')
+            manifest = DependencyManifest(path_manifest)
+            self.assertFalse(manifest.is_up_to_date(path_out, [path_in]))
+            manifest.record(path_out, [path_in], {'nolink': True})
+            manifest.save()
+
+            manifest = DependencyManifest(path_manifest)
+            os.utime(path_in)
+            self.assertTrue(manifest.is_up_to_date(path_out, [path_in], {'nolink': True}))
+            self.assertFalse(manifest.is_up_to_date(path_out, [path_in], {'nolink': False}))
+            with open(path_in, 'a', encoding='utf-8') as fid:
+                fid.write('\n')
+            self.assertFalse(manifest.is_up_to_date(path_out, [path_in], {'nolink': True}))
+            manifest.record(path_out, [path_in], {'nolink': True})
+            os.remove(path_out)
+            self.assertFalse(manifest.is_up_to_date(path_out, [path_in], {'nolink': True}))
+
+if __name__ == '__main__':
+    unittest.main()
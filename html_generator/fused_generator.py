@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+""" fused generator: link + trait + symbol in a single pass
+
+LinkGenerator (or LinkGeneratorRaw) followed by SymbolGenerator scans
+the text three times (link, trait, symbol) and rebuilds the string per match.
+FusedGenerator compiles all patterns into one scanner, walks the text once
+from left to right, and joins the pieces at the end.
+With FusedGenerator.join, the whole document is scanned at once.
+
+The output is the same as the chain. The rare case that the chain
+resolves differently (link text containing brackets, link inside a trait)
+is detected during the scan, and the text is passed to the chain instead.
+"""
+import logging
+import random
+import re
+import unittest
+from bisect import bisect_right
+from collections import Counter
+from functools import reduce
+from itertools import accumulate
+from io import StringIO
+from typing import Callable, Dict, Iterable, List, Match, Optional, Sequence, Tuple
+
+from .generator import GeneratorInterface, chain_signature
+from .link_generator import LinkGeneratorInterface, LinkGenerator, LinkGeneratorRaw
+from .symbol_generator import SymbolGenerator
+
+_Handler = Callable[[str, Match, int], Optional[str]]
+
+class FusedGenerator(GeneratorInterface):
+    """fused link/symbol generator
+
+    Args:
+        link (Optional[LinkGeneratorInterface]): link generator applied first
+        symbol (Optional[SymbolGenerator]): symbol generator applied next
+    """
+    def __init__(self,
+                 link: Optional[LinkGeneratorInterface] = None,
+                 symbol: Optional[SymbolGenerator] = None):
+        if link is None and symbol is None:
+            raise ValueError('at least one generator is necessary.')
+        self._link = link
+        self._symbol = symbol
+        self.generators: List[GeneratorInterface] = [
+            x for x in (link, symbol) if x is not None
+        ]
+        patterns: List[Tuple[str, re.Pattern, _Handler]] = []
+        first = ''
+        if link is not None:
+            patterns.append(('link', link._re, self._on_link))
+            first += link._first
+        if symbol is not None:
+            patterns.append(('trait', symbol._re_trait, self._on_trait))
+            patterns.append(('symbol', symbol._re_symbol, self._on_symbol))
+            first += symbol._first
+        # the look-ahead skips positions where no alternative can start
+        self._re = re.compile('(?=[{}])(?:{})'.format(first, '|'.join(
+            '(?P<{}>{})'.format(name, pattern.pattern) for name, pattern, _ in patterns
+        )))
+        # name -> (handler, index of the first inner group)
+        self._handlers = {
+            name: (handler, self._re.groupindex[name]+1)
+            for name, _, handler in patterns
+        }
+
+    @property
+    def signature(self) -> Optional[str]:
+        """same as the chain"""
+        return chain_signature(self.generators)
+
+    def _on_link(self, text: str, match: Match, first: int) -> Optional[str]:
+        if '[' in match.group(0) or ']' in match.group(0):
+            # trait/symbol would see the moved text of the link
+            raise _Interaction()
+        return self._link._resolve(*match.group(first, first+1))
+
+    def _on_trait(self, text: str, match: Match, first: int) -> Optional[str]:
+        if self._link is not None:
+            inner = self._link._re.search(text, match.start(first))
+            if inner is not None and inner.start() < match.end():
+                # link inside (or across) the trait
+                raise _Interaction()
+        return self._symbol._tag_trait(match.group(first))
+
+    def _on_symbol(self, _: str, match: Match, first: int) -> Optional[str]:
+        return self._symbol._tag_symbol(match.group(first))
+
+    def _scan(self, target: str, bounds: Sequence[int] = ()) -> str:
+        pieces: List[str] = []
+        last = 0
+        for match in self._re.finditer(target):
+            idx = bisect_right(bounds, match.start())
+            if idx < len(bounds) and bounds[idx] < match.end():
+                # match across chunks: not found by the chain
+                raise _Interaction()
+            handler, first = self._handlers[match.lastgroup]
+            tagged = handler(target, match, first)
+            if tagged is None:
+                continue
+            pieces.append(target[last:match.start()])
+            pieces.append(tagged)
+            last = match.end()
+        if not pieces:
+            return target
+        pieces.append(target[last:])
+        return ''.join(pieces)
+
+    def _scan_each(self, target: str, bounds: Sequence[int],
+                   on_chunk: Optional[Callable[[Optional[int]], None]] = None) -> List[str]:
+        """same as _scan, but the output is split at bounds"""
+        outputs: List[str] = []
+        pieces: List[str] = []
+        last = 0
+
+        def close(count: int) -> None:
+            """chunks before count are done (the handlers of their matches are called)"""
+            nonlocal pieces, last
+            while len(outputs) < count:
+                end = bounds[len(outputs)] if len(outputs) < len(bounds) else len(target)
+                pieces.append(target[last:end])
+                outputs.append(''.join(pieces))
+                pieces = []
+                last = end
+                if on_chunk is not None:
+                    on_chunk(len(outputs) - 1)
+
+        for match in self._re.finditer(target):
+            idx = bisect_right(bounds, match.start())
+            if idx < len(bounds) and bounds[idx] < match.end():
+                raise _Interaction()
+            close(idx)
+            handler, first = self._handlers[match.lastgroup]
+            tagged = handler(target, match, first)
+            if tagged is None:
+                continue
+            pieces.append(target[last:match.start()])
+            pieces.append(tagged)
+            last = match.end()
+        close(len(bounds) + 1)
+        return outputs
+
+    def _snapshot(self) -> List["Counter[str]"]:
+        return [Counter(x.stats) for x in self.generators]
+
+    def _rewind(self, snapshot: List["Counter[str]"]) -> None:
+        """restore stats counted by the scan given up"""
+        for gen, stats in zip(self.generators, snapshot):
+            gen.stats.clear()
+            gen.stats.update(stats)
+
+    def __call__(self, target: str) -> str:
+        snapshot = self._snapshot()
+        try:
+            return self._scan(target)
+        except _Interaction:
+            self._rewind(snapshot)
+            return reduce(lambda text, gen: gen(text), self.generators, target)
+
+    def join(self, chunks: Sequence[str]) -> str:
+        """apply generator to each chunk, and join them
+
+        Same as ''.join(map(self, chunks)), but the whole document is
+        scanned at once.
+
+        Args:
+            chunks (Sequence[str]): chunks (lines) of the document
+
+        Returns:
+            str: output document
+        """
+        bounds = list(accumulate(map(len, chunks)))
+        snapshot = self._snapshot()
+        try:
+            return self._scan(''.join(chunks), bounds[:-1])
+        except _Interaction:
+            self._rewind(snapshot)
+            return ''.join(map(self, chunks))
+
+    def join_each(self, chunks: Sequence[str],
+                  on_chunk: Optional[Callable[[Optional[int]], None]] = None) -> List[str]:
+        """apply generator to each chunk
+
+        Same as list(map(self, chunks)), but the chunks are scanned at once.
+
+        Args:
+            chunks (Sequence[str]): chunks (lines) of the document
+            on_chunk (Optional[Callable[[Optional[int]], None]]): called with the index of a chunk
+                once its stats are counted and its warnings are logged,
+                and with None if the counting restarts from the first chunk
+                (the scan is given up, see _rewind). Defaults to None.
+
+        Returns:
+            List[str]: output of each chunk
+        """
+        if not chunks:
+            return []
+        bounds = list(accumulate(map(len, chunks)))
+        snapshot = self._snapshot()
+        try:
+            return self._scan_each(''.join(chunks), bounds[:-1], on_chunk)
+        except _Interaction:
+            self._rewind(snapshot)
+            if on_chunk is not None:
+                on_chunk(None)
+            outputs = []
+            for idx, chunk in enumerate(chunks):
+                outputs.append(self(chunk))
+                if on_chunk is not None:
+                    on_chunk(idx)
+            return outputs
+
+class _Interaction(Exception):
+    """fused scan differs from the chain; fall back"""
+
+def fuse(generators: Iterable[GeneratorInterface]) -> List[GeneratorInterface]:
+    """replace link generator + symbol generator in the chain by FusedGenerator
+
+    Only the order of the chain (link, then symbol) is fused.
+    Other generators are kept as they are.
+
+    Args:
+        generators (Iterable[GeneratorInterface]): generator chain
+
+    Returns:
+        List[GeneratorInterface]: generator chain with the same output
+    """
+    result: List[GeneratorInterface] = []
+    link: Optional[LinkGeneratorInterface] = None
+    for gen in generators:
+        if isinstance(gen, LinkGeneratorInterface):
+            if link is not None:
+                result.append(FusedGenerator(link))
+            link = gen
+        elif isinstance(gen, SymbolGenerator):
+            result.append(FusedGenerator(link, gen))
+            link = None
+        else:
+            if link is not None:
+                result.append(FusedGenerator(link))
+                link = None
+            result.append(gen)
+    if link is not None:
+        result.append(FusedGenerator(link))
+    return result
+
+class TestFusedGenerator(unittest.TestCase):
+    """compare with the chain"""
+    _target = '''<html><body>
+        <h2 id="Chicken">치킨</h2>
+        <h2 id="Pizza">피자</h2>
+        <h3 id="Beer">맥주([beer])</h3>
+        <h3 id="Brk[x]">[괄호]</h3>
+        </body></html>'''
+    _tokens = [
+        '링크 "치킨"', '링크 "피자#Pizza"', '링크 "없음"', '3쪽 "맥주"', '12쪽 "치킨"',
+        '링크 "[action] 행동#Pizza"', '링크 "a#Brk[x]"', '[[마법]]', '[[', ']]', '[', ']',
+        '[action]', '[fast]', '[core]', '[endif]', '[chicken]', '"', '“', '”', '#',
+        '링크 ', '쪽 ', '3', ' ', 'a', '가', '\n', '^', '<b>', '</b>'
+    ]
+
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def _compare(self, chain: List[GeneratorInterface]):
+        fused = fuse(chain)
+        self.assertIsInstance(fused[0], FusedGenerator)
+        rand = random.Random(1234)
+        counts = lambda: [Counter(x.stats) for x in chain]
+        for _ in range(3000):
+            text = ''.join(rand.choice(self._tokens) for _ in range(rand.randint(1, 12)))
+            before = counts()
+            result = reduce(lambda t, gen: gen(t), fused, text)
+            middle = counts()
+            self.assertEqual(result, reduce(lambda t, gen: gen(t), chain, text), text)
+            # the same matches are counted
+            self.assertEqual(
+                [x - y for x, y in zip(middle, before)],
+                [x - y for x, y in zip(counts(), middle)],
+                text
+            )
+        for _ in range(300):
+            chunks = [
+                ''.join(rand.choice(self._tokens) for _ in range(rand.randint(1, 6)))
+                for _ in range(rand.randint(1, 8))
+            ]
+            expected = [reduce(lambda t, gen: gen(t), chain, x) for x in chunks]
+            self.assertEqual(fused[0].join(chunks), ''.join(expected), chunks)
+            self.assertEqual(fused[0].join_each(chunks), expected, chunks)
+            # counts of each chunk are done when on_chunk is called
+            expected_counts = []
+            for chunk in chunks:
+                before = counts()
+                reduce(lambda t, gen: gen(t), chain, chunk)
+                expected_counts.append([x - y for x, y in zip(counts(), before)])
+            marks: Dict[int, List["Counter[str]"]] = {}
+            last = [counts()]
+            def on_chunk(idx: Optional[int]) -> None:
+                if idx is None: # given up: counted again from the first chunk
+                    marks.clear()
+                else:
+                    marks[idx] = [x - y for x, y in zip(counts(), last[0])]
+                last[0] = counts()
+            fused[0].join_each(chunks, on_chunk)
+            self.assertEqual([marks[x] for x in sorted(marks)], expected_counts, chunks)
+
+    def test_link_symbol(self):
+        """LinkGenerator + SymbolGenerator"""
+        self._compare([LinkGenerator(StringIO(self._target)), SymbolGenerator()])
+
+    def test_raw_symbol(self):
+        """LinkGeneratorRaw + SymbolGenerator"""
+        self._compare([LinkGeneratorRaw(StringIO(self._target)), SymbolGenerator()])
+
+    def test_single(self):
+        """only one generator"""
+        self._compare([SymbolGenerator()])
+        self._compare([LinkGenerator(StringIO(self._target))])
+
+    def test_fuse(self):
+        """fuse keeps other generators and order"""
+        link, symbol, other = LinkGenerator(StringIO(self._target)), SymbolGenerator(), _Identity()
+        fused = fuse([link, other, symbol])
+        self.assertEqual(len(fused), 3)
+        self.assertIs(fused[1], other)
+        self.assertEqual(fused[0].generators, [link])
+        self.assertEqual(fused[2].generators, [symbol])
+        fused = fuse([link, symbol])
+        self.assertEqual(len(fused), 1)
+        self.assertEqual(fused[0].generators, [link, symbol])
+
+class _Identity(GeneratorInterface):
+    def __call__(self, text: str) -> str:
+        return text
+
+if __name__ == '__main__':
+    unittest.main()
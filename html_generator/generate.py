@@ -5,35 +5,261 @@
   * symbol like [---]
 """
 
-from typing import Iterable
+from collections import Counter
+from contextlib import ExitStack
+from functools import reduce
+from io import StringIO
+from typing import Dict, Iterable, List, Optional, Tuple
 import logging
 import io
 import tempfile
-from functools import reduce
-from .generator import GeneratorInterface
+import time
+import unittest
+from unittest import mock
+from .cache import LRUCache
+from .generator import GeneratorInterface, chain_signature
+from .fused_generator import FusedGenerator, fuse
+from .report import BuildReport
 from .script_factory import ScriptRunner
 
+# (signature of pure generators, text) -> (output, effect), shared by documents of a build
+MEMO_SIZE = 8192
+_memo = LRUCache(MEMO_SIZE)
+
+# stats deltas of each generator & warnings, None if nothing
+_Effect = Optional[Tuple[List[Dict[str, int]], List[logging.LogRecord]]]
+
+class _Effects(logging.Handler):
+    """stats & warnings of pure generators per line, replayed when the line is memoized
+
+    Args:
+        generators (List[GeneratorInterface]): generators of a segment
+    """
+    def __init__(self, generators: List[GeneratorInterface]):
+        super().__init__(logging.WARNING)
+        self._members = [x for gen in generators for x in getattr(gen, 'generators', [gen])]
+        self._loggers = list({
+            id(x._logger): x._logger for x in self._members if hasattr(x, '_logger') # pylint: disable=W0212
+        }.values())
+        self._records: List[logging.LogRecord] = []
+        self._before = self._counts()
+
+    def _counts(self) -> List["Counter[str]"]:
+        return [Counter(x.stats) for x in self._members]
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._records.append(record)
+
+    def __enter__(self) -> '_Effects':
+        for logger in self._loggers:
+            logger.addHandler(self)
+        return self
+
+    def __exit__(self, *_) -> None:
+        for logger in self._loggers:
+            logger.removeHandler(self)
+
+    def start(self) -> None:
+        """effects from now on are taken"""
+        self._records = []
+        self._before = self._counts()
+
+    def take(self) -> _Effect:
+        """effect since start (or the last take)"""
+        after = self._counts()
+        deltas = [dict(x - y) for x, y in zip(after, self._before)]
+        records, self._records, self._before = self._records, [], after
+        return (deltas, records) if records or any(deltas) else None
+
+    def replay(self, effect: _Effect) -> None:
+        """count & log again the effect of the memoized line"""
+        if effect is None:
+            return
+        deltas, records = effect
+        for gen, delta in zip(self._members, deltas):
+            gen.stats.update(delta)
+        for logger in self._loggers:
+            logger.removeHandler(self)
+        try:
+            for record in records:
+                logger = logging.getLogger(record.name)
+                if logger.isEnabledFor(record.levelno):
+                    logger.handle(record)
+        finally:
+            for logger in self._loggers:
+                logger.addHandler(self)
+        self.start()
+
+_Segment = Tuple[Optional[str], List[int]] # (signature if pure, indices of generators)
+
+def _segments(generators: List[GeneratorInterface]) -> List[_Segment]:
+    """group contiguous pure generators"""
+    segments: List[_Segment] = []
+    for idx, gen in enumerate(generators):
+        if gen.pure and segments and segments[-1][0] is not None:
+            segments[-1][1].append(idx)
+        else:
+            segments.append(('', [idx]) if gen.pure else (None, [idx]))
+    return [
+        (chain_signature(generators[x] for x in indices) if signature is not None else None,
+         indices)
+        for signature, indices in segments
+    ]
+
 def generate(file_input: io.TextIOWrapper,
              file_output: io.TextIOWrapper,
-             generators: Iterable[GeneratorInterface]):
+             generators: Iterable[GeneratorInterface],
+             report: Optional[BuildReport] = None):
     """generate html from RAW html file
 
+    Link and symbol generators are fused into a single pass over the document
+    (see fused_generator).
+    The output of contiguous pure generators (see GeneratorInterface.pure) is
+    memoized by line, so repeated lines and inserted files are generated once.
+    Counts and warnings of a memoized line are replayed,
+    so the report and the log do not depend on the memo.
+    Stateful generators (eg. TabooGenerator) see every line in order.
+
     Args:
         file_input (io.TextIOWrapper): raw html as wrapper
         file_output (io.TextIOWrapper): output html as wrapper
         generators (Iterable[GeneratorInterface]): generators to apply in raw html
+        report (Optional[BuildReport]): records timing and counts if given. Defaults to None.
     """
     logger = logging.getLogger("main")
     logger.debug("input: %s, output: %s", file_input, file_output)
 
-    runner = ScriptRunner()
+    start_time = time.perf_counter()
+    runner = ScriptRunner(report)
+    generators = fuse(generators)
+    if report is not None:
+        report.start(generators)
+    segments = _segments(generators)
+    # the last pure segment is applied after all lines are read:
+    # new lines are scanned at once (see FusedGenerator.join_each)
+    tail = segments.pop() if segments and segments[-1][0] is not None else None
+    effects = {
+        tuple(indices): _Effects([generators[x] for x in indices])
+        for signature, indices in segments + ([tail] if tail is not None else [])
+        if signature is not None
+    }
 
+    def run(idx: int, text: str) -> str:
+        if report is None:
+            return generators[idx](text)
+        return report.run(idx, generators[idx], text)
+
+    def apply(segment: _Segment, text: str) -> str:
+        signature, indices = segment
+        if signature is not None:
+            cached = _memo.get((signature, text))
+            if cached is not None:
+                effects[tuple(indices)].replay(cached[1])
+                return cached[0]
+            effects[tuple(indices)].start()
+        result = text
+        for idx in indices:
+            result = run(idx, result)
+        if signature is not None:
+            _memo.put((signature, text), (result, effects[tuple(indices)].take()))
+        return result
+
+    lines: List[str] = []
     file_input.seek(0)
-    while True:
-        line = file_input.readline()
-        if not line:
-            break
-        line = line.replace("../", "") # rewind link
-        line = runner(line, file_input)
-        line = reduce(lambda text, gen: gen(text), generators, line)
-        file_output.write(line)
+    with ExitStack() as stack:
+        for effect in effects.values():
+            stack.enter_context(effect)
+        while True:
+            line = file_input.readline()
+            if not line:
+                break
+            line = line.replace("../", "") # rewind link
+            line = runner(line, file_input)
+            for segment in segments:
+                line = apply(segment, line)
+            lines.append(line)
+
+        if tail is None:
+            file_output.write(''.join(lines))
+        else:
+            signature, indices = tail
+            effect = effects[tuple(indices)]
+            resolved: Dict[str, Tuple[str, _Effect]] = {}
+            for line in lines:
+                if line not in resolved:
+                    cached = _memo.get((signature, line))
+                    if cached is not None:
+                        resolved[line] = cached
+            misses = list(dict.fromkeys(x for x in lines if x not in resolved))
+            taken: List[_Effect] = [None] * len(misses)
+
+            def on_chunk(idx: Optional[int]) -> None:
+                if idx is None: # the scan is given up: counted again from the first line
+                    effect.start()
+                else:
+                    taken[idx] = effect.take()
+
+            effect.start()
+            if len(indices) == 1 and isinstance(generators[indices[0]], FusedGenerator):
+                fused: FusedGenerator = generators[indices[0]] # type: ignore
+                outputs = fused.join_each(misses, on_chunk) if report is None else \
+                    report.run(indices[0], fused.join_each, misses, on_chunk)
+            else:
+                outputs = []
+                for idx, line in enumerate(misses):
+                    outputs.append(apply((None, indices), line))
+                    on_chunk(idx)
+            for line, output, line_effect in zip(misses, outputs, taken):
+                resolved[line] = output, line_effect
+                _memo.put((signature, line), resolved[line])
+            # the first occurrence of a miss is counted by the generators
+            generated = set(misses)
+            for line in lines:
+                if line in generated:
+                    generated.discard(line)
+                else:
+                    effect.replay(resolved[line][1])
+            file_output.write(''.join(resolved[x][0] for x in lines))
+    if report is not None:
+        report.lines = len(lines)
+        report.seconds = time.perf_counter() - start_time
+
+class TestGenerate(unittest.TestCase):
+    """memoization of pure generators"""
+    _target = ('<html><body>\n<h2 id="Cost">비용</h2>\n<h3 id="V1_chained">속박</h3>\n' +
+               '<p>3쪽 "비용" [action]</p>\n' * 3 + '<p>[nothing]</p>\n' * 2 +
+               '<li>칼 ([tdl] 152) "비용"</li>\n' * 2 + '</body></html>\n')
+
+    def _chain(self) -> List[GeneratorInterface]:
+        from .link_generator import LinkGeneratorRaw # pylint: disable=C0415
+        from .symbol_generator import SymbolGenerator # pylint: disable=C0415
+        from .taboo_generator import TabooGenerator # pylint: disable=C0415
+        return [TabooGenerator(), LinkGeneratorRaw(StringIO(self._target)), SymbolGenerator()]
+
+    def test_memo(self):
+        """the same output, counts and warnings as the chain, repeated lines are generated once"""
+        _memo.clear()
+        chain = self._chain()
+        self.assertEqual([x.pure for x in chain], [False, True, True])
+        with self.assertLogs('SymbolGenerator', logging.WARNING) as logs:
+            expected = ''.join(
+                reduce(lambda t, gen: gen(t), chain, x)
+                for x in self._target.replace('../', '').splitlines(keepends=True)
+            )
+        counts = [x.stats for x in chain]
+        self.assertEqual(counts[2]['unresolved'], 2) # [nothing] of both lines
+        # cold, then memoized across documents: only the stateful generator runs
+        for calls in [3, 0]: # [action], [nothing], [tdl]
+            chain = self._chain()
+            output = StringIO()
+            with mock.patch.object(chain[2], '_tag_symbol', wraps=chain[2]._tag_symbol) as tag, \
+                    self.assertLogs('SymbolGenerator', logging.WARNING) as memo_logs:
+                generate(StringIO(self._target), output, chain)
+            self.assertEqual(output.getvalue(), expected)
+            self.assertEqual(tag.call_count, calls)
+            self.assertEqual([x.stats for x in chain], counts)
+            self.assertEqual(memo_logs.output, logs.output)
+            self.assertEqual(chain[0].state.name, 'CHAIN')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,10 +3,37 @@
 """
 
 from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Iterable, Optional
+
+from .cache import content_hash
 
 class GeneratorInterface(ABC):
     """generator interface
     """
+    @property
+    def stats(self) -> "Counter[str]":
+        """counts of this generator (eg. matches, unresolved), see report"""
+        if '_stats' not in self.__dict__:
+            self._stats: "Counter[str]" = Counter()
+        return self._stats
+
+    @property
+    def signature(self) -> Optional[str]:
+        """key of the transformation, None if the generator is not pure
+
+        A pure generator declares its signature: generators with the same signature
+        give the same output for the same text, regardless of the text given before,
+        so the output can be memoized by text (see generate).
+        Stateful generators (eg. TabooGenerator) should return None.
+        """
+        return None
+
+    @property
+    def pure(self) -> bool:
+        """True if the output depends on the text only (see signature)"""
+        return self.signature is not None
+
     @abstractmethod
     def __call__(self, text: str) -> str:
         """generate text
@@ -17,3 +44,12 @@ class GeneratorInterface(ABC):
         Returns:
             str: output
         """
+
+def chain_signature(generators: Iterable[GeneratorInterface]) -> Optional[str]:
+    """signature of generators applied in order, None if any of them is not cacheable"""
+    signatures = []
+    for gen in generators:
+        if gen.signature is None:
+            return None
+        signatures.append(gen.signature)
+    return content_hash('\n'.join(signatures))
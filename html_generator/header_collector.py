@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+""" streaming header collector
+
+Table of contents (generate_toc) and link targets (LinkGenerator) only need
+the headers of the document. HeaderCollector reads the document as a stream of
+events of the stdlib html parser, and collects both in a single pass,
+without building a tree.
+
+The tree rules of bs4 with 'html.parser' are followed (see soup_stream),
+so the result is the same as the bs4 version.
+"""
+import re
+import unittest
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .soup_stream import AttrValue, SoupStream, end_tag, serialize_string, start_tag
+
+_re_header = re.compile("h[0-9]")
+_re_bracket = re.compile("[\\(\\[\\<].*?[\\)\\]\\>]")
+_re_bracket_single = re.compile("[\\(\\[\\<\\)\\]\\>]")
+
+@dataclass
+class Header:
+    """element whose name starts with 'h'
+
+    Args:
+        name (str): tag name
+        id (Optional[str]): id attribute, None if not exists
+        parent_class (Optional[List[str]]): class of the parent, None if not exists
+        string (Optional[str]): the only string inside (same as bs4 Tag.string)
+        text (str): strings directly inside, joined
+    """
+    name: str
+    id: Optional[str]
+    parent_class: Optional[List[str]]
+    string: Optional[str] = None
+    text: str = ''
+
+# class of an element between headers (not div, not header)
+ClassEvent = List[str]
+
+@dataclass
+class HeaderIndex:
+    """result of HeaderCollector
+
+    Args:
+        events (List[Union[Header, ClassEvent]]): headers and classes in document order
+        id_map (Dict[str, str]): text -> id of headers (for link)
+    """
+    events: List[Union[Header, ClassEvent]] = field(default_factory=list)
+    id_map: Dict[str, str] = field(default_factory=dict)
+
+    def to_json(self) -> Dict[str, Any]:
+        """json serializable form"""
+        return {
+            'events': [x if isinstance(x, list) else asdict(x) for x in self.events],
+            'id_map': self.id_map
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'HeaderIndex':
+        """load from to_json output"""
+        return cls(
+            [x if isinstance(x, list) else Header(**x) for x in data['events']],
+            dict(data['id_map'])
+        )
+
+class _Element():
+    __slots__ = ['name', 'attrs', 'count', 'first', 'string', 'header', 'parts', 'anchor']
+    def __init__(self, name: str, attrs: Dict[str, AttrValue]):
+        self.name = name
+        self.attrs = attrs
+        self.count = 0 # number of children
+        self.first: Union[str, '_Element', None] = None # first child
+        self.string: Optional[str] = None
+        self.header: Optional[Header] = None
+        self.parts: Optional[List[str]] = None # serialized element (link target only)
+        self.anchor = -1 # index in HeaderCollector._anchors
+
+class HeaderCollector(SoupStream):
+    """collect headers from html stream
+
+    Usage:
+        collector = HeaderCollector()
+        for line in file:
+            collector.feed(line)
+        collector.close()
+        index = collector.index
+    """
+    def __init__(self):
+        super().__init__()
+        self.index = HeaderIndex()
+        self._stack: List[_Element] = [_Element('[document]', {})]
+        self._captures: List[_Element] = []
+        self._anchors: List[Optional[Tuple[str, str]]] = [] # (text, id) in document order
+
+    def _emit(self, text: str) -> None:
+        for elem in self._captures:
+            elem.parts.append(text)
+
+    def _add_child(self, child: Union[str, _Element]) -> None:
+        parent = self._stack[-1]
+        parent.count += 1
+        if parent.count == 1:
+            parent.first = child
+        if parent.header is not None and isinstance(child, str):
+            parent.header.text += child
+
+    # tree events (see soup_stream)
+    def on_string(self, data: str, kind: Optional[str]) -> None:
+        self._add_child(data)
+        if self._captures:
+            self._emit(serialize_string(data, kind, self._stack[-1].name))
+
+    def on_start(self, name: str, attrs: Dict[str, AttrValue]) -> None:
+        parent = self._stack[-1]
+        elem = _Element(name, attrs)
+        self._add_child(elem)
+        self._stack.append(elem)
+        if name[0] == 'h':
+            parent_class = parent.attrs.get('class')
+            elem.header = Header(name, attrs.get('id'), parent_class) # type: ignore
+            self.index.events.append(elem.header)
+            if 'id' in attrs and _re_header.search(name):
+                elem.parts = []
+                elem.anchor = len(self._anchors)
+                self._anchors.append(None)
+                self._captures.append(elem)
+        elif name != 'div' and 'class' in attrs and self.index.events:
+            self.index.events.append(attrs['class']) # type: ignore
+        if self._captures:
+            self._emit(start_tag(name, attrs))
+
+    def on_end(self, name: str) -> None:
+        elem = self._stack.pop()
+        if elem.count == 1:
+            first = elem.first
+            elem.string = first if isinstance(first, str) else first.string
+        elem.first = None
+        if self._captures:
+            self._emit(end_tag(elem.name))
+        if elem.header is not None:
+            elem.header.string = elem.string
+        if elem.parts is not None:
+            self._captures.pop()
+            text = _re_bracket.sub("", ''.join(elem.parts))
+            text = _re_bracket_single.sub("", text).strip()
+            self._anchors[elem.anchor] = (text, elem.attrs['id']) # type: ignore
+            elem.parts = None
+
+    def close(self) -> None:
+        super().close()
+        for anchor in self._anchors:
+            text, curr_id = anchor # type: ignore
+            if curr_id.endswith('_'):
+                continue
+            self.index.id_map[text] = curr_id
+
+class TestHeaderCollector(unittest.TestCase):
+    """compare with bs4"""
+    _target = '''<!DOCTYPE html>
+    <html><body>
+    <div class="rules V1_2"><h1 id="top">Top</h1></div>
+    <h2 id="a" class="x  y">비용 <span class="icon-action"></span>(괄호)</h2>
+    <p class="core dunwich">p</p>
+    <h3 id="b">&lt;b&gt; &amp; &#9993; &postNo <b>굵게</b><br><!-- c --></br></h3>
+    <h3 id="c"><b><i>중첩</i></b></h3>
+    <h4 id="d_">무시</h4>
+    <header id="e"><p>header</p></header>
+    <h5>no id</h5>
+    <h2 id="f" title='say "hi"'>열린 <i>태그
+    </body></html>'''
+
+    @staticmethod
+    def _collect(text: str) -> HeaderIndex:
+        collector = HeaderCollector()
+        for line in text.splitlines(keepends=True):
+            collector.feed(line)
+        collector.close()
+        return collector.index
+
+    def test_bs4(self):
+        """same headers as bs4 tree"""
+        import bs4 # pylint: disable=C0415
+        soup = bs4.BeautifulSoup(self._target, 'html.parser')
+        index = self._collect(self._target)
+        headers = [x for x in index.events if isinstance(x, Header)]
+        tags = [x for x in soup.find_all(True) if x.name[0] == 'h']
+        self.assertEqual([x.name for x in headers], [x.name for x in tags])
+        for header, tag in zip(headers, tags):
+            self.assertEqual(header.id, tag.get('id'))
+            self.assertEqual(header.string, tag.string)
+            self.assertEqual(
+                header.text,
+                ''.join(x if isinstance(x, str) else '' for x in tag.contents)
+            )
+            self.assertEqual(header.parent_class, tag.parent.get('class'))
+        id_map = {}
+        for tag in soup.find_all(_re_header):
+            if tag.has_attr('id') and tag['id'][-1] != '_':
+                text = _re_bracket_single.sub("", _re_bracket.sub("", str(tag))).strip()
+                id_map[text] = tag['id']
+        self.assertEqual(index.id_map, id_map)
+
+    def test_json(self):
+        """json round trip"""
+        index = self._collect(self._target)
+        self.assertEqual(HeaderIndex.from_json(index.to_json()), index)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """ Autometic link generator class
 """
+import json
 import logging
 import os
 import re
@@ -8,15 +9,16 @@ import tempfile
 import unittest
 from abc import abstractmethod
 from io import StringIO, TextIOBase
-from typing import Dict, Optional, Union
+from typing import Dict, Match, Optional, Union
 
-import bs4
-
-from .mics import load_filetype
+from .cache import Cache, content_hash
+from .mics import collect_headers
+from .split import link_source
 from .generator import GeneratorInterface
 
 FileType = Union[str, TextIOBase]
 
+
 class LinkGeneratorInterface(GeneratorInterface):
     """Abstract class for link generator
 
@@ -27,21 +29,46 @@ class LinkGeneratorInterface(GeneratorInterface):
 
     @staticmethod
     def _build_id_map(file: FileType) -> Dict[str, str]:
-        file_p = load_filetype(file)
-        soup = bs4.BeautifulSoup(file_p, 'html.parser')
-        id_map: Dict[str, str] = {}
-        for tag in soup.find_all(re.compile("h[0-9]")): #type: bs4.element.Tag
-            if not tag.has_attr('id'):
-                continue
-            curr_id: str = tag['id']
-            text = re.sub("[\\(\\[\\<].*?[\\)\\]\\>]", "", str(tag))
-            text = re.sub("[\\(\\[\\<\\)\\]\\>]", "", text).strip()
-            if curr_id is not None and curr_id[-1] == '_':
-                continue
-            id_map[text] = curr_id
-        del soup
-        file_p.close()
-        return id_map
+        """text -> id map of headers in file
+
+        Headers are collected by collect_headers (cached with the content hash),
+        so unchanged file is not parsed again.
+        For a split shell page, headers of the whole page are used (see split).
+        """
+        if isinstance(file, str):
+            file = link_source(file)
+        return collect_headers(file).id_map
+
+    @abstractmethod
+    def _tag(self, *groups: str) -> Optional[str]:
+        """convert the groups of one match into link
+
+        Args:
+            groups (str): groups of the match of self._re
+
+        Returns:
+            Optional[str]: tagged string, None if the link is not resolved
+        """
+
+    @property
+    def signature(self) -> Optional[str]:
+        """links are resolved with the id maps only"""
+        if '_signature' not in self.__dict__:
+            self._signature = '{}:{}'.format(type(self).__name__, content_hash(json.dumps(
+                [self._re.pattern, self._format, self._text2id, getattr(self, '_paths', None)],
+                ensure_ascii=False, sort_keys=True
+            )))
+        return self._signature
+
+    def _resolve(self, *groups: str) -> Optional[str]:
+        """_tag with counting of matches & unresolved links"""
+        tagged = self._tag(*groups)
+        self.stats['matches' if tagged is not None else 'unresolved'] += 1
+        return tagged
+
+    def _replace(self, match: Match) -> str:
+        tagged = self._resolve(*match.groups())
+        return match.group(0) if tagged is None else tagged
 
     @abstractmethod
     def __call__(self, text: str) -> str:
@@ -69,19 +96,18 @@ class LinkGeneratorRaw(LinkGeneratorInterface):
         super().__init__()
         self._text2id = self._build_id_map(file)
         self._re = re.compile('([0-9]+)쪽 [“"”]([^“^"^”]+)[“"”]')
+        self._first = '0-9' # characters starting a match of _re (as [] set)
         self._format = '"<a href="#{id}">{text}</a>"'
 
+    def _tag(self, _: str, text: str) -> Optional[str]:
+        """tagged string for the groups of one match, None if unresolved"""
+        if text not in self._text2id:
+            self._logger.warning("text[%s] not found.", text)
+            return None
+        return self._format.format(text=text, id=self._text2id[text])
+
     def __call__(self, target: str) -> str:
-        matches = list(self._re.finditer(target))
-        for match in reversed(matches):
-            text = match.group(2)
-            if text not in self._text2id:
-                self._logger.warning("text[%s] not found.", text)
-                continue
-            tagged = self._format.format(
-                text=text, id=self._text2id[text])
-            target = target[:match.start()] + tagged + target[match.end():]
-        return target
+        return self._re.sub(self._replace, target)
 
 class LinkGenerator(LinkGeneratorInterface):
     """default link generator
@@ -118,6 +144,7 @@ class LinkGenerator(LinkGeneratorInterface):
             '파큐': os.path.normpath(os.path.relpath(faq, out_dir)) if faq is not None else ''
         }
         self._re = re.compile('(링크|참조|파큐|[0-9]+쪽) [“"”]([^“^"^”]+)[“"”]')
+        self._first = '링참파0-9' # characters starting a match of _re (as [] set)
         self._format = '"<a href="{path}#{id}">{text}</a>"'
 
     def _check_path(self, path: Optional[str], out_dir: Optional[str]) -> Optional[str]:
@@ -134,43 +161,57 @@ class LinkGenerator(LinkGeneratorInterface):
         return path
 
 
+    def _tag(self, where: str, text: str) -> Optional[str]:
+        """tagged string for the groups of one match, None if unresolved"""
+        where = '링크' if where[-1] == '쪽' else where
+        if where not in self._text2id:
+            self._logger.warning("insane: %s", where)
+            return None
+        text = text.split('#')
+        if len(text) == 2:
+            text, curr_id = text
+            if curr_id not in self._ids[where]:
+                self._logger.warning(
+                    "ID[%s] not found at %s for text[%s].",
+                    curr_id, where, text)
+                return None
+            tagged = self._format.format(
+                id=curr_id, text=text, path=self._paths[where]
+            )
+            self._logger.debug("ID: %s, text: %s, where: %s, tag: %s", curr_id, text, where, tagged)
+        elif len(text) == 1:
+            text = text[0]
+            if text not in self._text2id[where]:
+                self._logger.warning("text[%s] not found at %s.", text, where)
+                return None
+            tagged = self._format.format(
+                id=self._text2id[where][text], text=text, path=self._paths[where]
+            )
+            self._logger.debug("text: %s, where: %s, tag: %s", text, where, tagged)
+        else:
+            self._logger.warning("Don't use # except for ID: %s", '#'.join(text))
+            return None
+        return tagged
+
     def __call__(self, target: str) -> str:
-        matches = list(self._re.finditer(target))
-        for match in reversed(matches):
-            where = match.group(1)
-            where = '링크' if where[-1] == '쪽' else where
-            if where not in self._text2id:
-                self._logger.warning("insane: %s", where)
-                continue
-            text = match.group(2).split('#')
-            if len(text) == 2:
-                text, curr_id = text
-                if curr_id not in self._ids[where]:
-                    self._logger.warning(
-                        "ID[%s] not found at %s for text[%s].",
-                        curr_id, where, text)
-                    continue
-                tagged = self._format.format(
-                    id=curr_id, text=text, path=self._paths[where]
-                )
-                self._logger.debug("ID: %s, text: %s, where: %s, tag: %s", curr_id, text, where, tagged)
-            elif len(text) == 1:
-                text = text[0]
-                if text not in self._text2id[where]:
-                    self._logger.warning("text[%s] not found at %s.", text, where)
-                    continue
-                tagged = self._format.format(
-                    id=self._text2id[where][text], text=text, path=self._paths[where]
-                )
-                self._logger.debug("text: %s, where: %s, tag: %s", text, where, tagged)
-            else:
-                self._logger.warning("Don't use # except for ID: %s", match.group(2))
-                continue
-            target = target[:match.start()] + tagged + target[match.end():]
-        return target
+        return self._re.sub(self._replace, target)
 
 class TestLinkGenerator(unittest.TestCase):
     """test class"""
+    def test_id_map_cache(self):
+        """headers are stored with content hash"""
+        target = '<html><body><h2 id="Pie">파이</h2></body></html>'
+        with tempfile.TemporaryDirectory() as folder:
+            os.environ['HTML_GENERATOR_CACHE'] = folder
+            try:
+                id_map = LinkGeneratorInterface._build_id_map(StringIO(target))
+            finally:
+                os.environ.pop('HTML_GENERATOR_CACHE')
+            self.assertEqual(id_map, {'파이': 'Pie'})
+            self.assertEqual(
+                Cache('headers_v1', folder).get(content_hash(target))['id_map'], id_map
+            )
+
     def test_raw_simple(self):
         """LinkGeneratorRaw -- simple case"""
         file_target = StringIO(
@@ -10,11 +10,11 @@ from functools import reduce
 from collections import deque
 from dataclasses import dataclass, field
 from io import StringIO, TextIOBase
-from typing import Any, Callable, Iterable, List, Union, Tuple
-
-import bs4
+from typing import Any, Callable, Iterable, List, Optional, Union, Tuple
 
+from .cache import Cache, stream_hash
 from .defines import EXPANSION
+from .header_collector import HeaderCollector, HeaderIndex
 
 FileType = Union[str, TextIOBase]
 
@@ -106,6 +106,35 @@ class TestFileReader(unittest.TestCase):
         loaded = load_filetype(self._test_string)
         self.assertIsNotNone(loaded)
 
+# bump the version if the format of HeaderIndex is changed
+_headers_cache = Cache('headers_v1')
+def collect_headers(file: FileType) -> HeaderIndex:
+    """headers of the file for ToC and link, in a single streaming pass
+
+    The result is cached with the content hash of file,
+    so the file is parsed once even if both ToC and link need it.
+
+    Args:
+        file (FileType): path or file string or fileIO
+
+    Returns:
+        HeaderIndex: headers and text -> id map
+    """
+    file_p = load_filetype(file)
+    try:
+        key = stream_hash(file_p)
+        cached = _headers_cache.get(key)
+        if cached is not None:
+            return HeaderIndex.from_json(cached)
+        file_p.seek(0)
+        collector = HeaderCollector()
+        for line in file_p:
+            collector.feed(line)
+        collector.close()
+    finally:
+        file_p.close()
+    _headers_cache.put(key, collector.index.to_json())
+    return collector.index
 
 _re_number = re.compile("\\(([0-9]+)[.]([0-9]+)\\)")
 _re_ver = re.compile("V([0-9]+)_([0-9]+)")
@@ -178,7 +207,7 @@ class _Tag:
 def generate_toc(file: FileType,
                  id_ignore: Union[str, Iterable[str], None] = None) -> str:
     """
-    generate ToC string & collect header id
+    generate ToC string from headers (see collect_headers)
 
     Args:
         file (Union[str, TextIOBase]): path or file string or fileIO
@@ -188,7 +217,6 @@ def generate_toc(file: FileType,
         str: header string
     """
     logger = logging.getLogger('generate_toc')
-    file_p = load_filetype(file)
     # id update
     if id_ignore is None:
         ids = frozenset(['rop'])
@@ -197,29 +225,28 @@ def generate_toc(file: FileType,
     else:
         ids = frozenset(id_ignore)
 
-    soup = bs4.BeautifulSoup(file_p, 'html.parser')
     tags: List[_Tag] = []
     classes_ignore = frozenset([
         'rules-reference', 'errata', 'rules'
     ])
-    for tag in soup.find_all(True):
-        if tag.name[0] != 'h':
-            if tags and tag.name != 'div' and tag.has_attr('class'):
-                tags[-1].update(tag['class'])
+    for event in collect_headers(file).events:
+        if isinstance(event, list):
+            # class of the element after header
+            if tags:
+                tags[-1].update(event)
             continue
-        if not tag.has_attr('id'):
-            logger.debug("NO id: %s (omit)", tag.string)
+        if event.id is None:
+            logger.debug("NO id: %s (omit)", event.string)
             continue
-        level = int(tag.name[1:])
-        curr_id: str = tag['id']
-        string: str = tag.string
+        level = int(event.name[1:])
+        curr_id: str = event.id
+        string: Optional[str] = event.string
         if string is None:
             # when string contains icon, remove icon & ()
-            string = ''.join([x if isinstance(x, str) else '' for x in tag.contents])
-            string = string.replace('(', '').replace(')', '').strip()
+            string = event.text.replace('(', '').replace(')', '').strip()
         classes: List[str] = [
-            x for x in tag.parent['class'] if x not in classes_ignore
-        ] if tag.parent.has_attr('class') else []
+            x for x in event.parent_class if x not in classes_ignore
+        ] if event.parent_class is not None else []
         if not classes:
             classes.append('core')
         logger.debug("level: %d, id: %s, string: %s, class: %s", level, curr_id, string, classes)
@@ -254,8 +281,6 @@ def generate_toc(file: FileType,
     while tags_list:
         tag = tags_list.pop()
         header_string += "\t"*len(tags_list) + "</{}>\n".format(tag)
-    del soup
-    file_p.close()
     return header_string
 
 class TestToC(unittest.TestCase):
@@ -276,34 +301,5 @@ class TestToC(unittest.TestCase):
         self.assertNotIn('hidden', toc)
         self.assertIn('<a href="#new">new</a>', toc)
 
-def check_update_necessary(base: str, want: str) -> bool:
-    """check whether update is necessary based on fixed time
-
-    Args:
-        base (str): target based file
-        want (str): generated
-
-    Returns:
-        bool: True if update is necessary
-    """
-    logger = logging.getLogger("check_update")
-    if not os.path.isfile(want):
-        logger.debug("target doesn't exist: %s", want)
-        return True
-    baseinfo = os.stat(base)
-    wantinfo = os.stat(want)
-    logger.debug("basetime: %d, wanttime: %d", baseinfo.st_mtime_ns, wantinfo.st_mtime_ns)
-    if baseinfo.st_mtime_ns > wantinfo.st_mtime_ns:
-        logger.debug("base is newer; updated")
-        return True
-    module_path = os.path.split(__file__)[0]
-    geninfo = [os.stat(os.path.join(module_path, x)) for x in os.listdir(module_path)
-               if os.path.splitext(x)[-1].lower() == '.py']
-    if geninfo and max(geninfo, key=lambda x: x.st_mtime_ns).st_mtime_ns > wantinfo.st_mtime_ns:
-        logger.debug("generator is newer; updated")
-        return True
-    logger.debug("base is older; skip")
-    return False
-
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+""" output writer: minification & precompression
+
+minify() shrinks generated html without changing the rendering:
+  * whitespace in text is collapsed to one character
+    (a newline if the whitespace has a newline, else a space)
+  * comments are removed, except conditional comments (<!--[if ...]>)
+  * contents of pre, textarea, script and style, and tags themselves
+    (attribute values) are kept as they are
+
+Scripts (<!-- script: -->) are already run by ScriptRunner when the output is written.
+write_output() writes the output, and optionally its gzip sibling (output.gz)
+for servers which serve precompressed files.
+"""
+import gzip
+import os
+import re
+import tempfile
+import unittest
+
+_re_token = re.compile(
+    r'<!--.*?-->'
+    r'|<(pre|textarea|script|style)\b[^>]*>.*?</\1\s*>'
+    r'|<[^>]*>'
+    r'|[^<]+'
+    r'|<',
+    re.DOTALL | re.IGNORECASE
+)
+# html whitespace only: \s also matches nbsp, ideographic space, ... which are rendered
+_re_space = re.compile(r'[ \t\n\r\f]+')
+
+def _collapse(match: 're.Match[str]') -> str:
+    return '\n' if '\n' in match.group(0) else ' '
+
+def minify(text: str) -> str:
+    """collapse insignificant whitespace and remove comments
+
+    Args:
+        text (str): html
+
+    Returns:
+        str: minified html
+    """
+    tokens = []
+    for match in _re_token.finditer(text):
+        token = match.group(0)
+        if token.startswith('<!--'):
+            if token.startswith('<!--[if'):
+                tokens.append(token)
+        elif token.startswith('<'):
+            tokens.append(token)
+        else:
+            tokens.append(_re_space.sub(_collapse, token))
+    return ''.join(tokens)
+
+def write_output(path: str, text: str, minified: bool = False, compress: bool = False) -> None:
+    """write generated html
+
+    Args:
+        path (str): path of output
+        text (str): html
+        minified (bool, optional): minify the html. Defaults to False.
+        compress (bool, optional): also write (path).gz. Defaults to False.
+    """
+    if minified:
+        text = minify(text)
+    with open(path, 'w', encoding='utf-8') as fid:
+        fid.write(text)
+    if compress:
+        # mtime=0: the same html gives the same bytes
+        with open(path + '.gz', 'wb') as fid:
+            fid.write(gzip.compress(text.encode('utf-8'), 9, mtime=0))
+    elif os.path.isfile(path + '.gz'):
+        os.remove(path + '.gz') # stale
+
+class TestMinify(unittest.TestCase):
+    """minify test"""
+    def test_minify(self):
+        """whitespace & comments"""
+        self.assertEqual(
+            minify('<ul>\n    <li title="a  b">링크   <b>a</b>\n\t\tb</li>\n</ul>\n'),
+            '<ul>\n<li title="a  b">링크 <b>a</b>\nb</li>\n</ul>\n'
+        )
+        self.assertEqual(minify('<p>a <!-- note -->b</p>'), '<p>a b</p>')
+        self.assertEqual(minify('a<!--p>b</p-->\n  c'), 'a\nc')
+        kept = ('<!--[if lt IE 9]>\n  <script src="x.js"></script>\n<![endif]-->'
+                '<pre>  a\n  b</pre><script>\n// c\nvar x = 1;</script>')
+        self.assertEqual(minify(kept), kept)
+        self.assertEqual(minify('1 < 2'), '1 < 2')
+        self.assertEqual(minify('<p>a\xa0\xa0 b\u3000\u3000c</p>'), '<p>a\xa0\xa0 b\u3000\u3000c</p>')
+
+    def test_write(self):
+        """gzip sibling"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'out.html')
+            write_output(path, '<p>\n    a</p>\n', minified=True, compress=True)
+            with open(path, encoding='utf-8') as fid:
+                self.assertEqual(fid.read(), '<p>\na</p>\n')
+            with open(path + '.gz', 'rb') as fid:
+                self.assertEqual(gzip.decompress(fid.read()).decode('utf-8'), '<p>\na</p>\n')
+            write_output(path, '<p>\n    a</p>\n')
+            self.assertFalse(os.path.isfile(path + '.gz'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+""" parser backend of BeautifulSoup
+
+  * 'html.parser': python standard library (default)
+  * 'lxml': optional dependency (pip install lxml)
+
+The backend is selected by set_backend(), or HTML_GENERATOR_PARSER environment variable.
+If lxml is selected but not installed, 'html.parser' is used with a warning.
+
+ToC and link id map do not use BeautifulSoup (see header_collector),
+so only reference_generator and faq_generator.html_reader (streaming=False) are affected.
+Note: the backends repair broken markup differently
+(eg. '?/p>' instead of '?</p>' swallows the next paragraphs in html.parser only).
+"""
+import logging
+import os
+import unittest
+from typing import Any, Optional
+
+import bs4
+
+BACKENDS = ('html.parser', 'lxml')
+DEFAULT_BACKEND = 'html.parser'
+
+_backend: Optional[str] = None
+
+def set_backend(name: Optional[str]) -> None:
+    """select backend (None: environment variable or default)"""
+    if name is not None and name not in BACKENDS:
+        raise ValueError("unknown parser backend: {} (available: {})".format(
+            name, ', '.join(BACKENDS)))
+    global _backend # pylint: disable=W0603
+    _backend = name
+
+def available(name: str) -> bool:
+    """True if the backend can be used"""
+    if name == 'lxml':
+        try:
+            import lxml # pylint: disable=C0415,W0611
+        except ImportError:
+            return False
+    return name in BACKENDS
+
+def backend() -> str:
+    """name of the selected backend"""
+    name = _backend if _backend is not None else \
+        os.environ.get('HTML_GENERATOR_PARSER', '') or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError("unknown parser backend: {} (available: {})".format(
+            name, ', '.join(BACKENDS)))
+    if not available(name):
+        logging.getLogger('parser').warning(
+            "parser backend %s is not installed. use %s", name, DEFAULT_BACKEND)
+        return DEFAULT_BACKEND
+    return name
+
+def make_soup(markup: Any, **kwargs: Any) -> bs4.BeautifulSoup:
+    """BeautifulSoup with the selected backend
+
+    Args:
+        markup (Any): html string or opened file
+        kwargs: other arguments of BeautifulSoup
+
+    Returns:
+        bs4.BeautifulSoup: parsed tree
+    """
+    return bs4.BeautifulSoup(markup, backend(), **kwargs)
+
+class TestParserBackend(unittest.TestCase):
+    """conformance of backends"""
+    _files = ['raw/faq_legacy.html', 'raw/notes.html', 'raw/errata.html']
+
+    def tearDown(self):
+        set_backend(None)
+
+    def test_select(self):
+        """backend selection"""
+        set_backend('html.parser')
+        self.assertEqual(backend(), 'html.parser')
+        self.assertRaises(ValueError, set_backend, 'unknown')
+
+    def test_html_reader(self):
+        """HTMLReader entries are the same for all backends"""
+        from faq_generator.html_reader import HTMLReader # pylint: disable=C0415
+        files = [x for x in self._files if os.path.isfile(x)]
+        if not files:
+            self.skipTest('raw files are not found (run in the root folder)')
+        for name in BACKENDS:
+            if not available(name):
+                continue
+            for path in files:
+                set_backend(DEFAULT_BACKEND)
+                expected = dict(HTMLReader(path, streaming=False))
+                set_backend(name)
+                self.assertEqual(dict(HTMLReader(path, streaming=False)), expected, (name, path))
+
+if __name__ == '__main__':
+    unittest.main()
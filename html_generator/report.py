@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+""" opt-in build report: where the time of generation goes
+
+Pass BuildReport to generate() to record
+  * wall time & calls of each stage of the generator chain
+    (fused link/symbol generators are one stage, see fused_generator)
+  * counts of each generator (matches, unresolved links/symbols, ...)
+  * time of each script (insert_file, generate_toc)
+and write it as json:
+{
+    "output": "rule_reference.html", "lines": 3120, "ms": 12.3,
+    "stages": [{"name": "FusedGenerator", "ms": 5.6, "calls": 1,
+                "counts": {"LinkGeneratorRaw": {"matches": 10, "unresolved": 1}, ...}}],
+    "scripts": [{"command": "generate_toc", "arg": null, "ms": 4.1}]
+}
+"""
+import json
+import logging
+import os
+import tempfile
+import time
+import unittest
+from collections import Counter
+from io import StringIO
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .generator import GeneratorInterface
+
+class BuildReport():
+    """instrumentation of one output
+
+    Args:
+        output (str): path of output (only for the report)
+    """
+    def __init__(self, output: str = ''):
+        self.output = output
+        self.lines = 0
+        self.seconds = 0.0
+        self.scripts: List[Dict[str, Any]] = []
+        self._stages: List[GeneratorInterface] = []
+        self._seconds: List[float] = []
+        self._calls: List[int] = []
+        self._before: List[List["Counter[str]"]] = []
+
+    @staticmethod
+    def _members(stage: GeneratorInterface) -> List[GeneratorInterface]:
+        return list(getattr(stage, 'generators', [stage]))
+
+    def start(self, stages: Sequence[GeneratorInterface]) -> None:
+        """register stages of the chain (call before generation)"""
+        self._stages = list(stages)
+        self._seconds = [0.0] * len(self._stages)
+        self._calls = [0] * len(self._stages)
+        self._before = [
+            [Counter(gen.stats) for gen in self._members(stage)] for stage in self._stages
+        ]
+
+    def run(self, index: int, func: Callable[..., str], *args: Any) -> str:
+        """call func of stage[index] with timing"""
+        start = time.perf_counter()
+        result = func(*args)
+        self._seconds[index] += time.perf_counter() - start
+        self._calls[index] += 1
+        return result
+
+    def apply(self, text: str, count: Optional[int] = None) -> str:
+        """apply the first count stages (default: all) to text with timing"""
+        count = len(self._stages) if count is None else count
+        for idx in range(count):
+            text = self.run(idx, self._stages[idx], text)
+        return text
+
+    def add_script(self, command: str, arg: Optional[str], seconds: float) -> None:
+        """record time of one script"""
+        self.scripts.append({'command': command, 'arg': arg, 'ms': seconds * 1000})
+
+    def to_json(self) -> Dict[str, Any]:
+        """json serializable report"""
+        stages = []
+        for idx, stage in enumerate(self._stages):
+            counts = {}
+            for gen, before in zip(self._members(stage), self._before[idx]):
+                counts[type(gen).__name__] = dict(gen.stats - before)
+            stages.append({
+                'name': type(stage).__name__,
+                'ms': self._seconds[idx] * 1000,
+                'calls': self._calls[idx],
+                'counts': counts
+            })
+        return {
+            'output': self.output,
+            'lines': self.lines,
+            'ms': self.seconds * 1000,
+            'stages': stages,
+            'scripts': self.scripts
+        }
+
+    def write(self, path: str) -> None:
+        """write report as json"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fid:
+            json.dump(self.to_json(), fid, ensure_ascii=False, indent=1)
+
+def report_path(folder: str, output: str) -> str:
+    """path of the report of output in folder"""
+    return os.path.join(folder, os.path.basename(output) + '.json')
+
+class TestBuildReport(unittest.TestCase):
+    """report test"""
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_report(self):
+        """counts and scripts are reported"""
+        from .generate import generate # pylint: disable=C0415
+        from .link_generator import LinkGeneratorRaw # pylint: disable=C0415
+        from .symbol_generator import SymbolGenerator # pylint: disable=C0415
+        target = ('<html><body>\n<!-- script: generate_toc -->\n'
+                  '<h2 id="Cost">비용</h2>\n<p>3쪽 "비용", 3쪽 "없음" [action] [nothing]</p>\n'
+                  '</body></html>\n')
+        symbol = SymbolGenerator()
+        symbol('[action]') # counted before generation: not reported
+        report = BuildReport('out.html')
+        generate(StringIO(target), StringIO(),
+                 [LinkGeneratorRaw(StringIO(target)), symbol], report)
+        result = report.to_json()
+        self.assertEqual(result['lines'], 5)
+        self.assertEqual(len(result['stages']), 1)
+        counts = result['stages'][0]['counts']
+        self.assertEqual(counts['LinkGeneratorRaw'], {'matches': 1, 'unresolved': 1})
+        self.assertEqual(counts['SymbolGenerator'], {'matches': 1, 'unresolved': 1})
+        self.assertEqual([x['command'] for x in result['scripts']], ['generate_toc'])
+        with tempfile.TemporaryDirectory() as folder:
+            path = report_path(folder, 'out.html')
+            report.write(path)
+            with open(path, encoding='utf-8') as fid:
+                self.assertEqual(json.load(fid), result)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,6 +7,9 @@ Script should be given as the following form:
 Currently, the following scripts are available.
 
 insert_file (file_path): insert all components from (file_path)
+    scripts in the inserted file are also run (nested insert_file is allowed, but not cyclic).
+    The expanded file is kept in memory with its content hash,
+    so the file is expanded once for all documents of a build.
 generate_toc: generate table of contents
 
 """
@@ -14,33 +17,136 @@ import os
 import re
 import io
 import logging
+import tempfile
+import time
+import unittest
+from unittest import mock
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
 
+from .cache import LRUCache, clear_memory, content_hash
+from .dependency import Stamp, file_stamp
 from .mics import generate_toc
+from .report import BuildReport
+
+@dataclass
+class _Expanded:
+    fragment: str
+    nested: Dict[str, Stamp] # files inserted inside
+
+    def valid(self) -> bool:
+        return all(file_stamp(path) == stamp for path, stamp in self.nested.items())
+
+# bounded & dropped by cache.clear_memory (eg. watch mode, cold benchmark)
+FRAGMENT_SIZE = 256
+# path -> (stamp, content hash): skip reading unchanged file
+_fragment_keys = LRUCache(FRAGMENT_SIZE)
+# content hash -> expanded fragment
+_fragments = LRUCache(FRAGMENT_SIZE)
 
 class ScriptRunner():
     """script runner
+
+    Args:
+        report (Optional[BuildReport]): records time of each script if given
     """
-    def __init__(self):
+    def __init__(self, report: Optional[BuildReport] = None):
         self._logger = logging.getLogger(type(self).__name__)
+        self._report = report
         self._re = re.compile("<!-- script: ([^ ]+|[^ ]+ [^ ]+) -->")
+        self._inserting: List[str] = [] # files being inserted (for cycle detection)
+        self._nested: Dict[str, Stamp] = {} # files inserted in the current fragment
+        self._volatile = False # current fragment depends on the document (not cached)
+
+    @staticmethod
+    def _find_file(arg: str) -> Optional[str]:
+        """path of the file for insert_file, None if not found"""
+        if os.path.isfile(arg):
+            return arg
+        if os.path.isfile(os.path.join('raw', arg)):
+            return os.path.join('raw', arg)
+        return None
+
+    def _insert_file(self, target: str, file: io.TextIOWrapper, arg: str) -> str:
+        path = self._find_file(arg)
+        if path is None:
+            self._logger.warning("file not found for insert_file: %s", arg)
+            return target
+        path = os.path.normpath(path)
+        if path in self._inserting:
+            self._logger.warning("cyclic insert_file: %s", ' -> '.join(self._inserting + [path]))
+            self._volatile = True
+            return target
+        return self._expand(path, file)
+
+    def _expand(self, path: str, file: io.TextIOWrapper) -> str:
+        stamp = file_stamp(path)
+        data: Optional[str] = None
+        known = _fragment_keys.get(path)
+        if known is not None and known[0] == stamp:
+            key = known[1]
+        else:
+            with open(path, encoding='UTF-8') as fid:
+                data = fid.read()
+            key = content_hash(data)
+            _fragment_keys.put(path, (stamp, key))
+        self._nested[path] = stamp
+        entry = _fragments.get(key)
+        if entry is not None and entry.valid():
+            self._nested.update(entry.nested)
+            return entry.fragment
+        if data is None:
+            with open(path, encoding='UTF-8') as fid:
+                data = fid.read()
+
+        outer = self._nested, self._volatile
+        self._nested, self._volatile = {}, False
+        self._inserting.append(path)
+        try:
+            fragment = ''.join(
+                self(line, file) for line in data.splitlines(keepends=True)
+            )
+        finally:
+            self._inserting.pop()
+            nested, volatile = self._nested, self._volatile
+            self._nested, self._volatile = outer
+        self._nested.update(nested)
+        self._volatile = self._volatile or volatile
+        if not volatile:
+            _fragments.put(key, _Expanded(fragment, nested))
+        return fragment
 
-    def _insert_file(self, target: str, _: io.TextIOWrapper, arg: str) -> str:
-        if not os.path.isfile(arg):
-            if os.path.isfile(os.path.join('raw', arg)):
-                arg = os.path.join('raw', arg)
-            else:
-                self._logger.warning("file not found for insert_file: %s", arg)
-                return target
-        with open(arg, encoding='UTF-8') as fid:
-            data = fid.read()
-        return data
+    def dependencies(self, file: Iterable[str]) -> List[str]:
+        """files inserted by insert_file script (including nested ones)
+
+        Args:
+            file (Iterable[str]): lines of the raw html (or opened file)
+
+        Returns:
+            List[str]: paths of inserted files (existing only)
+        """
+        paths: List[str] = []
+        self._dependencies(file, paths)
+        return paths
+
+    def _dependencies(self, file: Iterable[str], paths: List[str]) -> None:
+        for line in file:
+            match = self._re.match(line)
+            if match is None:
+                continue
+            res = match.group(1).strip().split(' ')
+            if res[0] != 'insert_file' or len(res) < 2:
+                continue
+            path = self._find_file(res[1])
+            if path is not None and path not in paths:
+                paths.append(path)
+                with open(path, encoding='UTF-8') as fid:
+                    self._dependencies(fid, paths)
 
     def _generate_toc(self, _: str, file: io.TextIOWrapper, __: str) -> str:
-        current_file_position = file.tell()
-        file.seek(0)
-        toc = generate_toc(file)
-        file.seek(current_file_position)
-        return toc
+        # the position of file is kept (see load_filetype)
+        self._volatile = True
+        return generate_toc(file)
 
     def __call__(self, target: str, file: io.TextIOWrapper) -> str:
         match = self._re.match(target)
@@ -50,10 +156,66 @@ class ScriptRunner():
         cmd = res[0]
         arg = res[1] if len(res) > 1 else None
 
+        start_time = time.perf_counter()
         if cmd == 'insert_file':
-            return self._insert_file(target, file, arg)
-        if cmd == 'generate_toc':
-            return self._generate_toc(target, file, arg)
-        self._logger.warning("script %s is not defined. given: %s", cmd, target)
-        return target
+            result = self._insert_file(target, file, arg)
+        elif cmd == 'generate_toc':
+            result = self._generate_toc(target, file, arg)
+        else:
+            self._logger.warning("script %s is not defined. given: %s", cmd, target)
+            return target
+        if self._report is not None:
+            self._report.add_script(cmd, arg, time.perf_counter() - start_time)
+        return result
+
+
+class TestScriptRunner(unittest.TestCase):
+    """script runner test"""
+    def setUp(self):
+        logging.disable(logging.WARNING)
+
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+    def test_nested(self):
+        """nested insert_file, cycle, and cache of generator output"""
+        from .generate import generate # pylint: disable=C0415
+        from .symbol_generator import SymbolGenerator # pylint: disable=C0415
+        with tempfile.TemporaryDirectory() as folder:
+            path_a = os.path.join(folder, 'a.html')
+            path_b = os.path.join(folder, 'b.html')
+            with open(path_a, 'w', encoding='utf-8') as fid:
+                fid.write('<p>a [action]</p>\n<!-- script: insert_file {} -->\n'.format(path_b))
+            with open(path_b, 'w', encoding='utf-8') as fid:
+                fid.write('<p>b</p>\n<!-- script: insert_file {} -->\n'.format(path_a))
+            document = '<body>\n<!-- script: insert_file {} -->\n</body>\n'.format(path_a)
+            runner = ScriptRunner()
+            self.assertEqual(runner.dependencies(io.StringIO(document)), [path_a, path_b])
+            result = ''.join(runner(x, None) for x in io.StringIO(document))
+            # cycle: insert_file of a is kept in b
+            self.assertEqual(result, '<body>\n<p>a [action]</p>\n<p>b</p>\n'
+                             '<!-- script: insert_file {} -->\n</body>\n'.format(path_a))
+
+            symbol = SymbolGenerator()
+            outputs = []
+            with mock.patch.object(symbol, '_tag_symbol', wraps=symbol._tag_symbol) as tag:
+                for _ in range(2):
+                    output = io.StringIO()
+                    generate(io.StringIO(document), output, [symbol])
+                    outputs.append(output.getvalue())
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertIn('class="icon-action"', outputs[0])
+            # fragment is given to the generator once, but counted for each document
+            self.assertEqual(tag.call_count, 1)
+            self.assertEqual(symbol.stats['matches'], 2)
+
+            # changed fragment is expanded again
+            with open(path_b, 'w', encoding='utf-8') as fid:
+                fid.write('<p>changed</p>\n')
+            result = ''.join(ScriptRunner()(x, None) for x in io.StringIO(document))
+            self.assertIn('<p>changed</p>', result)
 
+            # fragments are dropped with other memory caches
+            self.assertGreater(len(_fragments), 0)
+            clear_memory()
+            self.assertEqual((len(_fragments), len(_fragment_keys)), (0, 0))
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+""" full-text search index of generated pages for js/search.js
+
+Every header with id (h1-h4) of the pages starts a document:
+the header text is its title, and the text until the next header is its body.
+Entries of json/faq.json are also documents (titled by card names).
+
+Korean has no spaces between many words (eg. '단서를'),
+so Hangul is indexed by character n-grams: bigrams of syllables,
+and single syllables for one-syllable queries. Other words (a-z, 0-9) are indexed as they are.
+A query matches the documents which have all grams of the query.
+
+The index is written to a folder:
+index.json      {"version": ..., "pages": [...], "docs": [[page, id, title], ...], "shards": [...]}
+h00.json ...    gram -> document indexes (delta encoded), sharded by the initial consonant
+                of the first syllable (h00: ㄱ, ..., h18: ㅎ, etc: the others)
+so the browser loads only the shards of the query.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import unicodedata
+import unittest
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .cache import content_hash
+from .dependency import file_hash
+from .split import link_source
+
+FAQ_PATH = os.path.join('json', 'faq.json')
+FAQ_PAGE = 'newFaqTemplate.html'
+CARD_PATHS = [os.path.join('json', 'player_cards.json'), os.path.join('json', 'encounter_cards.json')]
+FORMAT = 1 # bump if the format of index is changed
+
+_HEADERS = frozenset(['h1', 'h2', 'h3', 'h4'])
+_SKIP = frozenset(['script', 'style', 'nav', 'footer'])
+_re_hangul = re.compile('[가-힣]+')
+_re_word = re.compile('[a-z0-9]+')
+_re_tag = re.compile('<[^>]*>')
+
+Section = Tuple[str, str, str] # (id, title, text)
+
+def grams(text: str) -> Set[str]:
+    """index terms of text (see module docstring)"""
+    text = unicodedata.normalize('NFC', text).lower()
+    result: Set[str] = set()
+    for run in _re_hangul.findall(text):
+        result.update(run)
+        result.update(run[idx:idx+2] for idx in range(len(run)-1))
+    result.update(_re_word.findall(text))
+    return result
+
+def shard_of(gram: str) -> str:
+    """name of the shard which has gram"""
+    if '가' <= gram[0] <= '힣':
+        return 'h{:02d}'.format((ord(gram[0]) - ord('가')) // 588)
+    return 'etc'
+
+class _SectionCollector(HTMLParser):
+    """text of each header with id (ToC, footer, script and style are skipped)"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections: List[List[Any]] = [] # [id, title parts, text parts]
+        self._header: Optional[str] = None
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP:
+            self._skip += 1
+            return
+        curr_id = dict(attrs).get('id')
+        if tag in _HEADERS and curr_id and curr_id != 'rop' and not self._skip:
+            self.sections.append([curr_id, [], []])
+            self._header = tag
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag == self._header:
+            self._header = None
+
+    def handle_data(self, data):
+        if self._skip or not self.sections:
+            return
+        if self._header is not None:
+            self.sections[-1][1].append(data)
+        self.sections[-1][2].append(data)
+
+def collect_sections(path: str) -> List[Section]:
+    """documents of a generated page (the whole page for a split shell)
+
+    Args:
+        path (str): path of generated html
+
+    Returns:
+        List[Section]: (id, title, text) for each header with id
+    """
+    collector = _SectionCollector()
+    with open(link_source(path), encoding='utf-8') as fid:
+        for line in fid:
+            collector.feed(line)
+    collector.close()
+    return [
+        (curr_id, ' '.join(''.join(title).split()), ' '.join(''.join(text).split()))
+        for curr_id, title, text in collector.sections
+    ]
+
+def collect_faq(faq_path: str = FAQ_PATH, card_paths: Iterable[str] = CARD_PATHS) -> List[Section]:
+    """documents of json/faq.json, titled by the names of the cards
+
+    The id is (code of the first card)/(faq key): newFaqTemplate.html shows the card of the hash.
+    """
+    names: Dict[str, str] = {}
+    for path in card_paths:
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as fid:
+                names.update((x['code'], x['name']) for x in json.load(fid) if 'name' in x)
+    with open(faq_path, encoding='utf-8') as fid:
+        faqs = json.load(fid)
+    sections: List[Section] = []
+    for key, faq in faqs.items():
+        title = ', '.join(names.get(x, x) for x in faq.get('card_list', [])) or key
+        text = ' '.join(
+            _re_tag.sub('', faq[x]) for x in ['question_text', 'answer_text', 'text'] if x in faq
+        )
+        cards = faq.get('card_list', [])
+        sections.append((f"{cards[0]}/{key}" if cards else key, title, title + ' ' + text))
+    return sections
+
+def build_search_index(pages: Dict[str, List[Section]]) -> Dict[str, Any]:
+    """index & shards
+
+    Args:
+        pages (Dict[str, List[Section]]): url of page -> documents
+
+    Returns:
+        Dict[str, Any]: file name (without .json) -> content
+    """
+    docs: List[List[Any]] = []
+    postings: Dict[str, List[int]] = {}
+    for page_idx, sections in enumerate(pages.values()):
+        for curr_id, title, text in sections:
+            for gram in grams(text): # text has the title
+                postings.setdefault(gram, []).append(len(docs))
+            docs.append([page_idx, curr_id, title])
+    shards: Dict[str, Dict[str, List[int]]] = {}
+    for gram in sorted(postings):
+        ids = postings[gram]
+        shards.setdefault(shard_of(gram), {})[gram] = \
+            ids[:1] + [y - x for x, y in zip(ids, ids[1:])]
+    files: Dict[str, Any] = {name: shard for name, shard in sorted(shards.items())}
+    files['index'] = {
+        'format': FORMAT,
+        'pages': list(pages),
+        'docs': docs,
+        'shards': sorted(shards)
+    }
+    return files
+
+def write_search_index(folder: str, pages: Iterable[str], faq_path: Optional[str] = FAQ_PATH,
+                       force: bool = False) -> bool:
+    """build the index of pages (and faq) into folder
+
+    Args:
+        folder (str): output folder (eg. json/search)
+        pages (Iterable[str]): generated html files
+        faq_path (Optional[str]): path of faq.json. Defaults to json/faq.json (None: not indexed).
+        force (bool, optional): build even if nothing is changed. Defaults to False.
+
+    Returns:
+        bool: True if built, False if the index is up to date
+    """
+    logger = logging.getLogger('search_index')
+    pages = list(pages)
+    sources = [link_source(x) for x in pages]
+    if faq_path is not None:
+        sources += [faq_path] + CARD_PATHS
+    version = content_hash(json.dumps(
+        [FORMAT, pages] + [[x, file_hash(x)] for x in sources]
+    ))
+    path_index = os.path.join(folder, 'index.json')
+    if not force and os.path.isfile(path_index):
+        with open(path_index, encoding='utf-8') as fid:
+            if json.load(fid).get('version') == version:
+                logger.info("search index is up to date")
+                return False
+
+    documents = {x: collect_sections(x) for x in pages}
+    if faq_path is not None and os.path.isfile(faq_path):
+        documents[FAQ_PAGE] = collect_faq(faq_path)
+    files = build_search_index(documents)
+    files['index']['version'] = version
+    os.makedirs(folder, exist_ok=True)
+    for name in os.listdir(folder):
+        if name.endswith('.json') and name[:-5] not in files:
+            os.remove(os.path.join(folder, name)) # stale shard
+    for name, content in files.items():
+        with open(os.path.join(folder, name + '.json'), 'w', encoding='utf-8') as fid:
+            json.dump(content, fid, ensure_ascii=False, separators=(',', ':'))
+    logger.info("search index: %d documents, %d shards",
+                len(files['index']['docs']), len(files['index']['shards']))
+    return True
+
+class TestSearchIndex(unittest.TestCase):
+    """search index test"""
+    _page = ('<html><body><nav><h1 id="rop">목차</h1><a href="#Clues">단서</a></nav>\n'
+             '<div id="rules"><h2 id="Clues">단서</h2>\n<p>장소에서 단서를 발견합니다.</p>\n'
+             '<h2 id="Cost">비용</h2>\n<p>자원 비용을 지불합니다. (FAQ v2.0)</p>\n'
+             '</div><footer>단서 없음</footer></body></html>\n')
+
+    def test_grams(self):
+        """hangul n-grams & words"""
+        self.assertEqual(grams('단서를 FAQ'), {'단', '서', '를', '단서', '서를', 'faq'})
+        self.assertEqual(shard_of('가나'), 'h00')
+        self.assertEqual(shard_of('힣'), 'h18')
+        self.assertEqual(shard_of('faq'), 'etc')
+
+    def test_index(self):
+        """documents of headers, shards cover all grams"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'page.html')
+            with open(path, 'w', encoding='utf-8') as fid:
+                fid.write(self._page)
+            sections = collect_sections(path)
+            self.assertEqual([x[:2] for x in sections], [('Clues', '단서'), ('Cost', '비용')])
+            self.assertEqual(sections[1][2], '비용 자원 비용을 지불합니다. (FAQ v2.0)')
+
+            folder_index = os.path.join(folder, 'search')
+            self.assertTrue(write_search_index(folder_index, [path], None))
+            self.assertFalse(write_search_index(folder_index, [path], None))
+            with open(os.path.join(folder_index, 'index.json'), encoding='utf-8') as fid:
+                index = json.load(fid)
+            self.assertEqual(index['docs'], [[0, 'Clues', '단서'], [0, 'Cost', '비용']])
+
+            def search(query):
+                result: Optional[Set[int]] = None
+                for gram in grams(query):
+                    with open(os.path.join(folder_index, shard_of(gram) + '.json'),
+                              encoding='utf-8') as fid:
+                        deltas = json.load(fid).get(gram, [])
+                    ids = set(sum(deltas[:idx+1]) for idx in range(len(deltas)))
+                    result = ids if result is None else result & ids
+                return sorted(result or [])
+            self.assertEqual(search('단서'), [0])
+            self.assertEqual(search('비용 faq'), [1])
+            self.assertEqual(search('서'), [0])
+            self.assertEqual(search('없음'), []) # footer is not indexed
+
+    def test_faq(self):
+        """faq entries are linked by card"""
+        with tempfile.TemporaryDirectory() as folder:
+            path_faq = os.path.join(folder, 'faq.json')
+            path_cards = os.path.join(folder, 'cards.json')
+            with open(path_faq, 'w', encoding='utf-8') as fid:
+                json.dump({'코어_0012': {'card_list': ['01020'], 'text': '<b>무기</b>'},
+                           '코어_0013': {'card_list': [], 'text': '규칙'}}, fid)
+            with open(path_cards, 'w', encoding='utf-8') as fid:
+                json.dump([{'code': '01020', 'name': '마체테'}], fid)
+            self.assertEqual(collect_faq(path_faq, [path_cards]), [
+                ('01020/코어_0012', '마체테', '마체테 무기'), ('코어_0013', '코어_0013', '코어_0013 규칙')])
+
+if __name__ == '__main__':
+    unittest.main()
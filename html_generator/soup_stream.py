@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+""" bs4 tree rules on a stream of html.parser events
+
+Streaming readers (header_collector, faq_generator.html_reader) give the same
+result as BeautifulSoup with 'html.parser', without building the tree.
+SoupStream turns the events of the stdlib parser into the elements and strings
+bs4 would build (void elements, end tag matching, whitespace-only strings,
+entities, comments and declarations), and the functions below serialize them as str() of bs4.
+The tables of elements & attributes are the ones of bs4.
+
+Subclasses implement the hooks:
+    on_start(name, attrs)   element is opened (attrs: multi-valued ones as list)
+    on_end(name)            element is closed (void elements right after on_start)
+    on_string(data, kind)   string in the current element (open_tags[-1])
+                            kind: None for text, or 'comment', 'doctype', 'cdata', 'declaration', 'pi'
+"""
+import re
+import unittest
+from collections import defaultdict
+from html.parser import HTMLParser
+from typing import DefaultDict, Dict, List, Optional, Tuple, Union
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+from bs4.element import CData, Comment, Declaration, Doctype, ProcessingInstruction
+
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+VOID_ELEMENTS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+PRESERVE_WHITESPACE = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+RAW_TEXT = frozenset(['script', 'style'])
+# attributes with space separated values (tag name -> names, '*': all tags)
+LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+# serialization of non-text strings: (prefix, suffix)
+DECORATION = {
+    kind: (cls.PREFIX, cls.SUFFIX) for kind, cls in [
+        ('comment', Comment), ('doctype', Doctype), ('cdata', CData),
+        ('declaration', Declaration), ('pi', ProcessingInstruction)
+    ]
+}
+
+AttrValue = Union[str, List[str]]
+
+_re_nonspace = re.compile(r"\S+")
+_re_decimal = re.compile(r"^([0-9]+)(.*)")
+_re_hex = re.compile(r"^([0-9a-f]+)(.*)")
+
+def escape(text: str) -> str:
+    """minimal entity substitution of bs4"""
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+def _quote(value: str) -> str:
+    if '"' in value:
+        if "'" in value:
+            return '"{}"'.format(value.replace('"', '&quot;'))
+        return "'{}'".format(value)
+    return '"{}"'.format(value)
+
+def start_tag(name: str, attrs: Dict[str, AttrValue]) -> str:
+    """serialized start tag (attributes are sorted, as bs4 with html.parser)"""
+    result = '<' + name
+    for key, value in sorted(attrs.items()):
+        if isinstance(value, list):
+            value = ' '.join(value)
+        result += ' {}={}'.format(key, _quote(escape(value)))
+    return result + ('/>' if name in VOID_ELEMENTS else '>')
+
+def end_tag(name: str) -> str:
+    """serialized end tag ('' for void elements)"""
+    return '' if name in VOID_ELEMENTS else '</{}>'.format(name)
+
+def serialize_string(data: str, kind: Optional[str], parent: Optional[str]) -> str:
+    """serialized string of the kind (see on_string) in the parent element"""
+    if kind is not None:
+        prefix, suffix = DECORATION[kind]
+        return prefix + data + suffix
+    return data if parent in RAW_TEXT else escape(data)
+
+def charref(name: str) -> str:
+    """text of numeric character reference (name: '65', 'x41', ...) as bs4"""
+    base, pattern = (16, _re_hex) if name[:1] in 'xX' else (10, _re_decimal)
+    digits = name[1:] if base == 16 else name
+    extra = ''
+    try:
+        code = int(digits, base)
+    except ValueError:
+        # not terminated by ';': the rest is text
+        match = pattern.search(digits)
+        if match is None:
+            return digits
+        code, extra = int(match.group(1), base), match.group(2)
+    if code == 0 or code > 0x10ffff or 0xd800 <= code <= 0xdfff:
+        return '\ufffd' + extra
+    if 0x80 <= code <= 0x9f:
+        try:
+            return bytes([code]).decode('windows-1252') + extra
+        except UnicodeDecodeError:
+            pass
+    return chr(code) + extra
+
+class SoupStream(HTMLParser):
+    """html.parser events as the tree of bs4 (see module doc for the hooks)"""
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.open_tags: List[str] = [] # open elements (outer first)
+        self._open: DefaultDict[str, int] = defaultdict(int)
+        self._preserve = 0 # number of open pre/textarea
+        self._data: List[str] = []
+        self._closed_void: List[str] = []
+
+    # hooks
+    def on_start(self, name: str, attrs: Dict[str, AttrValue]) -> None:
+        """element is opened"""
+
+    def on_end(self, name: str) -> None:
+        """element is closed"""
+
+    def on_string(self, data: str, kind: Optional[str]) -> None:
+        """string in the current element"""
+
+    # tree building
+    def _end_data(self, kind: Optional[str] = None) -> None:
+        if not self._data:
+            return
+        data = ''.join(self._data)
+        self._data = []
+        if not self._preserve and not data.strip(ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        self.on_string(data, kind)
+
+    def _push(self, name: str, attrs: Dict[str, AttrValue]) -> None:
+        self._end_data()
+        self.open_tags.append(name)
+        self._open[name] += 1
+        if name in PRESERVE_WHITESPACE:
+            self._preserve += 1
+        self.on_start(name, attrs)
+
+    def _pop(self) -> None:
+        name = self.open_tags[-1]
+        self.on_end(name)
+        self.open_tags.pop()
+        self._open[name] -= 1
+        if name in PRESERVE_WHITESPACE:
+            self._preserve -= 1
+
+    def _pop_to(self, name: str) -> None:
+        self._end_data()
+        while self._open[name] > 0:
+            popped = self.open_tags[-1]
+            self._pop()
+            if popped == name:
+                break
+
+    # parser events
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]],
+                        void: bool = True) -> None:
+        lists = LIST_ATTRIBUTES.get('*', set()) | LIST_ATTRIBUTES.get(tag, set())
+        values: Dict[str, AttrValue] = {}
+        for key, value in attrs:
+            value = value or ''
+            values[key] = _re_nonspace.findall(value) if key in lists else value
+        self._push(tag, values)
+        if void and tag in VOID_ELEMENTS:
+            self._pop_to(tag)
+            self._closed_void.append(tag) # explicit end tag is ignored once
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self.handle_starttag(tag, attrs, void=False)
+        self._pop_to(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self._closed_void:
+            # </br> after <br>
+            self._closed_void.remove(tag)
+        else:
+            self._pop_to(tag)
+
+    def handle_data(self, data: str) -> None:
+        self._data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        self._data.append(charref(name))
+
+    def handle_entityref(self, name: str) -> None:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self._data.append(character if character is not None else '&' + name)
+
+    def _handle_special(self, data: str, kind: str) -> None:
+        self._end_data()
+        self._data.append(data)
+        self._end_data(kind)
+
+    def handle_comment(self, data: str) -> None:
+        self._handle_special(data, 'comment')
+
+    def handle_decl(self, decl: str) -> None:
+        self._handle_special(decl[len('DOCTYPE '):] if decl.startswith('DOCTYPE ') else decl, 'doctype')
+
+    def unknown_decl(self, data: str) -> None:
+        if data.upper().startswith('CDATA['):
+            self._handle_special(data[len('CDATA['):], 'cdata')
+        else:
+            self._handle_special(data, 'declaration')
+
+    def handle_pi(self, data: str) -> None:
+        self._handle_special(data, 'pi')
+
+    def close(self) -> None:
+        super().close()
+        self._end_data()
+        while self.open_tags:
+            self._pop()
+
+class _Serializer(SoupStream):
+    """whole document as str() of bs4"""
+    def __init__(self):
+        super().__init__()
+        self.parts: List[str] = []
+
+    def on_start(self, name: str, attrs: Dict[str, AttrValue]) -> None:
+        self.parts.append(start_tag(name, attrs))
+
+    def on_end(self, name: str) -> None:
+        self.parts.append(end_tag(name))
+
+    def on_string(self, data: str, kind: Optional[str]) -> None:
+        self.parts.append(serialize_string(data, kind, self.open_tags[-1] if self.open_tags else None))
+
+class TestSoupStream(unittest.TestCase):
+    """compare with bs4"""
+    _pages = [
+        '<!DOCTYPE html>\n<html><body class=" a  b " id=x>\n<p>a &amp; &lt;b&gt; &foo &#65; &#x41; &#x80; &#0;'
+        ' &#99999999; &#12a;</p>\n<br></br><br/><img src="x.png"><x/>'
+        '<p title=\'say "hi"\' data-x="a\'b&quot;c">q</p><!-- c --><?php x ?><![CDATA[d]]>'
+        '<pre>  \n  </pre><i>   </i>\n<script>if (a < b) {}</script></b>unclosed <ul><li>'
+        '<td headers=" h1 h2">t</td>',
+        '<p><br><br/>x</p><i>y</i><p><br/>x</br>z</p><textarea> <!--  --> </textarea>',
+    ]
+
+    def test_bs4(self):
+        """the same serialization as bs4"""
+        import bs4 # pylint: disable=C0415
+        for page in self._pages:
+            serializer = _Serializer()
+            for line in page.splitlines(keepends=True): # as the readers
+                serializer.feed(line)
+            serializer.close()
+            self.assertEqual(''.join(serializer.parts), str(bs4.BeautifulSoup(page, 'html.parser')), page)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+""" section-split output: light shell page & lazy loaded sections
+
+The content of the root element (id="rules") is split at headers (h1-h3)
+into section fragments, and the page becomes a shell with
+the top bar, the ToC, and the first fragment only.
+js/sections.js fetches the other fragments when they are near the viewport,
+or when a link (eg. rule_reference.html#Cost) points to an id inside them.
+
+For output 'rule_reference.html', the following files are written:
+rule_reference.html                       shell
+rule_reference.sections/index.json        {"sections": [null, "rule_reference.sections/001.html?v=...", ...],
+                                          "ids": {"Cost": 1, ...}}
+rule_reference.sections/001.html, ...     fragments (000 is inlined in the shell)
+rule_reference.sections/full.html         the whole page (no script fallback, link target)
+
+A fragment starts at a header, or at the element which starts with the header
+(eg. <div class="tdl"><h2 ...>). Elements enclosing the split point
+(eg. <div class="rules-reference">) are closed at the end of a fragment
+and opened again at the start of the next one (without id).
+Small sections are grouped, so each fragment has at least min_size characters.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+import unittest
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cache import content_hash
+from .minify import write_output
+
+ROOT_ID = 'rules'
+SCRIPT = 'js/sections.js'
+MIN_SIZE = 16 * 1024 # characters
+_SUFFIX = '.sections'
+
+_VOID = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+# elements which can be closed & opened again at a split point
+_CONTAINERS = frozenset(['div', 'section', 'article', 'main'])
+_re_id = re.compile(r'\sid="([^"]*)"')
+_re_space = re.compile(r'\s*')
+
+@dataclass
+class _Element:
+    tag: str
+    start: int # offset of start tag
+    end: int # offset after start tag
+    text: str # start tag as it is
+
+@dataclass
+class _Cut:
+    offset: int
+    opened: List[_Element] = field(default_factory=list) # enclosing elements (outer first)
+
+class _Splitter(HTMLParser):
+    """find split points in the root element"""
+    def __init__(self, text: str, root_id: str, levels: Tuple[str, ...]):
+        super().__init__(convert_charrefs=True)
+        self._text = text
+        self._root_id = root_id
+        self._levels = levels
+        # HTMLParser counts lines by '\n' only (not by '\u2028', '\r', ... of splitlines)
+        self._lines = [0]
+        for line in text.split('\n'):
+            self._lines.append(self._lines[-1] + len(line) + 1)
+        self._stack: List[_Element] = []
+        self._root: Optional[int] = None # depth of root
+        self.content: Optional[Tuple[int, int]] = None # inner range of root
+        self.cuts: List[_Cut] = []
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self._lines[line-1] + col
+
+    def handle_starttag(self, tag, attrs):
+        start = self._offset()
+        text = self.get_starttag_text() or ''
+        element = _Element(tag, start, start + len(text), text)
+        if self._root is not None and self.content is None and tag in self._levels:
+            self._cut(element)
+        if tag in _VOID:
+            return
+        self._stack.append(element)
+        if self._root is None and dict(attrs).get('id') == self._root_id:
+            self._root = len(self._stack)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID and self._stack and self._stack[-1].tag == tag:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        if not any(x.tag == tag for x in self._stack):
+            return
+        while self._stack:
+            element = self._stack.pop()
+            if self._root is not None and self.content is None and len(self._stack) < self._root:
+                self.content = element.end, self._offset()
+            if element.tag == tag:
+                break
+
+    def _cut(self, header: _Element) -> None:
+        assert self._root is not None
+        offset = header.start
+        enclosing = self._stack[self._root:]
+        # move to the element which starts with the header
+        while enclosing and \
+                _re_space.fullmatch(self._text, enclosing[-1].end, offset) is not None:
+            offset = enclosing[-1].start
+            enclosing = enclosing[:-1]
+        if all(x.tag in _CONTAINERS for x in enclosing):
+            self.cuts.append(_Cut(offset, list(enclosing)))
+
+def _reopen(element: _Element) -> str:
+    return _re_id.sub('', element.text, count=1)
+
+def split_sections(text: str, root_id: str = ROOT_ID,
+                   levels: Tuple[str, ...] = ('h1', 'h2', 'h3'),
+                   min_size: int = MIN_SIZE) -> Optional[Tuple[str, str, List[str]]]:
+    """split the content of root element into section fragments
+
+    Args:
+        text (str): html page
+        root_id (str, optional): id of the element to split. Defaults to 'rules'.
+        levels (Tuple[str, ...], optional): headers to split at. Defaults to h1-h3.
+        min_size (int, optional): minimum characters of fragment. Defaults to 16K.
+
+    Returns:
+        Optional[Tuple[str, str, List[str]]]: (page before fragments, page after fragments, fragments).
+            None if root is not found.
+    """
+    splitter = _Splitter(text, root_id, levels)
+    splitter.feed(text)
+    splitter.close()
+    if splitter.content is None:
+        return None
+    begin, end = splitter.content
+    cuts = [_Cut(begin)]
+    for cut in splitter.cuts:
+        if cut.offset - cuts[-1].offset >= min_size and end - cut.offset >= min_size:
+            cuts.append(cut)
+    fragments = []
+    for idx, cut in enumerate(cuts):
+        stop = cuts[idx+1] if idx+1 < len(cuts) else _Cut(end)
+        fragments.append(
+            ''.join(_reopen(x) for x in cut.opened) +
+            text[cut.offset:stop.offset] +
+            ''.join('</{}>'.format(x.tag) for x in reversed(stop.opened))
+        )
+    return text[:begin], text[end:], fragments
+
+def sections_dir(path: str) -> str:
+    """folder of fragments of the output"""
+    return os.path.splitext(path)[0] + _SUFFIX
+
+def link_source(path: str) -> str:
+    """the whole page of path if it is a split shell (for link targets), else path"""
+    folder = sections_dir(path)
+    full = os.path.join(folder, 'full.html')
+    if os.path.isfile(os.path.join(folder, 'index.json')) and os.path.isfile(full):
+        return full
+    return path
+
+def remove_sections(path: str) -> None:
+    """remove fragments of the previous split output (if any)"""
+    folder = sections_dir(path)
+    if os.path.isfile(os.path.join(folder, 'index.json')):
+        shutil.rmtree(folder)
+
+def write_split(path: str, text: str, minified: bool = False, compress: bool = False,
+                min_size: int = MIN_SIZE) -> bool:
+    """write shell page, section fragments and index (see write_output for options)
+
+    Returns:
+        bool: False if the page has no root element (written as a whole page)
+    """
+    result = split_sections(text, min_size=min_size)
+    remove_sections(path)
+    if result is None:
+        write_output(path, text, minified, compress)
+        return False
+    before, after, fragments = result
+    folder = sections_dir(path)
+    os.makedirs(folder)
+    name = os.path.basename(folder)
+    index: Dict[str, Any] = {'sections': [], 'ids': {}}
+    for idx, fragment in enumerate(fragments):
+        for id_ in _re_id.findall(fragment):
+            index['ids'].setdefault(id_, idx)
+        if idx == 0:
+            index['sections'].append(None) # inlined
+            continue
+        # relative to the page, with version for browser cache
+        index['sections'].append('{}/{:03d}.html?v={}'.format(name, idx, content_hash(fragment)[:8]))
+        write_output(os.path.join(folder, '{:03d}.html'.format(idx)), fragment,
+                     minified, compress)
+    with open(os.path.join(folder, 'index.json'), 'w', encoding='utf-8') as fid:
+        json.dump(index, fid, ensure_ascii=False, separators=(',', ':'))
+    write_output(os.path.join(folder, 'full.html'), text, minified, compress)
+
+    placeholders = ''.join(
+        '<div class="lazySection" data-section="{}"></div>\n'.format(idx)
+        for idx in range(1, len(fragments))
+    )
+    noscript = '<noscript><a href="{}/full.html">전체 문서 보기</a></noscript>\n'.format(name)
+    shell = before + fragments[0] + placeholders + noscript + after
+    script = '<script src="{}" data-index="{}/index.json"></script>\n'.format(SCRIPT, name)
+    idx_body = shell.rfind('</body>')
+    shell = shell + script if idx_body < 0 else shell[:idx_body] + script + shell[idx_body:]
+    write_output(path, shell, minified, compress)
+    return True
+
+class TestSplit(unittest.TestCase):
+    """split test"""
+    _page = ('<html><body>\n<nav>ToC</nav>\n<div id="rules">\n<div class="rr">\n'
+             '<h1 id="A">A</h1>\n<p>a<br>a</p>\n'
+             '<div class="tdl"><h2 id="B">B</h2>\n<p>b</p>\n</div>\n'
+             '<h2 id="C">C</h2>\n<ul><li>c</li><li><h3 id="D">D</h3></li></ul>\n<p id="E">c</p>\n'
+             '</div>\n</div>\n<footer>f</footer>\n</body></html>\n')
+
+    def test_split(self):
+        """fragments are balanced and give the same content"""
+        before, after, fragments = split_sections(self._page, min_size=0)
+        self.assertTrue(before.endswith('<div id="rules">'))
+        self.assertTrue(after.startswith('</div>\n<footer>'))
+        self.assertEqual(fragments, [
+            '\n',
+            # <div class="rr"> starts with the header
+            '<div class="rr">\n<h1 id="A">A</h1>\n<p>a<br>a</p>\n</div>',
+            '<div class="rr"><div class="tdl"><h2 id="B">B</h2>\n<p>b</p>\n</div>\n</div>',
+            # h3 in li is not a split point
+            '<div class="rr"><h2 id="C">C</h2>\n<ul><li>c</li><li><h3 id="D">D</h3></li></ul>\n'
+            '<p id="E">c</p>\n</div>\n',
+        ])
+        # grouped
+        self.assertEqual(len(split_sections(self._page, min_size=60)[2]), 2)
+        self.assertIsNone(split_sections('<p>no root</p>'))
+        # line separator in text is not a line break of the parser
+        page = '<div id="rules"><p>a\u2028b</p>\n<h2 id=x>x</h2>\n<p>\rc</p></div>'
+        self.assertEqual(split_sections(page, min_size=0)[2],
+                         ['<p>a\u2028b</p>\n', '<h2 id=x>x</h2>\n<p>\rc</p>'])
+
+    def test_write(self):
+        """shell, index and link source"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'doc.html')
+            self.assertEqual(link_source(path), path)
+            self.assertTrue(write_split(path, self._page, min_size=0))
+            folder_sections = sections_dir(path)
+            with open(os.path.join(folder_sections, 'index.json'), encoding='utf-8') as fid:
+                index = json.load(fid)
+            self.assertEqual(len(index['sections']), 4)
+            self.assertEqual(index['ids'], {'A': 1, 'B': 2, 'C': 3, 'D': 3, 'E': 3})
+            with open(path, encoding='utf-8') as fid:
+                shell = fid.read()
+            self.assertNotIn('id="B"', shell)
+            self.assertIn('<div class="lazySection" data-section="3">', shell)
+            self.assertIn(SCRIPT, shell)
+            self.assertEqual(link_source(path), os.path.join(folder_sections, 'full.html'))
+            with open(link_source(path), encoding='utf-8') as fid:
+                self.assertEqual(fid.read(), self._page)
+            # not split anymore: fragments are removed
+            write_output(path, self._page)
+            remove_sections(path)
+            self.assertEqual(link_source(path), path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,14 @@
 #!/usr/bin/env python3
 """ Autometic symbol generator class
 """
+import json
 import logging
 import re
-from typing import FrozenSet
+from typing import FrozenSet, Match, Optional
 import itertools
 import unittest
 
+from .cache import content_hash
 from .generator import GeneratorInterface
 from .defines import ICON, ICON_IGNORE, ICON_REDIRECT, EXPANSION, SYMBOLS
 
@@ -20,6 +22,7 @@ class SymbolGenerator(GeneratorInterface):
         self._logger = logging.getLogger(type(self).__name__)
         self._re_trait = re.compile('\\[\\[([^\\[^\\]]+)\\]\\]')
         self._re_symbol = re.compile('\\[([^\\[^\\]^ ^가-힣^ㄱ-ㅎ^ㅏ-ㅣ]+)\\]')
+        self._first = '\\[' # characters starting a match of _re_trait/_re_symbol (as [] set)
         self._symbols_icon = ICON
         self._symbols_redirect = ICON_REDIRECT
         self._symbols_ignore = frozenset(ICON_IGNORE)
@@ -37,6 +40,16 @@ class SymbolGenerator(GeneratorInterface):
             self._symbols_map.keys()
         ))
 
+    @property
+    def signature(self) -> Optional[str]:
+        """symbols are converted with the tables of defines only"""
+        if '_signature' not in self.__dict__:
+            self._signature = 'SymbolGenerator:{}'.format(content_hash(json.dumps([
+                self._symbols_icon, self._symbols_redirect, sorted(self._symbols_ignore),
+                self._symbols_symbol, self._symbols_map
+            ], ensure_ascii=False, sort_keys=True)))
+        return self._signature
+
     def __call__(self, target: str) -> str:
         """search in text and convert for symbols.
         This may work by call by reference!!
@@ -47,35 +60,45 @@ class SymbolGenerator(GeneratorInterface):
         Returns:
             str: output
         """
-        # traits update
-        matches = list(self._re_trait.finditer(target))
-        for match in reversed(matches):
-            tagged = '<span class="trait">{0}</span>'.format(match.group(1))
-            target = target[:match.start()] + tagged + target[match.end():]
-
-        # symbol / code update
-        matches = list(self._re_symbol.finditer(target))
-        for match in reversed(matches):
-            text = match.group(1).lower()
-            if text in self._symbols_ignore:
-                continue
-            if text in self._symbols_redirect:
-                text = self._symbols_redirect[text]
-            if text in self._symbols_icon:
-                tagged = '<span title="{title}" class="icon-{icon}"></span>'.format(
-                    icon=text, title=self._symbols_icon[text]
-                )
-            elif text in self._symbols_symbol:
-                tagged = '<span title="{title}" class="symbol-{icon}"></span>'.format(
-                    icon=text, title=self._symbols_symbol[text]
-                )
-            elif text in self._symbols_map:
-                tagged = self._symbols_map[text]
-            else:
-                self._logger.warning("cannot find symbol [%s]", text)
-                continue
-            target = target[:match.start()] + tagged + target[match.end():]
-        return target
+        target = self._re_trait.sub(self._replace_trait, target)
+        return self._re_symbol.sub(self._replace_symbol, target)
+
+    def _tag_trait(self, text: str) -> str:
+        """tagged string for trait [[text]]"""
+        self.stats['traits'] += 1
+        return '<span class="trait">{0}</span>'.format(text)
+
+    def _tag_symbol(self, text: str) -> Optional[str]:
+        """tagged string for symbol [text], None if it should be kept"""
+        text = text.lower()
+        if text in self._symbols_ignore:
+            self.stats['ignored'] += 1
+            return None
+        if text in self._symbols_redirect:
+            text = self._symbols_redirect[text]
+        if text in self._symbols_icon:
+            tagged = '<span title="{title}" class="icon-{icon}"></span>'.format(
+                icon=text, title=self._symbols_icon[text]
+            )
+        elif text in self._symbols_symbol:
+            tagged = '<span title="{title}" class="symbol-{icon}"></span>'.format(
+                icon=text, title=self._symbols_symbol[text]
+            )
+        elif text in self._symbols_map:
+            tagged = self._symbols_map[text]
+        else:
+            self.stats['unresolved'] += 1
+            self._logger.warning("cannot find symbol [%s]", text)
+            return None
+        self.stats['matches'] += 1
+        return tagged
+
+    def _replace_trait(self, match: Match) -> str:
+        return self._tag_trait(match.group(1))
+
+    def _replace_symbol(self, match: Match) -> str:
+        tagged = self._tag_symbol(match.group(1))
+        return match.group(0) if tagged is None else tagged
 
 class TestSymbolGenerator(unittest.TestCase):
     """test class"""
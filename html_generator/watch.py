@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+""" watch mode: rebuild on change and preview with live reload
+
+Watcher polls every dependency of the manifest (raw files, inserted files,
+link targets) and runs generate_batch when any of them is changed.
+The dependency list of a document is collected again only when its input
+or inserted files are changed, so an idle poll only stats the known files.
+Only outputs whose dependencies are changed are generated (see dependency),
+and the header indexes of unchanged link targets are kept in memory
+(see mics.collect_headers), so a rebuild takes only a few ms.
+If the python code of html_generator (including defines.py) is changed,
+the process is restarted to load it.
+
+serve() runs a local http server. Html pages get a small script
+which polls /__version__ and reloads the page after a rebuild.
+"""
+import functools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .batch import BuildItem, collect_dependencies, generate_batch
+from .dependency import DependencyManifest, Stamp, file_stamp
+from .split import link_source
+
+RELOAD_PATH = '/__version__'
+_RELOAD_SCRIPT = '''<script>
+(function() {
+    var version = null;
+    setInterval(function() {
+        fetch("%s", {cache: "no-store"}).then(function(res) { return res.text(); })
+        .then(function(text) {
+            if (version !== null && text !== version) { location.reload(); }
+            version = text;
+        }).catch(function() {});
+    }, 300);
+})();
+</script>
+''' % RELOAD_PATH
+
+class Watcher():
+    """rebuild outputs of the manifest when their dependencies are changed
+
+    Args:
+        items (Iterable[BuildItem]): documents (see batch)
+        manifest (Optional[DependencyManifest]): manifest to check & record. Defaults to the one in cache folder.
+        report_dir (Optional[str]): folder to write json report per output. Defaults to None.
+    """
+    def __init__(self, items: Iterable[BuildItem],
+                 manifest: Optional[DependencyManifest] = None,
+                 report_dir: Optional[str] = None):
+        self._logger = logging.getLogger(type(self).__name__)
+        self.items = list(items)
+        self._manifest = DependencyManifest() if manifest is None else manifest
+        self._report_dir = report_dir
+        self.version = 0 # increased whenever any output is generated
+        self._stamps: Dict[str, Stamp] = {}
+        # index of item -> (dependencies, stamps of input & inserted files when collected)
+        self._dependencies: Dict[int, Tuple[List[str], Dict[str, Stamp]]] = {}
+        self._code = self._code_stamps()
+
+    def _item_paths(self, idx: int, stamp: Callable[[str], Stamp]) -> List[str]:
+        """dependencies of the item, collected again if its input or inserted files are changed"""
+        known = self._dependencies.get(idx)
+        if known is not None and all(stamp(path) == value for path, value in known[1].items()):
+            return known[0]
+        item = self.items[idx]
+        try:
+            dependencies = collect_dependencies(item)
+        except FileNotFoundError:
+            dependencies = [item.input]
+        links = {link_source(x) for x in (item.rr, item.faq) if x is not None}
+        sources = {
+            path: stamp(path) for path in dependencies if path == item.input or path not in links
+        }
+        self._dependencies[idx] = dependencies, sources
+        return dependencies
+
+    def _poll_stamps(self) -> Dict[str, Stamp]:
+        """stamps of all dependencies of the documents (each file is stat once)"""
+        stamps: Dict[str, Stamp] = {}
+        def stamp(path: str) -> Stamp:
+            if path not in stamps:
+                stamps[path] = file_stamp(path)
+            return stamps[path]
+        paths: List[str] = []
+        for idx in range(len(self.items)):
+            paths.extend(x for x in self._item_paths(idx, stamp) if x not in paths)
+        return {path: stamp(path) for path in paths}
+
+    def paths(self) -> List[str]:
+        """all dependencies of the documents"""
+        return list(self._poll_stamps())
+
+    def changed(self) -> List[str]:
+        """dependencies changed since the last call"""
+        stamps = self._poll_stamps()
+        changed = [path for path, stamp in stamps.items() if self._stamps.get(path) != stamp]
+        self._stamps = stamps
+        return changed
+
+    @staticmethod
+    def _code_stamps() -> Dict[str, Stamp]:
+        folder = os.path.dirname(os.path.abspath(__file__))
+        return {
+            name: file_stamp(os.path.join(folder, name))
+            for name in os.listdir(folder) if name.endswith('.py')
+        }
+
+    def code_changed(self) -> bool:
+        """True if python code of html_generator is changed"""
+        return self._code_stamps() != self._code
+
+    def build(self) -> List[str]:
+        """generate outdated outputs
+
+        Returns:
+            List[str]: outputs actually generated
+        """
+        generated = generate_batch(self.items, manifest=self._manifest,
+                                   report_dir=self._report_dir)
+        if generated:
+            self.version += 1
+        # outputs are also link targets: do not detect them as changes
+        self.changed()
+        return generated
+
+    def poll(self) -> List[str]:
+        """build if any dependency is changed
+
+        Returns:
+            List[str]: outputs actually generated
+        """
+        changed = self.changed()
+        if not changed:
+            return []
+        self._logger.info("changed: %s", ', '.join(changed))
+        start_time = time.perf_counter()
+        generated = self.build()
+        if generated:
+            self._logger.info("rebuild %s: %.2fms", ', '.join(generated),
+                              (time.perf_counter() - start_time) * 1000)
+        return generated
+
+    def run(self, interval: float = 0.2) -> None:
+        """poll forever (Ctrl+C to stop)
+
+        Args:
+            interval (float, optional): polling interval in seconds. Defaults to 0.2.
+        """
+        self.build()
+        self._logger.info("watching %d files", len(self._stamps))
+        while True:
+            time.sleep(interval)
+            if self.code_changed():
+                self._logger.info("html_generator is changed. restart.")
+                os.execv(sys.executable, [sys.executable] + sys.argv)
+            try:
+                self.poll()
+            except Exception: # pylint: disable=W0703
+                # keep watching: the next save may fix it
+                self._logger.exception("generation failed")
+
+def inject_reload(page: str) -> str:
+    """add live reload script to html page"""
+    idx = page.rfind('</body>')
+    if idx < 0:
+        return page + _RELOAD_SCRIPT
+    return page[:idx] + _RELOAD_SCRIPT + page[idx:]
+
+class _PreviewHandler(SimpleHTTPRequestHandler):
+    watcher: Optional[Watcher] = None
+
+    def _send(self, body: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].split('#', 1)[0]
+        if path == RELOAD_PATH:
+            version = self.watcher.version if self.watcher is not None else 0
+            self._send(str(version).encode('utf-8'), 'text/plain')
+            return
+        local = self.translate_path(path)
+        if os.path.isdir(local):
+            local = os.path.join(local, 'index.html')
+        if local.endswith('.html') and os.path.isfile(local):
+            with open(local, encoding='utf-8') as fid:
+                page = fid.read()
+            self._send(inject_reload(page).encode('utf-8'), 'text/html; charset=utf-8')
+            return
+        super().do_GET()
+
+    def log_message(self, format, *args): # pylint: disable=W0622
+        logging.getLogger('preview').debug(format, *args)
+
+def serve(watcher: Optional[Watcher], port: int = 8000, folder: str = '.',
+          host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """run preview server in a background thread
+
+    Args:
+        watcher (Optional[Watcher]): version of the watcher triggers reload
+        port (int, optional): port. Defaults to 8000 (0: any free port).
+        folder (str, optional): root of the site. Defaults to '.'.
+        host (str, optional): address to bind. Defaults to '127.0.0.1'.
+
+    Returns:
+        ThreadingHTTPServer: running server (call shutdown() to stop)
+    """
+    handler = type('PreviewHandler', (_PreviewHandler,), {'watcher': watcher})
+    server = ThreadingHTTPServer((host, port), functools.partial(handler, directory=folder))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    logging.getLogger('preview').info(
+        "preview: http://%s:%d/", host, server.server_address[1])
+    return server
+
+class TestWatcher(unittest.TestCase):
+    """watch test"""
+    def test_poll(self):
+        """only affected outputs are generated"""
+        with tempfile.TemporaryDirectory() as folder:
+            path_rr = os.path.join(folder, 'rr.html')
+            path_doc = os.path.join(folder, 'doc.html')
+            path_other = os.path.join(folder, 'other.html')
+            for path in [path_rr, path_other]:
+                with open(path, 'w', encoding='utf-8') as fid:
+                    fid.write('<html><body>\n<h2 id="Cost">비용</h2>\n</body></html>\n')
+            with open(path_doc, 'w', encoding='utf-8') as fid:
+                fid.write('<html><body>\n<p>참조 "비용"</p>\n</body></html>\n')
+            items = [
+                BuildItem(path_rr, path_rr + '.out', nolink=True),
+                BuildItem(path_doc, path_doc + '.out', rr=path_rr + '.out'),
+                BuildItem(path_other, path_other + '.out', nolink=True),
+            ]
+            watcher = Watcher(items, DependencyManifest(os.path.join(folder, 'dep.json')))
+            self.assertEqual(len(watcher.build()), 3)
+            self.assertEqual(watcher.version, 1)
+            self.assertEqual(watcher.poll(), [])
+            with open(path_rr, 'w', encoding='utf-8') as fid:
+                fid.write('<html><body>\n<h2 id="Cost2">비용</h2>\n</body></html>\n')
+            self.assertEqual(watcher.poll(), [path_rr + '.out', path_doc + '.out'])
+            self.assertEqual(watcher.version, 2)
+            with open(path_doc + '.out', encoding='utf-8') as fid:
+                self.assertIn('#Cost2', fid.read())
+
+            # dependencies are collected again only for changed input or inserted files
+            with mock.patch(f"{__name__}.collect_dependencies", wraps=collect_dependencies) as collect:
+                self.assertEqual(watcher.poll(), [])
+                self.assertEqual(collect.call_count, 0)
+                with open(path_other, 'w', encoding='utf-8') as fid:
+                    fid.write('<html><body>\n<p>other</p>\n</body></html>\n')
+                self.assertEqual(watcher.poll(), [path_other + '.out'])
+                self.assertEqual([x.args[0].input for x in collect.call_args_list], [path_other])
+
+    def test_inject(self):
+        """reload script is placed before </body>"""
+        page = inject_reload('<html><body><p>a</p></body></html>')
+        self.assertTrue(page.endswith('</script>\n</body></html>'))
+        self.assertIn(RELOAD_PATH, inject_reload('<p>a</p>'))
+
+if __name__ == '__main__':
+    unittest.main()
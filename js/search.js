@@ -0,0 +1,92 @@
+// client of the search index (see html_generator/search_index.py)
+function SearchIndex (base) {
+  this.base = base.replace(/\/?$/, '/');
+  this.shards = {};
+  this.index = fetch(this.base + 'index.json').then(function (res) {
+    return res.json();
+  });
+}
+
+// index terms of text: the same as grams() of search_index.py
+SearchIndex.grams = function (text) {
+  var grams = {};
+  text = text.normalize('NFC').toLowerCase();
+  (text.match(/[가-힣]+/g) || []).forEach(function (run) {
+    for (var idx = 0; idx < run.length; idx++) {
+      grams[run[idx]] = true;
+      if (idx + 1 < run.length) {
+        grams[run.substr(idx, 2)] = true;
+      }
+    }
+  });
+  (text.match(/[a-z0-9]+/g) || []).forEach(function (word) {
+    grams[word] = true;
+  });
+  return Object.keys(grams);
+};
+
+SearchIndex.shardOf = function (gram) {
+  var code = gram.charCodeAt(0) - 0xAC00;
+  if (code >= 0 && code < 11172) {
+    var initial = Math.floor(code / 588);
+    return 'h' + (initial < 10 ? '0' : '') + initial;
+  }
+  return 'etc';
+};
+
+SearchIndex.prototype.shard = function (name) {
+  if (!this.shards[name]) {
+    this.shards[name] = fetch(this.base + name + '.json').then(function (res) {
+      return res.json();
+    });
+  }
+  return this.shards[name];
+};
+
+// documents which have all grams of the query: [{url, title, page}]
+// (n-grams may also match the words apart, so titles which contain the query come first)
+SearchIndex.prototype.search = function (query) {
+  var self = this;
+  var grams = SearchIndex.grams(query);
+  if (!grams.length) {
+    return Promise.resolve([]);
+  }
+  return this.index.then(function (index) {
+    var names = grams.map(SearchIndex.shardOf).filter(function (x) {
+      return index.shards.indexOf(x) >= 0;
+    });
+    if (names.length < new Set(grams.map(SearchIndex.shardOf)).size) {
+      return [[], index];
+    }
+    return Promise.all(names.map(self.shard, self)).then(function (shards) {
+      var result = null;
+      grams.forEach(function (gram) {
+        var deltas = shards[names.indexOf(SearchIndex.shardOf(gram))][gram] || [];
+        var ids = new Set();
+        var id = 0;
+        deltas.forEach(function (delta) {
+          id += delta;
+          ids.add(id);
+        });
+        result = result === null ? ids : new Set(Array.from(result).filter(function (x) {
+          return ids.has(x);
+        }));
+      });
+      return [Array.from(result), index];
+    });
+  }).then(function (found) {
+    var index = found[1];
+    var term = query.trim().toLowerCase();
+    return found[0].map(function (id) {
+      var doc = index.docs[id];
+      return {
+        url: index.pages[doc[0]] + '#' + encodeURIComponent(doc[1]),
+        title: doc[2],
+        page: index.pages[doc[0]],
+        order: doc[2].toLowerCase().indexOf(term) >= 0 ? 0 : 1
+      };
+    }).sort(function (a, b) {
+      return a.order - b.order;
+    });
+  });
+};
@@ -0,0 +1,81 @@
+// lazy loading of section-split pages (see html_generator/split.py)
+(function () {
+  var indexUrl = document.currentScript.getAttribute('data-index');
+  var placeholders = document.querySelectorAll('.lazySection');
+  var loading = {};
+  var index = null;
+  // insert after ui.js has applied view options to the page
+  var ready = new Promise(function (resolve) {
+    window.addEventListener('load', resolve);
+  });
+
+  function load (idx) {
+    if (!loading[idx]) {
+      var element = placeholders[idx - 1];
+      loading[idx] = Promise.all([fetch(index.sections[idx]).then(function (res) {
+        return res.text();
+      }), ready]).then(function (results) {
+        var html = results[0];
+        var temp = document.createElement('div');
+        temp.innerHTML = html;
+        if (typeof initSection === 'function') {
+          initSection(temp);
+        }
+        while (temp.firstChild) {
+          element.parentNode.insertBefore(temp.firstChild, element);
+        }
+        element.parentNode.removeChild(element);
+      });
+    }
+    return loading[idx];
+  }
+
+  // load sections up to the target of the hash, then scroll
+  function goto (hash) {
+    var id = decodeURIComponent(hash.replace(/^#/, ''));
+    if (!id || document.getElementById(id) || !(id in index.ids)) {
+      return;
+    }
+    var promises = [];
+    for (var idx = 1; idx <= index.ids[id]; idx++) {
+      promises.push(load(idx));
+    }
+    Promise.all(promises).then(function () {
+      var target = document.getElementById(id);
+      if (target) {
+        target.scrollIntoView();
+      }
+    });
+  }
+
+  function observe () {
+    if (!('IntersectionObserver' in window)) {
+      for (var idx = 1; idx < index.sections.length; idx++) {
+        load(idx);
+      }
+      return;
+    }
+    var observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load(Number(entry.target.getAttribute('data-section')));
+        }
+      });
+    }, {rootMargin: '1500px 0px'});
+    placeholders.forEach(function (x) {
+      observer.observe(x);
+    });
+  }
+
+  fetch(indexUrl).then(function (res) {
+    return res.json();
+  }).then(function (data) {
+    index = data;
+    goto(location.hash);
+    window.addEventListener('hashchange', function () {
+      goto(location.hash);
+    });
+    observe();
+  });
+})();
@@ -53,20 +53,31 @@ function toggleView (element, type, mode, initial) {
   element.style[type] = element.style[type] === mode ? initial : mode;
 }
 
-function toggleViewSelector (selector, mode) {
-  var viewSelector = document.querySelectorAll(selector);
+function toggleViewSelector (selector, mode, root) {
+  var viewSelector = (root || document).querySelectorAll(selector);
   viewSelector.forEach(function (x) {
     toggleView(x, 'display', mode);
   });
 }
 
-function toggleViewColor (selector, color) {
-  var viewSelector = document.querySelectorAll(selector);
+function toggleViewColor (selector, color, root) {
+  var viewSelector = (root || document).querySelectorAll(selector);
   viewSelector.forEach(function (x) {
     toggleView(x, 'color', '', 'red');
   });
 }
 
+// apply view options to contents loaded later (see sections.js)
+function initSection (root) {
+  if (localStorage.getItem('viewAll') != 'true') {
+    toggleViewSelector('.tdcp, .tdcc', undefined, root);
+  }
+  if (localStorage.getItem('highlightNew') == 'true') {
+    toggleViewColor('.V1_9, .new', undefined, root);
+    toggleViewSelector('.newShowList', 'list-item', root);
+  }
+}
+
 function putCurrentItemClass (idx) {
   document.getElementById('barMenu').children[idx].children[0].className = 'currentItem';
 }
@@ -5,7 +5,35 @@ import unittest
 from html_generator.link_generator import TestLinkGenerator
 from html_generator.symbol_generator import TestSymbolGenerator
 from html_generator.taboo_generator import TestTabooGenerator
+from html_generator.fused_generator import TestFusedGenerator
 from html_generator.mics import TestFileReader, TestToC
+from html_generator.header_collector import TestHeaderCollector
+from html_generator.soup_stream import TestSoupStream
+from html_generator.cache import TestCache
+from html_generator.batch import TestBatch
+from html_generator.dependency import TestDependencyManifest
+from html_generator.report import TestBuildReport
+from html_generator.watch import TestWatcher
+from html_generator.script_factory import TestScriptRunner
+from html_generator.parser import TestParserBackend
+from html_generator.generate import TestGenerate
+from html_generator.minify import TestMinify
+from html_generator.split import TestSplit
+from html_generator.search_index import TestSearchIndex
+from faq_generator.card_shards import TestCardShards
+from faq_generator.sheets_fetch import TestSheetsFetch
+from faq_generator.sheets_snapshot import TestSnapshotSheets
+from faq_generator.faq_cache import TestRowCache
+from faq_generator.html_reader import TestHTMLReader
+from faq_generator.documents import TestDocuments
+from faq_generator.load_arkhamdb import TestCardStore
+from faq_generator.card_db import TestCardDB
+from faq_generator.tracing import TestTracer
+from faq_generator.downloader import TestDownloader
+try: # needs opencv-python & tqdm (see download_cards.py)
+    from download_cards import TestRefineImages
+except ImportError:
+    pass
 
 if __name__ == '__main__':
     unittest.main()